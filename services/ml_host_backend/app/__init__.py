@@ -0,0 +1,5 @@
+from ml_host_backend.app.startup_timing import STARTUP_TIMING, import_timer
+
+# Record import times as early as possible, the report is logged at startup
+if STARTUP_TIMING:
+    import_timer.install()
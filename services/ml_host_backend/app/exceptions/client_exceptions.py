@@ -16,3 +16,23 @@ class UnauthroizedException(Exception):
     def __init__(self, message="Unauthorized."):
         self.message = message
         super().__init__(self.message)
+
+
+class ForbiddenException(Exception):
+    """
+    Forbidden exception, the token is valid but lacks the required role
+    """
+
+    def __init__(self, message="Forbidden."):
+        self.message = message
+        super().__init__(self.message)
+
+
+class ClientDisconnectedException(Exception):
+    """
+    Client disconnected before the request was completed
+    """
+
+    def __init__(self, message="Client disconnected."):
+        self.message = message
+        super().__init__(self.message)
@@ -96,3 +96,43 @@ class MLFlowConfigurationException(Exception):
     def __init__(self, message="MLFlow service is not correctly configured"):
         self.message = message
         super().__init__(self.message)
+
+
+class InferenceQueueFullException(Exception):
+    """
+    Inference queue full
+    """
+
+    def __init__(self, message="Too many predictions in progress, try again later."):
+        self.message = message
+        super().__init__(self.message)
+
+
+class ArtifactChecksumException(Exception):
+    """
+    Downloaded model artifact doesn't match its checksum
+    """
+
+    def __init__(self, message="Downloaded model artifact is corrupted."):
+        self.message = message
+        super().__init__(self.message)
+
+
+class ArtifactVersionException(Exception):
+    """
+    Downloaded model artifact isn't of the requested version
+    """
+
+    def __init__(self, message="Downloaded model artifact has the wrong version."):
+        self.message = message
+        super().__init__(self.message)
+
+
+class ModelMemoryBudgetException(Exception):
+    """
+    Model can never fit into the memory budget
+    """
+
+    def __init__(self, message="Model doesn't fit into the memory budget."):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,82 @@
+"""
+Gunicorn configuration of the multi-process serving mode, e.g.
+
+    gunicorn -c python:ml_host_backend.app.gunicorn_conf ml_host_backend.app.main:app
+
+The app is imported and the configured models are loaded in the master process, before
+the uvicorn workers are forked, so the workers share the model weights copy-on-write.
+Only TFLite models can be shared, as TensorFlow isn't fork-safe, hence the TFLite backend
+is used by default and more than one worker with the Keras backend is refused.
+The thread pools of TensorFlow and TFLite are sized per worker, so the workers together
+don't oversubscribe the CPU cores.
+
+The Prometheus metrics run in multiprocess mode, every worker writes its samples to
+PROMETHEUS_MULTIPROC_DIR and /metrics aggregates the files of all workers with the
+MultiProcessCollector, so a scrape isn't answered with the metrics of a single worker.
+"""
+
+import glob
+import os
+
+# Number of uvicorn worker processes
+HOST_BACKEND_WORKERS = int(os.getenv("HOST_BACKEND_WORKERS", "2"))
+HOST_BACKEND_PORT = int(os.getenv("HOST_BACKEND_PORT", "8000"))
+# Inference threads of every worker, by default the CPU cores are split between the workers
+INFERENCE_THREADS_PER_WORKER = int(
+    os.getenv(
+        "INFERENCE_THREADS_PER_WORKER",
+        str(max(1, (os.cpu_count() or 1) // HOST_BACKEND_WORKERS)),
+    )
+)
+
+# the models are shared by the workers with the TFLite backend only, explicit settings win
+INFERENCE_BACKEND = os.environ.setdefault("INFERENCE_BACKEND", "tflite").lower()
+if INFERENCE_BACKEND != "tflite" and HOST_BACKEND_WORKERS > 1:
+    raise RuntimeError(
+        f"The {INFERENCE_BACKEND} backend can't share the models between workers, "
+        "every worker would load its own copy. Use INFERENCE_BACKEND=tflite or HOST_BACKEND_WORKERS=1."
+    )
+
+# the thread pools are configured before the app is imported, explicit settings win
+os.environ.setdefault("TF_NUM_INTRAOP_THREADS", str(INFERENCE_THREADS_PER_WORKER))
+os.environ.setdefault("TF_NUM_INTEROP_THREADS", "1")
+os.environ.setdefault("TFLITE_NUM_THREADS", str(INFERENCE_THREADS_PER_WORKER))
+os.environ.setdefault("OMP_NUM_THREADS", str(INFERENCE_THREADS_PER_WORKER))
+
+# the metrics directory must be set before prometheus_client is imported by the app
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", "/tmp/ml_host_backend/prometheus"
+)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+# samples of a previous run would be added to the new ones
+for filepath in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, "*.db")):
+    os.remove(filepath)
+
+bind = f"0.0.0.0:{HOST_BACKEND_PORT}"
+workers = HOST_BACKEND_WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+# import the app in the master, the workers are forked from it
+preload_app = True
+# loading models can take long, don't kill workers waiting for the first inference
+timeout = int(os.getenv("HOST_BACKEND_WORKER_TIMEOUT", "120"))
+
+
+def when_ready(server):
+    """
+    Load the configured models in the master, right before the workers are forked.
+    """
+    from ml_host_backend.app.services.warmup_service import preload_models_before_fork
+
+    server.log.info(
+        f"Preloading models for {workers} workers with {INFERENCE_THREADS_PER_WORKER} inference threads each."
+    )
+    preload_models_before_fork()
+
+
+def child_exit(server, worker):
+    """
+    Remove the live gauge samples of an exited worker from the aggregated metrics.
+    """
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,19 +1,35 @@
 import logging
 import logging.config
+import os
+import threading
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from ml_host_backend.app.exceptions.client_exceptions import (
+    ClientDisconnectedException,
+    ForbiddenException,
     InvalidArgumentException,
     UnauthroizedException,
 )
 from ml_host_backend.app.exceptions.service_exceptions import (
+    ArtifactChecksumException,
+    ArtifactVersionException,
+    InferenceQueueFullException,
     MLFlowConfigurationException,
     MLFlowUnavailableException,
+    MLUserMgmtUnavailableException,
+    ModelMemoryBudgetException,
     ModelNotFoundException,
 )
 from ml_host_backend.app.logging_config import LOGGING_CONFIG
+from ml_host_backend.app.routes.admin import router as admin_router
 from ml_host_backend.app.routes.models import router as models_router
+from ml_host_backend.app.services.auth_service import verification_refresher
+from ml_host_backend.app.services.health_monitor import health_monitor
+from ml_host_backend.app.services.models_service import warm_up_imports
+from ml_host_backend.app.services.warmup_service import model_warm_up
+from ml_host_backend.app.startup_timing import STARTUP_TIMING, import_timer
 from prometheus_fastapi_instrumentator import Instrumentator
 
 # Configure logging
@@ -21,11 +37,37 @@ from prometheus_fastapi_instrumentator import Instrumentator
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Whether tensorflow is imported in the background at startup, instead of on first inference
+WARM_UP_IMPORTS = os.getenv("WARM_UP_IMPORTS", "false").lower() == "true"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if STARTUP_TIMING:
+        logger.info(f"Startup timing: {import_timer.report()}")
+    if WARM_UP_IMPORTS:
+        threading.Thread(
+            target=warm_up_imports, name="warm-up-imports", daemon=True
+        ).start()
+    # probe the dependencies in the background, instead of before every request
+    health_monitor.start()
+    # fetch the JWT verification keys and revoked tokens in the background, not on the request path
+    verification_refresher.start()
+    # load and warm up the configured models, /ready reports when this is finished
+    model_warm_up.start()
+    yield
+    verification_refresher.stop()
+    health_monitor.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # setup Prometheus instrumentator
 Instrumentator().instrument(app).expose(app)
 
+# all modules of the app are imported now, later imports are recorded by the lazy modules
+import_timer.uninstall()
+
 
 @app.exception_handler(InvalidArgumentException)
 async def handle_invalid_argument_exception(
@@ -41,6 +83,11 @@ async def handle_unauthorized_exception(
     return JSONResponse(status_code=401, content={"message": exception.message})
 
 
+@app.exception_handler(ForbiddenException)
+async def handle_forbidden_exception(request: Request, exception: ForbiddenException):
+    return JSONResponse(status_code=403, content={"message": exception.message})
+
+
 @app.exception_handler(ModelNotFoundException)
 async def handle_model_not_found(request: Request, exception: ModelNotFoundException):
     return JSONResponse(status_code=404, content={"message": exception.message})
@@ -55,6 +102,15 @@ async def handle_mlflow_unavailable(
     )
 
 
+@app.exception_handler(MLUserMgmtUnavailableException)
+async def handle_ml_user_mgmt_unavailable(
+    request: Request, exception: MLUserMgmtUnavailableException
+):
+    return JSONResponse(
+        status_code=503, content={"message": "Service unavailable at the moment."}
+    )
+
+
 @app.exception_handler(MLFlowConfigurationException)
 async def handle_mlflow_not_configured_correctly(
     request: Request, exception: MLFlowConfigurationException
@@ -64,10 +120,75 @@ async def handle_mlflow_not_configured_correctly(
     )
 
 
+@app.exception_handler(ArtifactChecksumException)
+async def handle_artifact_checksum_mismatch(
+    request: Request, exception: ArtifactChecksumException
+):
+    # 502: the train hub delivered a corrupted model file
+    return JSONResponse(status_code=502, content={"message": exception.message})
+
+
+@app.exception_handler(ArtifactVersionException)
+async def handle_artifact_version_mismatch(
+    request: Request, exception: ArtifactVersionException
+):
+    # 502: the train hub delivered another version than the requested one
+    return JSONResponse(status_code=502, content={"message": exception.message})
+
+
+@app.exception_handler(ModelMemoryBudgetException)
+async def handle_model_memory_budget_exceeded(
+    request: Request, exception: ModelMemoryBudgetException
+):
+    # 507: the model can never be loaded with the configured memory budget
+    return JSONResponse(status_code=507, content={"message": exception.message})
+
+
+@app.exception_handler(InferenceQueueFullException)
+async def handle_inference_queue_full(
+    request: Request, exception: InferenceQueueFullException
+):
+    return JSONResponse(
+        status_code=503,
+        content={"message": exception.message},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(ClientDisconnectedException)
+async def handle_client_disconnected(
+    request: Request, exception: ClientDisconnectedException
+):
+    # 499: client closed request, the client won't read this response anyway
+    return JSONResponse(status_code=499, content={"message": exception.message})
+
+
 app.include_router(models_router, prefix="/api/models", tags=["models"])
+app.include_router(admin_router, prefix="/api/admin", tags=["admin"])
 
 
 @app.get("/health")
 def health():
     """Health check endpoint."""
     return {"status": "healthy"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness endpoint, unready until the configured models are warmed up."""
+    status = model_warm_up.status()
+    if not model_warm_up.is_ready():
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+
+@app.get("/health/dependencies")
+def health_of_dependencies():
+    """Cached availability of the services this service depends on."""
+    return health_monitor.status()
+
+
+@app.get("/health/startup")
+def startup_timing():
+    """Import time breakdown of the service startup."""
+    return import_timer.report()
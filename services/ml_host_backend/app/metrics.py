@@ -0,0 +1,111 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Custom metrics, exposed together with the instrumentator metrics on /metrics
+
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "inference_queue_depth",
+    "Number of inference jobs waiting for a free inference worker.",
+    multiprocess_mode="livesum",
+)
+INFERENCE_IN_PROGRESS = Gauge(
+    "inference_in_progress",
+    "Number of inference jobs currently running on an inference worker.",
+    multiprocess_mode="livesum",
+)
+INFERENCE_REJECTED = Counter(
+    "inference_rejected_total",
+    "Number of inference jobs rejected because the inference queue was full.",
+)
+INFERENCE_CANCELLED = Counter(
+    "inference_cancelled_total",
+    "Number of inference jobs cancelled because the client disconnected.",
+)
+DEPENDENCY_UP = Gauge(
+    "dependency_up",
+    "Whether a dependency is considered available (1) or its circuit is open (0).",
+    ["dependency"],
+    # down, as soon as the circuit of one worker is open
+    multiprocess_mode="livemin",
+)
+
+INFERENCE_STAGE_SECONDS = Histogram(
+    "inference_stage_seconds",
+    "Time spent in each stage of a prediction request: metadata, load, decode, preprocess, forward and serialize.",
+    ["stage", "model", "version"],
+    buckets=(
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        30.0,
+    ),
+)
+CACHE_REQUESTS = Counter(
+    "inference_cache_requests_total",
+    "Number of model and prediction cache lookups by result (hit or miss).",
+    ["cache", "model", "version", "result"],
+)
+PREDICTION_BATCH_SIZE = Histogram(
+    "prediction_batch_size",
+    "Number of images predicted together in one forward pass.",
+    ["model", "version", "path"],
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+TOKEN_CACHE_REQUESTS = Counter(
+    "token_cache_requests_total",
+    "Number of token verifications by token cache result (hit, negative_hit or miss).",
+    ["result"],
+)
+
+
+# Model label of the stages, which ran before the requested model was resolved,
+# so names of unknown models from the URL don't create new time series
+UNKNOWN_MODEL = "unknown"
+
+
+class StageTimer:
+    """
+    Records the duration of the stages of one prediction request in
+    INFERENCE_STAGE_SECONDS. The model name and version can be set, once they are known.
+    """
+
+    def __init__(self, model_name, model_version=None):
+        self.model_name = model_name
+        self.model_version = model_version
+
+    @property
+    def labels(self):
+        version = "" if self.model_version is None else str(self.model_version)
+        return {"model": self.model_name, "version": version}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            INFERENCE_STAGE_SECONDS.labels(stage=name, **self.labels).observe(
+                time.perf_counter() - start
+            )
+
+    def count_cache_request(self, cache, hit):
+        CACHE_REQUESTS.labels(
+            cache=cache, result="hit" if hit else "miss", **self.labels
+        ).inc()
+
+    def observe_batch_size(self, batch_size, path):
+        PREDICTION_BATCH_SIZE.labels(path=path, **self.labels).observe(batch_size)
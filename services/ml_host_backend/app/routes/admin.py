@@ -0,0 +1,71 @@
+import logging
+
+from fastapi import APIRouter, Security
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from ml_host_backend.app.exceptions.service_exceptions import ModelNotFoundException
+from ml_host_backend.app.services.auth_service import verify_admin_token
+from ml_host_backend.app.services.model_cache import model_cache
+from ml_host_backend.app.services.models_service import (
+    get_model,
+    get_model_summary_for_prediction,
+    get_model_version,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/models")
+def list_loaded_models(
+    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+):
+    """
+    Function to list the loaded models, their estimated memory, last use, and the
+    resident memory of the process.
+    """
+    # Verify the JWT token, only admins may manage the loaded models
+    verify_admin_token(credentials)
+
+    return model_cache.residency()
+
+
+@router.post("/models/{model_name}/load")
+def load_model(
+    model_name: str, credentials: HTTPAuthorizationCredentials = Security(HTTPBearer())
+):
+    """
+    Function to load the latest version of a model into memory, evicting other models
+    if the memory budget requires it.
+    """
+    # Verify the JWT token, only admins may manage the loaded models
+    verify_admin_token(credentials)
+
+    logger.info(f"Loading model: {model_name}")
+    model_summary = get_model_summary_for_prediction(model_name, credentials)
+    get_model(model_name, model_summary, credentials)
+    return {
+        "message": f"Model {model_name} loaded.",
+        "version": get_model_version(model_summary),
+    }
+
+
+@router.delete("/models/{model_name}")
+def unload_model(
+    model_name: str,
+    version: str | None = None,
+    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+):
+    """
+    Function to unload all versions, or the given version, of a model from memory.
+    """
+    # Verify the JWT token, only admins may manage the loaded models
+    verify_admin_token(credentials)
+
+    keys = model_cache.unload(model_name, version)
+    if not keys:
+        raise ModelNotFoundException(f"Model {model_name} is not loaded.")
+    return {
+        "message": f"Model {model_name} unloaded.",
+        "versions": [key[1] for key in keys],
+    }
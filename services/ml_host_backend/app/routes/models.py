@@ -1,14 +1,31 @@
 import logging
 
-from fastapi import APIRouter, File, Security, UploadFile
+from fastapi import APIRouter, Body, File, Request, Security, UploadFile
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from ml_host_backend.app.services.auth_service import login_user, verify_token
+from ml_host_backend.app.schemas.prediction import (
+    BatchPredictionResponse,
+    PredictionResponse,
+)
+from ml_host_backend.app.services.artifact_cache import artifact_cache
+from ml_host_backend.app.services.auth_service import (
+    login_user,
+    refresh_tokens,
+    verify_token,
+)
+from ml_host_backend.app.services.inference_executor import inference_executor
+from ml_host_backend.app.services.mlflow_service import invalidate_cached_model_summary
+from ml_host_backend.app.services.model_cache import model_cache
 from ml_host_backend.app.services.models_service import (
     download_latest_model_version,
     list_summary_of_all_models,
     predict_image_classification,
+    predict_image_classification_batch,
     show_summary_of_single_model,
 )
+from ml_host_backend.app.services.prediction_cache import prediction_cache
+from ml_host_backend.app.services.token_cache import token_cache
+from starlette.concurrency import run_in_threadpool
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +46,67 @@ def get_summary_of_all_models(
     return list_summary_of_all_models(credentials)
 
 
+@router.get("/cache/stats")
+def get_model_cache_stats(
+    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+):
+    """
+    Function to show the loaded models and hit/miss/eviction counters of the model cache.
+    """
+    # Verify the JWT token
+    verify_token(credentials)
+
+    return model_cache.stats()
+
+
+@router.get("/cache/artifacts/stats")
+def get_artifact_cache_stats(
+    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+):
+    """
+    Function to show the cached model files and the disk usage of the artifact cache.
+    """
+    # Verify the JWT token
+    verify_token(credentials)
+
+    return artifact_cache.stats()
+
+
+@router.get("/cache/predictions/stats")
+def get_prediction_cache_stats(
+    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+):
+    """
+    Function to show the size and hit/miss counters of the prediction result cache.
+    """
+    # Verify the JWT token
+    verify_token(credentials)
+
+    return prediction_cache.stats()
+
+
+@router.get("/cache/tokens/stats")
+def get_token_cache_stats(
+    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+):
+    """
+    Function to show the size and hit/miss counters of the verified token cache.
+    """
+    # Verify the JWT token
+    verify_token(credentials)
+
+    return token_cache.stats()
+
+
+# registered before the /{model_name} routes, /{model_name}/refresh would match it
+@router.post("/login/refresh")
+def refresh_login(refresh_token: str = Body(..., embed=True)):
+    """
+    Function to exchange a refresh token for new tokens, without logging in again.
+    """
+    return refresh_tokens(refresh_token)
+
+
 @router.get("/{model_name}")
 def get_summary_of_single_model(
     model_name: str, credentials: HTTPAuthorizationCredentials = Security(HTTPBearer())
@@ -42,30 +120,49 @@ def get_summary_of_single_model(
     return show_summary_of_single_model(model_name, credentials)
 
 
+@router.post("/{model_name}/refresh")
+def refresh_model_summary(
+    model_name: str, credentials: HTTPAuthorizationCredentials = Security(HTTPBearer())
+):
+    """
+    Function to drop the cached summary of a model, so the next prediction uses the latest version.
+    """
+    # Verify the JWT token
+    verify_token(credentials)
+
+    invalidate_cached_model_summary(model_name)
+    return {"message": f"Cached summary of model {model_name} invalidated."}
+
+
 @router.post("/{model_name}/download")
 def download_model(
     model_name: str, credentials: HTTPAuthorizationCredentials = Security(HTTPBearer())
 ):
     """
-    Function to download a model
+    Function to download the latest version of a model into the local artifact cache
     """
     # Verify the JWT token
     verify_token(credentials)
 
     logger.info(f"Downloading model: {model_name}")
-    download_latest_model_version(model_name)
+    download = download_latest_model_version(model_name, credentials)
     logger.info(f"Model {model_name} downloaded successfully.")
-    return {"message": f"Model {model_name} downloaded successfully."}
+    return {"message": f"Model {model_name} downloaded successfully.", **download}
 
 
-@router.post("/{model_name}/predict/")
+@router.post(
+    "/{model_name}/predict/",
+    response_model=PredictionResponse,
+    response_class=ORJSONResponse,
+)
 async def make_prediction_for_image(
+    request: Request,
     model_name: str,
     file: UploadFile = File(...),
     credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
 ):
-    # Verify the JWT token
-    verify_token(credentials)
+    # Verify the JWT token off the event loop, it may fetch the keys of ML User Mgmt
+    await run_in_threadpool(verify_token, credentials)
 
     logger.info(f"Starting prediction for model: {model_name}")
     file_content = await file.read()
@@ -74,12 +171,46 @@ async def make_prediction_for_image(
     )
 
     logger.info(f"Performing prediction using model: {model_name}")
-    result = predict_image_classification(model_name, file_content, credentials)
+    # Run the blocking inference on the inference pool, to keep the event loop responsive
+    result = await inference_executor.run(
+        request, predict_image_classification, model_name, file_content, credentials
+    )
     logger.info(f"Prediction completed for model: {model_name}")
 
     return result
 
 
+@router.post(
+    "/{model_name}/predict/batch",
+    response_model=BatchPredictionResponse,
+    response_class=ORJSONResponse,
+)
+async def make_prediction_for_images(
+    request: Request,
+    model_name: str,
+    files: list[UploadFile] = File(...),
+    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+):
+    # Verify the JWT token off the event loop, it may fetch the keys of ML User Mgmt
+    await run_in_threadpool(verify_token, credentials)
+
+    logger.info(
+        f"Starting batch prediction of {len(files)} images for model: {model_name}"
+    )
+    file_contents = [(file.filename, await file.read()) for file in files]
+
+    result = await inference_executor.run(
+        request,
+        predict_image_classification_batch,
+        model_name,
+        file_contents,
+        credentials,
+    )
+    logger.info(f"Batch prediction completed for model: {model_name}")
+
+    return result
+
+
 @router.post("/login")
-async def login(username: str, password: str):
+def login(username: str, password: str):
     return login_user(username, password)
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class PredictionResponse(BaseModel):
+    """
+    Prediction of a single image
+    """
+
+    model_name: str
+    model_version: Optional[str] = None
+    predicted_class: str
+    probabilities: dict[str, float]
+
+
+class FilePrediction(BaseModel):
+    """
+    Prediction of a single image within a batch
+    """
+
+    file_name: Optional[str] = None
+    predicted_class: str
+    probabilities: dict[str, float]
+
+
+class BatchPredictionResponse(BaseModel):
+    """
+    Predictions of a batch of images, in the order of the uploaded files
+    """
+
+    model_name: str
+    model_version: Optional[str] = None
+    predictions: list[FilePrediction]
@@ -0,0 +1,258 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from ml_host_backend.app.exceptions.service_exceptions import (
+    ArtifactChecksumException,
+    ArtifactVersionException,
+)
+
+logger = logging.getLogger(__name__)
+
+# Whether models are loaded from the local artifact cache instead of the shared mlruns volume
+ARTIFACT_CACHE_ENABLED = os.getenv("ARTIFACT_CACHE_ENABLED", "false").lower() == "true"
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", "/tmp/ml_host_backend/artifacts")
+# Disk budget of the artifact cache in MB, least recently used artifacts are removed first
+ARTIFACT_CACHE_MAX_MB = int(os.getenv("ARTIFACT_CACHE_MAX_MB", "4096"))
+ARTIFACT_CHUNK_SIZE = 1024 * 1024
+# File extensions are kept, keras only loads files ending with .keras
+ARTIFACT_SUFFIXES = {"keras": ".keras"}
+DEFAULT_ARTIFACT_SUFFIX = ".tflite"
+
+
+class ArtifactCache:
+    """
+    Content addressed on-disk cache of model files.
+
+    Files are stored once per sha256 checksum in blobs/, an index maps
+    (model name, version, kind) to the checksum. Downloads are streamed into a temporary
+    file, verified against the checksum sent by the train hub and moved into place
+    atomically, so a file in blobs/ is always complete. Least recently used files are
+    removed, when the disk budget is exceeded.
+
+    The directory can be shared by several worker processes. The index is read again
+    on a miss and before every update, updates are serialized by a lock file, so the
+    workers don't overwrite or evict each other's entries.
+    """
+
+    def __init__(
+        self,
+        directory=ARTIFACT_CACHE_DIR,
+        max_bytes=ARTIFACT_CACHE_MAX_MB * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, "blobs")
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock_path = os.path.join(directory, "index.lock")
+        self.max_bytes = max_bytes
+        self._index = None  # "name/version/kind" -> entry, loaded on first use
+        self._lock = threading.Lock()
+        # One lock per key, so an artifact is only downloaded once by concurrent requests
+        self._download_locks = {}
+        self.hits = 0
+        self.downloads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(model_name, version, kind):
+        return f"{model_name}/{version}/{kind}"
+
+    def _blob_path(self, entry):
+        return os.path.join(self.blob_dir, entry["sha256"] + entry["suffix"])
+
+    def _read_index(self):
+        os.makedirs(self.blob_dir, exist_ok=True)
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        # drop entries, whose files were removed behind our back
+        return {
+            key: entry
+            for key, entry in index.items()
+            if os.path.isfile(self._blob_path(entry))
+        }
+
+    def _load_index(self):
+        # must be called holding the lock
+        if self._index is None:
+            self._index = self._read_index()
+
+    def _reload_index(self):
+        # must be called holding the lock, the more recent use times of this process are kept
+        index = self._read_index()
+        for key, entry in index.items():
+            known = (self._index or {}).get(key)
+            if known is not None and known["sha256"] == entry["sha256"]:
+                entry["last_used"] = max(entry["last_used"], known["last_used"])
+        self._index = index
+
+    @contextmanager
+    def _index_file_lock(self):
+        # serializes the index updates of all processes sharing the directory
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _save_index(self):
+        # must be called holding the lock, the index is replaced atomically
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".json.part")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def get(self, model_name, version, kind):
+        """
+        Return the local path of a cached artifact, or None.
+        """
+        key = self._key(model_name, version, kind)
+        with self._lock:
+            self._load_index()
+            entry = self._index.get(key)
+            if entry is None or not os.path.isfile(self._blob_path(entry)):
+                # another process might have downloaded or evicted it meanwhile
+                self._reload_index()
+                entry = self._index.get(key)
+            if entry is None:
+                return None
+            entry["last_used"] = time.time()
+            self.hits += 1
+            return self._blob_path(entry)
+
+    def fetch(self, model_name, version, kind, open_artifact):
+        """
+        Return the local path of an artifact, downloading it on a cache miss.
+        open_artifact() returns a streaming response of the given version of the artifact
+        with the X-Content-SHA256 and X-Model-Version headers.
+        """
+        path = self.get(model_name, version, kind)
+        if path is not None:
+            return path
+
+        key = self._key(model_name, version, kind)
+        with self._lock:
+            download_lock = self._download_locks.setdefault(key, threading.Lock())
+        with download_lock:
+            # another request might have downloaded it meanwhile
+            path = self.get(model_name, version, kind)
+            if path is not None:
+                return path
+            return self._download(model_name, version, kind, open_artifact)
+
+    def _download(self, model_name, version, kind, open_artifact):
+        response = open_artifact()
+        try:
+            expected_sha256 = response.headers.get("X-Content-SHA256")
+            served_version = response.headers.get("X-Model-Version", str(version))
+            if served_version != str(version):
+                # never cache the file of another version under the requested one
+                logger.error(
+                    f"Requested version {version} of {model_name}, but MLFlow serves version {served_version}."
+                )
+                raise ArtifactVersionException(
+                    f"Requested version {version} of model '{model_name}', but version {served_version} was served."
+                )
+            entry = {
+                "sha256": expected_sha256,
+                "suffix": ARTIFACT_SUFFIXES.get(kind, DEFAULT_ARTIFACT_SUFFIX),
+            }
+            if expected_sha256 and os.path.isfile(self._blob_path(entry)):
+                # same content is already cached for another key
+                logger.info(f"Artifact of {model_name} is already cached.")
+            else:
+                entry["sha256"] = self._stream_to_blob(response, entry, expected_sha256)
+        finally:
+            response.close()
+
+        entry["size"] = os.path.getsize(self._blob_path(entry))
+        entry["last_used"] = time.time()
+        with self._lock, self._index_file_lock():
+            self._reload_index()
+            self._index[self._key(model_name, version, kind)] = entry
+            self.downloads += 1
+            self._evict(keep_sha256=entry["sha256"])
+            self._save_index()
+        logger.info(
+            f"Cached {kind} artifact of {model_name} version {version} ({entry['size']} bytes)."
+        )
+        return self._blob_path(entry)
+
+    def _stream_to_blob(self, response, entry, expected_sha256):
+        os.makedirs(self.blob_dir, exist_ok=True)
+        sha256 = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size=ARTIFACT_CHUNK_SIZE):
+                    sha256.update(chunk)
+                    f.write(chunk)
+            checksum = sha256.hexdigest()
+            if expected_sha256 and checksum != expected_sha256:
+                logger.error(
+                    f"Checksum mismatch of downloaded artifact: {checksum} != {expected_sha256}"
+                )
+                raise ArtifactChecksumException()
+            entry["sha256"] = checksum
+            # atomic swap, readers never see a partially written file
+            os.replace(tmp_path, self._blob_path(entry))
+            return checksum
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self, keep_sha256=None):
+        # must be called holding the lock
+        blobs = {}  # sha256 -> (last used, size, keys)
+        for key, entry in self._index.items():
+            last_used, size, keys = blobs.get(entry["sha256"], (0, entry["size"], []))
+            blobs[entry["sha256"]] = (
+                max(last_used, entry["last_used"]),
+                size,
+                keys + [key],
+            )
+        total = sum(size for _, size, _ in blobs.values())
+        for sha256, (_, size, keys) in sorted(
+            blobs.items(), key=lambda item: item[1][0]
+        ):
+            if total <= self.max_bytes:
+                break
+            if sha256 == keep_sha256:
+                continue
+            for key in keys:
+                entry = self._index.pop(key)
+            try:
+                os.remove(self._blob_path(entry))
+            except OSError as e:
+                logger.warning(f"Failed to remove cached artifact {sha256}: {e}")
+            total -= size
+            self.evictions += 1
+            logger.info(f"Evicted cached artifact {sha256} of {keys}")
+
+    def stats(self):
+        with self._lock:
+            self._reload_index()
+            return {
+                "artifacts": sorted(self._index),
+                "bytes": sum(
+                    {e["sha256"]: e["size"] for e in self._index.values()}.values()
+                ),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "downloads": self.downloads,
+                "evictions": self.evictions,
+            }
+
+
+# our singleton artifact cache
+artifact_cache = ArtifactCache()
@@ -6,36 +6,147 @@ import jwt
 import requests
 from fastapi import Request, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from ml_host_backend.app.exceptions.client_exceptions import UnauthroizedException
+from ml_host_backend.app.exceptions.client_exceptions import (
+    ForbiddenException,
+    UnauthroizedException,
+)
 from ml_host_backend.app.exceptions.service_exceptions import (
     MLUserMgmtConfigurationException,
     MLUserMgmtException,
     MLUserMgmtUnavailableException,
 )
+from ml_host_backend.app.services.health_monitor import CircuitBreaker, health_monitor
+from ml_host_backend.app.services.http_client import create_session
+from ml_host_backend.app.services.token_cache import token_cache
+from shared.token_verification import (
+    RevocationList,
+    VerificationKeys,
+    VerificationRefresher,
+)
 
-JWT_SECRET = "secret"  # this should be specified in a vault in a real application
-JWT_ALGORITHM = "HS256"
+# ML User Mgmt signs its tokens with rotating RSA keys, which it publishes as JWKS
+JWT_ALGORITHM = "RS256"
+ACCESS_TOKEN_TYPE = "access"
+# Role claim of the tokens, which may use the admin routes
+ADMIN_ROLE = "admin"
 
 logger = logging.getLogger(__name__)
 
+# Timeouts in seconds per ML User Mgmt endpoint
+ML_USER_MGMT_TOKEN_TIMEOUT = float(os.getenv("ML_USER_MGMT_TOKEN_TIMEOUT", "10"))
+ML_USER_MGMT_JWKS_TIMEOUT = float(os.getenv("ML_USER_MGMT_JWKS_TIMEOUT", "2"))
+# Seconds the JWT verification keys are used, before they are fetched again in the background
+JWKS_TTL_SECONDS = float(os.getenv("JWKS_TTL_SECONDS", "300"))
+# Minimum seconds between two fetches of the keys or the revoked tokens, also after failures
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "10"))
+# Seconds between two syncs of the revoked token IDs
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "15"))
 
-def verify_jwt(jwtoken: str):
+# our singleton pooled HTTP session to ML User Mgmt
+session = create_session()
+
+# our singleton circuit breaker, which holds the availability of ML User Mgmt
+ml_user_mgmt_circuit_breaker = CircuitBreaker("ml_user_mgmt")
+
+
+def get_ml_user_mgmt_url(path):
+    ml_user_mgmt_host, ml_user_mgmt_port = get_ml_user_mgmt_host_and_port()
+    return f"http://{ml_user_mgmt_host}:{ml_user_mgmt_port}{path}"
+
+
+# our singleton cache of the JWT verification keys of ML User Mgmt
+verification_keys = VerificationKeys(
+    url=lambda: get_ml_user_mgmt_url("/.well-known/jwks.json"),
+    session=session,
+    timeout=ML_USER_MGMT_JWKS_TIMEOUT,
+    ttl_seconds=JWKS_TTL_SECONDS,
+    min_refresh_seconds=JWKS_MIN_REFRESH_SECONDS,
+)
+
+# our singleton list of the JWTs revoked at ML User Mgmt
+revocation_list = RevocationList(
+    url=lambda: get_ml_user_mgmt_url("/revoked"),
+    session=session,
+    timeout=ML_USER_MGMT_JWKS_TIMEOUT,
+    sync_seconds=REVOCATION_SYNC_SECONDS,
+    min_refresh_seconds=JWKS_MIN_REFRESH_SECONDS,
+)
+
+# our singleton background refresher of the keys and revocations, started at startup
+verification_refresher = VerificationRefresher(
+    verification_keys, revocation_list, interval_seconds=REVOCATION_SYNC_SECONDS
+)
+
+
+def get_verification_key(kid):
+    """
+    Function to get a cached verification key of ML User Mgmt. The keys are fetched again,
+    if the key ID is unknown, because ML User Mgmt rotated its signing key meanwhile.
+    """
+    key = verification_keys.get(kid)
+    if key is not None:
+        return key
+    if not verification_keys.is_loaded():
+        logger.error("No JWT verification keys of ML User Mgmt are available.")
+        raise MLUserMgmtUnavailableException(
+            "Could not fetch the JWT verification keys of ML User Mgmt."
+        )
+    raise UnauthroizedException("Invalid token.")
+
+
+def decode_jwt(jwtoken: str):
     try:
-        payload = jwt.decode(jwtoken, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-    except jwt.exceptions.InvalidTokenError:
-        logger.error("Invalid token.")
-        raise UnauthroizedException("Invalid token.")
+        header = jwt.get_unverified_header(jwtoken)
+        if header.get("alg") != JWT_ALGORITHM:
+            raise jwt.exceptions.InvalidAlgorithmError("Unsupported algorithm.")
+        key = get_verification_key(header.get("kid"))
+        payload = jwt.decode(jwtoken, key, algorithms=[JWT_ALGORITHM])
     except jwt.exceptions.ExpiredSignatureError:
         logger.error("Token is expired.")
         raise UnauthroizedException("Signature has expired.")
+    except jwt.exceptions.InvalidTokenError:
+        logger.error("Invalid token.")
+        raise UnauthroizedException("Invalid token.")
     if payload:
+        if payload.get("type", ACCESS_TOKEN_TYPE) != ACCESS_TOKEN_TYPE:
+            # refresh tokens are only accepted by ML User Mgmt
+            raise UnauthroizedException("Invalid token type.")
         if payload["expires"] >= time.time():
-            return True
+            return payload
         raise UnauthroizedException("Token is expired.")
     logger.error("Unable to retrieve token payload")
     raise UnauthroizedException("Unable to retrieve token payload")
 
 
+def check_not_revoked(payload):
+    if revocation_list.is_revoked(payload.get("jti")):
+        logger.error(f"Token {payload.get('jti')} is revoked.")
+        raise UnauthroizedException("Token is revoked.")
+
+
+def verify_jwt(jwtoken: str):
+    """
+    Function to verify a JWT and return its claims, the signature is only checked the first
+    time a token is seen, the revocation list is checked every time.
+    """
+    cached = token_cache.get(jwtoken)
+    if cached is not None:
+        payload, error = cached
+        if error is not None:
+            raise UnauthroizedException(error)
+        check_not_revoked(payload)
+        return payload
+
+    try:
+        payload = decode_jwt(jwtoken)
+    except UnauthroizedException as e:
+        token_cache.put_invalid(jwtoken, e.message)
+        raise
+    token_cache.put_valid(jwtoken, payload, payload["expires"])
+    check_not_revoked(payload)
+    return payload
+
+
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super(JWTBearer, self).__init__(auto_error=auto_error)
@@ -64,6 +175,19 @@ def verify_token(
     return verify_jwt(token)
 
 
+def verify_admin_token(
+    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+):
+    """
+    Function to verify a JWT, which must carry the admin role.
+    """
+    payload = verify_token(credentials)
+    if ADMIN_ROLE not in payload.get("roles", []):
+        logger.warning(f"User {payload.get('user_id')} is not allowed to administrate.")
+        raise ForbiddenException("Admin role required.")
+    return payload
+
+
 def get_ml_user_mgmt_host_and_port():
     ml_user_mgmt_host = os.getenv("ML_USER_MGMT_HOST")
     ml_user_mgmt_port = os.getenv("ML_USER_MGMT_PORT")
@@ -77,39 +201,73 @@ def get_ml_user_mgmt_host_and_port():
     return ml_user_mgmt_host, ml_user_mgmt_port
 
 
+def get_ml_user_mgmt_health_url():
+    return get_ml_user_mgmt_url("/health")
+
+
+# the health monitor probes ML User Mgmt in the background, not on the request path
+health_monitor.register(
+    "ml_user_mgmt", get_ml_user_mgmt_health_url, ml_user_mgmt_circuit_breaker
+)
+
+
 def check_service_availability_or_throw():
     ml_user_mgmt_host, ml_user_mgmt_port = get_ml_user_mgmt_host_and_port()
-    url = f"http://{ml_user_mgmt_host}:{ml_user_mgmt_port}/health"
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        logger.info("ML User Mgmt service is available.")
-        return ml_user_mgmt_host, ml_user_mgmt_port
-    except requests.exceptions.ConnectionError as e:
-        logger.error(
-            f"ML User Mgmt service is not available at provided host and port: {e}",
-            exc_info=True,
-        )
+    if not ml_user_mgmt_circuit_breaker.allow_request():
+        logger.error("ML User Mgmt service is not available, circuit is open.")
         raise MLUserMgmtUnavailableException(
             "ML User Mgmt service is not available at the provided host and port."
         )
+    return ml_user_mgmt_host, ml_user_mgmt_port
 
 
-def login_user(username: str, password: str):
-    logger.info("Beginning User Login")
+def request_tokens(path: str, payload: dict, unauthorized_message: str):
     ml_user_mgmt_host, ml_user_mgmt_port = check_service_availability_or_throw()
-    url = f"http://{ml_user_mgmt_host}:{ml_user_mgmt_port}/token"
+    url = f"http://{ml_user_mgmt_host}:{ml_user_mgmt_port}{path}"
     logger.info(f"Requesting token from ML User Mgmt at: {url}")
     try:
-        response = requests.post(
-            url, json={"username": username, "password": password}, timeout=10
+        response = session.post(
+            url,
+            json=payload,
+            timeout=ML_USER_MGMT_TOKEN_TIMEOUT,
         )
+        ml_user_mgmt_circuit_breaker.record_success()
         response.raise_for_status()
         data = response.json()
         return data
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        ml_user_mgmt_circuit_breaker.record_failure()
+        logger.error(
+            f"ML User Mgmt service is not available at provided host and port: {e}",
+            exc_info=True,
+        )
+        raise MLUserMgmtUnavailableException(
+            "ML User Mgmt service is not available at the provided host and port."
+        ) from e
     except requests.exceptions.HTTPError as err:
-        logger.error(f"Failed to login user: {err}", exc_info=True)
-        raise UnauthroizedException("Incorrect username or password")
+        logger.error(f"Failed to obtain token: {err}", exc_info=True)
+        raise UnauthroizedException(unauthorized_message)
     except Exception as e:
-        logger.error(f"Failed to login user: {e}", exc_info=True)
-        raise MLUserMgmtException(f"Failed to login user: {e}")
+        logger.error(f"Failed to obtain token: {e}", exc_info=True)
+        raise MLUserMgmtException(f"Failed to obtain token: {e}")
+
+
+def login_user(username: str, password: str):
+    logger.info("Beginning User Login")
+    return request_tokens(
+        "/token",
+        {"username": username, "password": password},
+        "Incorrect username or password",
+    )
+
+
+def refresh_tokens(refresh_token: str):
+    """
+    Function to exchange a refresh token for new tokens, without a full login.
+    """
+    logger.info("Refreshing user tokens")
+    return request_tokens(
+        "/token/refresh",
+        {"refresh_token": refresh_token},
+        "Invalid or expired refresh token",
+    )
@@ -0,0 +1,168 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from ml_host_backend.app.metrics import StageTimer
+from ml_host_backend.app.services.inference_executor import INFERENCE_WORKERS
+from ml_host_backend.app.startup_timing import lazy_import
+
+# tensorflow is imported on first use, to keep startup fast
+tf = lazy_import("tensorflow")
+
+logger = logging.getLogger(__name__)
+
+# Time window in which concurrent requests are collected into one batch, 0 disables batching
+MICRO_BATCH_WINDOW_MS = float(os.getenv("MICRO_BATCH_WINDOW_MS", "5"))
+# Maximum number of requests predicted together in one forward pass, the blocking requests
+# are submitted by the inference workers, so larger batches than INFERENCE_WORKERS never occur
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", str(INFERENCE_WORKERS)))
+# Seconds without requests, after which the micro batcher of a model is stopped, so batchers
+# of evicted, unloaded or outdated model versions don't keep running
+MICRO_BATCH_IDLE_SECONDS = float(os.getenv("MICRO_BATCH_IDLE_SECONDS", "60"))
+
+
+class _BatchItem:
+    def __init__(self, model, image):
+        self.model = model
+        self.image = image
+        self.future = Future()
+
+
+class MicroBatcher:
+    """
+    Collects single image predictions for one model, which arrive within a time window,
+    and predicts them with one forward pass. Every caller receives its own row of the result.
+
+    After idle_seconds without requests on_idle(batcher) is called, the batcher thread
+    stops, if it returns True.
+    """
+
+    def __init__(
+        self,
+        name,
+        window_seconds=MICRO_BATCH_WINDOW_MS / 1000,
+        max_batch_size=MICRO_BATCH_MAX_SIZE,
+        timer=None,
+        idle_seconds=None,
+        on_idle=None,
+    ):
+        self.name = name
+        # labels the batch size metric with the model name and version
+        self.timer = timer or StageTimer(name)
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.idle_seconds = idle_seconds
+        self.on_idle = on_idle
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name=f"micro-batcher-{name}", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, model, image):
+        """
+        Queue a single prepared image, returns a future resolving to its prediction row.
+        """
+        item = _BatchItem(model, image)
+        self._queue.put(item)
+        return item.future
+
+    def predict(self, model, image):
+        return self.submit(model, image).result()
+
+    def is_idle(self):
+        return self._queue.empty()
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.idle_seconds)
+            except queue.Empty:
+                if self.on_idle is not None and self.on_idle(self):
+                    logger.debug(f"Stopped the idle micro batcher of {self.name}")
+                    return
+                continue
+            batch = self._collect_batch(first)
+            # A model can be reloaded while requests are queued, predict per model object
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item.model), []).append(item)
+            for items in groups.values():
+                self._predict_batch(items)
+
+    def _predict_batch(self, items):
+        try:
+            image_batch = tf.stack([item.image for item in items], axis=0)
+            preds = items[0].model.predict(image_batch)
+        except Exception as e:
+            logger.error(f"Batch prediction failed for {self.name}: {e}", exc_info=True)
+            for item in items:
+                item.future.set_exception(e)
+            return
+        self.timer.observe_batch_size(len(items), path="micro_batch")
+        logger.debug(f"Predicted a batch of {len(items)} images for {self.name}")
+        for index, item in enumerate(items):
+            item.future.set_result(preds[index])
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def _remove_idle_batcher(key, batcher):
+    # requests are submitted holding the lock, so none is lost, when the batcher stops
+    with _batchers_lock:
+        if not batcher.is_idle():
+            return False
+        if _batchers.get(key) is batcher:
+            del _batchers[key]
+        return True
+
+
+def submit_to_batcher(key, model, image):
+    """
+    Function to queue a prepared image at the micro batcher of a model, it is created
+    on first use and stopped after MICRO_BATCH_IDLE_SECONDS without requests.
+    """
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = MicroBatcher(
+                name=f"{key[0]}:{key[1]}",
+                timer=StageTimer(key[0], key[1]),
+                idle_seconds=MICRO_BATCH_IDLE_SECONDS,
+                on_idle=lambda idle_batcher: _remove_idle_batcher(key, idle_batcher),
+            )
+            _batchers[key] = batcher
+        return batcher.submit(model, image)
+
+
+def predict_single_image(key, model, image):
+    """
+    Function to predict a single prepared image, batched together with concurrent
+    requests for the same model if micro batching is enabled.
+    """
+    if MICRO_BATCH_WINDOW_MS <= 0 or MICRO_BATCH_MAX_SIZE <= 1:
+        StageTimer(key[0], key[1]).observe_batch_size(1, path="single")
+        image_batch = tf.expand_dims(image, axis=0)
+        return model.predict(image_batch)[0]
+    return submit_to_batcher(key, model, image).result()
@@ -0,0 +1,65 @@
+import logging
+import os
+
+from ml_host_backend.app.startup_timing import lazy_import
+
+# tensorflow is imported on first use, to keep startup fast
+tf = lazy_import("tensorflow")
+
+logger = logging.getLogger(__name__)
+
+# Whether loaded models predict through a compiled tf.function instead of model.predict
+COMPILED_INFERENCE = os.getenv("COMPILED_INFERENCE", "true").lower() == "true"
+# Whether the compiled inference function is compiled with XLA
+INFERENCE_JIT_COMPILE = os.getenv("INFERENCE_JIT_COMPILE", "false").lower() == "true"
+
+
+class CompiledModel:
+    """
+    Wraps a Keras model with a tf.function, which is traced once for the model input shape
+    and reused for every request. Unlike model.predict, calls don't set up a data adapter
+    and callbacks, which dominates the forward pass for small batches.
+    """
+
+    def __init__(self, model, jit_compile=INFERENCE_JIT_COMPILE):
+        self.model = model
+        self.jit_compile = jit_compile
+        input_signature = [
+            tf.TensorSpec(shape=(None, *model.input_shape[1:]), dtype=tf.float32)
+        ]
+        self._forward = tf.function(
+            lambda images: model(images, training=False),
+            input_signature=input_signature,
+            jit_compile=jit_compile,
+            autograph=False,
+        )
+        # trace now, so failures surface when the model is loaded and not on a request
+        self._forward.get_concrete_function()
+
+    @property
+    def input_shape(self):
+        return self.model.input_shape
+
+    @property
+    def weights(self):
+        return self.model.weights
+
+    def predict(self, images):
+        images = tf.convert_to_tensor(images, dtype=tf.float32)
+        return self._forward(images).numpy()
+
+
+def compile_model(model, jit_compile=INFERENCE_JIT_COMPILE):
+    """
+    Function to wrap a loaded Keras model with a compiled inference function.
+    Falls back to the model itself, i.e. model.predict, if the model can't be traced.
+    """
+    if not COMPILED_INFERENCE or not isinstance(model, tf.keras.Model):
+        return model
+    try:
+        return CompiledModel(model, jit_compile=jit_compile)
+    except Exception as e:
+        logger.warning(
+            f"Could not compile inference function, using model.predict: {e}"
+        )
+        return model
@@ -1,5 +1,9 @@
+import hashlib
+import json
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import gdown
 from dotenv import load_dotenv
@@ -9,6 +13,7 @@ from ml_host_backend.app.exceptions.service_exceptions import (
     GoogleDriveServiceException,
     ModelNotFoundException,
 )
+from ml_host_backend.app.services.metadata_cache import MetadataCache
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -19,11 +24,41 @@ load_dotenv()
 
 MODEL_FOLDER = os.path.join(".", "data/models")
 DRIVE_URL = os.getenv("GOOGLE_DRIVE_URL")
+# Template of the file download URL, {id} is replaced by the Google Drive file ID
+DRIVE_DOWNLOAD_URL = os.getenv(
+    "GOOGLE_DRIVE_DOWNLOAD_URL", "https://drive.google.com/uc?id={id}"
+)
+# Seconds the folder listing is used, before the folder is scanned again
+DRIVE_LISTING_TTL_SECONDS = float(os.getenv("GOOGLE_DRIVE_LISTING_TTL_SECONDS", "300"))
+# Maximum number of models downloaded at the same time
+DRIVE_DOWNLOAD_WORKERS = int(os.getenv("GOOGLE_DRIVE_DOWNLOAD_WORKERS", "4"))
+# Suffix of the metadata file, which is stored next to every downloaded model
+METADATA_SUFFIX = ".meta.json"
+
+# our singleton cache of the folder listing, keyed by the folder URL
+folder_listing_cache = MetadataCache(
+    ttl_seconds=DRIVE_LISTING_TTL_SECONDS, max_stale_seconds=0
+)
+
+# One lock per model file, so a model is only downloaded once by concurrent requests
+_download_locks = {}
+_download_locks_lock = threading.Lock()
 
 
 def get_list_of_models_from_google_drive():
     """
-    Function to load a list of models from Google Drive.
+    Function to load a list of models from Google Drive, the listing is cached.
+    """
+    return folder_listing_cache.get(DRIVE_URL, scan_google_drive_folder)
+
+
+def invalidate_google_drive_listing():
+    folder_listing_cache.invalidate()
+
+
+def scan_google_drive_folder():
+    """
+    Function to scan the Google Drive folder for models, without downloading them.
     """
 
     # Ensure the model folder exists
@@ -58,9 +93,55 @@ def get_list_of_models_from_google_drive():
     return file_list
 
 
+def get_file_size_and_sha256(path, chunk_size=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return os.path.getsize(path), sha256.hexdigest()
+
+
+def read_download_metadata(model_path):
+    try:
+        with open(model_path + METADATA_SUFFIX) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_download_metadata(model_path, metadata):
+    # the metadata file is replaced atomically
+    tmp_path = model_path + METADATA_SUFFIX + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(metadata, f)
+    os.replace(tmp_path, model_path + METADATA_SUFFIX)
+
+
+def remove_partial_downloads(model_path):
+    # gdown resumes from <file name>*.part files in the model folder
+    folder, file_name = os.path.split(model_path)
+    for file in os.listdir(folder):
+        if file.startswith(file_name) and file.endswith(".part"):
+            os.remove(os.path.join(folder, file))
+
+
+def is_downloaded(model_path, file_id, metadata):
+    """
+    Function to check, if an identical copy of a Drive file is already stored locally,
+    i.e. the recorded file ID, size and sha256 of the completed download match.
+    """
+    if not metadata or metadata.get("id") != file_id or not os.path.isfile(model_path):
+        return False
+    if os.path.getsize(model_path) != metadata.get("size"):
+        return False
+    return get_file_size_and_sha256(model_path)[1] == metadata.get("sha256")
+
+
 def download_model_from_google_drive(model_file_name: str):
     """
     Function to load a model from Google Drive.
+    The download is skipped, if an identical copy is already stored locally,
+    and an interrupted download is resumed.
     """
 
     logger.info(f"Attempting to load model '{model_file_name}' from Google Drive.")
@@ -80,24 +161,77 @@ def download_model_from_google_drive(model_file_name: str):
             f"File '{model_file_name}' not found in the Google Drive folder."
         )
 
-    # Construct the download URL using image ID
-    output = os.path.join(MODEL_FOLDER, model_file_name)
-
-    try:
-        logger.info(
-            f"Downloading model '{model_file_name}' with ID '{file_to_download[0]}'."
-        )
-        gdown.download(id=file_to_download[0], output=output, quiet=False)
-        logger.info(f"Successfully downloaded model '{model_file_name}'.")
-    except Exception as e:
-        logger.error(
-            f"Error occurred while downloading model '{model_file_name}'.",
-            exc_info=True,
-        )
-        raise GoogleDriveDownloadException(
-            "Could not download the model from Google Drive."
-        ) from e
-
+    os.makedirs(MODEL_FOLDER, exist_ok=True)
     model_path = os.path.join(MODEL_FOLDER, model_file_name)
+    file_id = file_to_download[0]
+
+    with _download_locks_lock:
+        download_lock = _download_locks.setdefault(model_path, threading.Lock())
+    with download_lock:
+        metadata = read_download_metadata(model_path)
+        if is_downloaded(model_path, file_id, metadata):
+            logger.info(f"Model '{model_file_name}' is already downloaded.")
+            return model_path
+
+        # a complete file, which doesn't match, would be skipped by the resume
+        if os.path.exists(model_path):
+            os.remove(model_path)
+        # only partial downloads of the same file are resumed
+        if not metadata or metadata.get("id") != file_id:
+            remove_partial_downloads(model_path)
+            write_download_metadata(model_path, {"id": file_id})
+
+        try:
+            logger.info(f"Downloading model '{model_file_name}' with ID '{file_id}'.")
+            gdown.download(
+                url=DRIVE_DOWNLOAD_URL.format(id=file_id),
+                output=model_path,
+                quiet=False,
+                resume=True,
+            )
+            size, sha256 = get_file_size_and_sha256(model_path)
+            write_download_metadata(
+                model_path, {"id": file_id, "size": size, "sha256": sha256}
+            )
+            logger.info(f"Successfully downloaded model '{model_file_name}'.")
+        except Exception as e:
+            logger.error(
+                f"Error occurred while downloading model '{model_file_name}'.",
+                exc_info=True,
+            )
+            raise GoogleDriveDownloadException(
+                "Could not download the model from Google Drive."
+            ) from e
+
     logger.debug(f"Model saved at: {model_path}")
     return model_path
+
+
+def download_models_from_google_drive(
+    model_file_names, max_workers=DRIVE_DOWNLOAD_WORKERS
+):
+    """
+    Function to load several models from Google Drive in parallel.
+    Returns a dictionary of model file name to local path.
+    """
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="drive-download"
+    ) as executor:
+        futures = {
+            name: executor.submit(download_model_from_google_drive, name)
+            for name in model_file_names
+        }
+
+    model_paths = {}
+    failed = []
+    for name, future in futures.items():
+        try:
+            model_paths[name] = future.result()
+        except Exception as e:
+            logger.error(f"Failed to download model '{name}': {e}")
+            failed.append(name)
+    if failed:
+        raise GoogleDriveDownloadException(
+            f"Could not download the models {failed} from Google Drive."
+        )
+    return model_paths
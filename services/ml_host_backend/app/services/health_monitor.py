@@ -0,0 +1,154 @@
+import logging
+import os
+import threading
+import time
+
+from ml_host_backend.app.metrics import DEPENDENCY_UP
+from ml_host_backend.app.services.http_client import create_session
+
+logger = logging.getLogger(__name__)
+
+# Interval in seconds between two background health probes of a dependency
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "10"))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+# Number of consecutive failures, after which the circuit opens and requests fail fast
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(
+    os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "3")
+)
+# Seconds an open circuit waits, before a trial request is let through again
+CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Keeps the up/down state of a dependency. After failure_threshold consecutive failures
+    the circuit opens and requests fail fast, until reset_seconds have passed. Then
+    requests are let through again and the first success closes the circuit.
+    """
+
+    def __init__(
+        self,
+        name,
+        failure_threshold=CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        reset_seconds=CIRCUIT_BREAKER_RESET_SECONDS,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+        DEPENDENCY_UP.labels(dependency=self.name).set(1)
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = HALF_OPEN
+                logger.info(f"Circuit of {self.name} is half open, trying again.")
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"{self.name} is available again, closing circuit.")
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+        DEPENDENCY_UP.labels(dependency=self.name).set(1)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"{self.name} is unavailable, opening circuit.")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                DEPENDENCY_UP.labels(dependency=self.name).set(0)
+
+    def status(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+class HealthMonitor:
+    """
+    Background thread, which probes the /health endpoint of every registered dependency
+    and feeds the result into the dependency's circuit breaker.
+    """
+
+    def __init__(
+        self,
+        interval_seconds=HEALTH_CHECK_INTERVAL_SECONDS,
+        timeout_seconds=HEALTH_CHECK_TIMEOUT_SECONDS,
+    ):
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self._dependencies = {}  # name -> (health url function, circuit breaker)
+        self._session = create_session(pool_connections=4, pool_maxsize=1)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, name, health_url, breaker):
+        """
+        Register a dependency, health_url is a function returning its health endpoint URL.
+        """
+        self._dependencies[name] = (health_url, breaker)
+
+    def check(self, name):
+        health_url, breaker = self._dependencies[name]
+        try:
+            url = health_url()
+            response = self._session.get(url, timeout=self.timeout_seconds)
+            response.raise_for_status()
+            breaker.record_success()
+            return True
+        except Exception as e:
+            logger.warning(f"Health check of {name} failed: {e}")
+            breaker.record_failure()
+            return False
+
+    def check_all(self):
+        for name in list(self._dependencies):
+            self.check(name)
+
+    def status(self):
+        return {
+            name: breaker.status() for name, (_, breaker) in self._dependencies.items()
+        }
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="health-monitor", daemon=True
+        )
+        self._thread.start()
+        logger.info("Started health monitor of dependencies.")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout_seconds + 1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check_all()
+            self._stop.wait(self.interval_seconds)
+
+
+# our singleton health monitor
+health_monitor = HealthMonitor()
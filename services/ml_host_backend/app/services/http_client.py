@@ -0,0 +1,31 @@
+import logging
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Number of hosts, for which a connection pool is kept
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))
+# Maximum number of keep-alive connections per host
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+
+
+def create_session(
+    pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE
+):
+    """
+    Function to create a HTTP session, which reuses keep-alive connections to the
+    services it talks to, instead of opening a new TCP connection per request.
+    If more than pool_maxsize requests run concurrently, the additional connections
+    are closed after use.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    logger.debug(
+        f"Created HTTP session with {pool_connections} pools of {pool_maxsize} connections."
+    )
+    return session
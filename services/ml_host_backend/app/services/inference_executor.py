@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ml_host_backend.app.exceptions.client_exceptions import (
+    ClientDisconnectedException,
+)
+from ml_host_backend.app.exceptions.service_exceptions import (
+    InferenceQueueFullException,
+)
+from ml_host_backend.app.metrics import (
+    INFERENCE_CANCELLED,
+    INFERENCE_IN_PROGRESS,
+    INFERENCE_QUEUE_DEPTH,
+    INFERENCE_REJECTED,
+)
+
+logger = logging.getLogger(__name__)
+
+# Number of inference jobs running at the same time
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "8"))
+# Number of inference jobs waiting for a free worker, before new jobs are rejected
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+# Interval in seconds in which waiting requests check, if the client is still connected
+DISCONNECT_POLL_INTERVAL = 0.1
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool, which runs blocking inference off the event loop.
+    Jobs beyond the queue limit are rejected and jobs of disconnected clients are cancelled.
+    """
+
+    def __init__(self, max_workers=INFERENCE_WORKERS, max_queue=INFERENCE_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="inference"
+        )
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+
+    def _update_metrics(self):
+        INFERENCE_QUEUE_DEPTH.set(self.queued)
+        INFERENCE_IN_PROGRESS.set(self.running)
+
+    def _call(self, fn, args):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self._update_metrics()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self._update_metrics()
+
+    def _on_done(self, future):
+        # Jobs cancelled before they were started never reach _call
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+                self._update_metrics()
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self.queued + self.running >= self.max_workers + self.max_queue:
+                INFERENCE_REJECTED.inc()
+                logger.warning("Inference queue is full, rejecting request.")
+                raise InferenceQueueFullException()
+            self.queued += 1
+            self._update_metrics()
+        future = self._executor.submit(self._call, fn, args)
+        future.add_done_callback(self._on_done)
+        return future
+
+    async def run(self, request, fn, *args):
+        """
+        Run fn(*args) on the inference pool and wait for it without blocking the event loop.
+        If the client of request disconnects while waiting, the job is cancelled.
+        """
+        future = self.submit(fn, *args)
+        wrapped = asyncio.wrap_future(future)
+        try:
+            while True:
+                done, _ = await asyncio.wait(
+                    {wrapped}, timeout=DISCONNECT_POLL_INTERVAL
+                )
+                if done:
+                    return wrapped.result()
+                if request is not None and await request.is_disconnected():
+                    self._cancel(future)
+                    raise ClientDisconnectedException()
+        except asyncio.CancelledError:
+            self._cancel(future)
+            raise
+
+    def _cancel(self, future):
+        INFERENCE_CANCELLED.inc()
+        if future.cancel():
+            logger.info("Client disconnected, cancelled queued inference job.")
+        else:
+            # A running job can't be interrupted, its result is discarded
+            logger.info("Client disconnected, discarding result of running job.")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+            }
+
+
+# our singleton inference executor
+inference_executor = InferenceExecutor()
@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataCache:
+    """
+    In-memory cache with a per-entry time to live and stale-while-revalidate.
+
+    Fresh entries are returned directly. Entries older than ttl_seconds, but younger than
+    ttl_seconds + max_stale_seconds, are still returned while a background thread refreshes
+    them. Older entries and misses are fetched synchronously.
+    """
+
+    def __init__(self, ttl_seconds, max_stale_seconds):
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._entries = {}  # key -> (value, fetched at)
+        self._refreshing = set()
+        # bumped on invalidation, so running refreshes don't restore invalidated entries
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key, fetch):
+        """
+        Return the cached value for key, fetch() is used to (re)load the value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = time.monotonic() - fetched_at
+                if age < self.ttl_seconds:
+                    self.hits += 1
+                    return value
+                if age < self.ttl_seconds + self.max_stale_seconds:
+                    self.stale_hits += 1
+                    self._refresh_in_background(key, fetch)
+                    return value
+            self.misses += 1
+            generation = self._generation
+
+        value = fetch()
+        self._store(key, value, generation)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+
+    def invalidate(self, key=None):
+        """
+        Remove a single entry or, if no key is given, all entries from the cache.
+        """
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.stale_hits = 0
+            self.misses = 0
+
+    def _refresh_in_background(self, key, fetch):
+        # must be called holding the lock, only one refresh per key at a time
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        threading.Thread(
+            target=self._refresh,
+            args=(key, fetch, self._generation),
+            name=f"refresh-{key}",
+            daemon=True,
+        ).start()
+
+    def _store(self, key, value, generation):
+        # the fetched value is dropped, if the cache was invalidated while fetching it
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (value, time.monotonic())
+
+    def _refresh(self, key, fetch, generation):
+        try:
+            value = fetch()
+            self._store(key, value, generation)
+            logger.debug(f"Refreshed cached metadata for {key}")
+        except Exception as e:
+            # keep serving the stale entry until it expires
+            logger.warning(f"Failed to refresh cached metadata for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
@@ -8,9 +8,36 @@ from ml_host_backend.app.exceptions.service_exceptions import (
     MLFlowUnavailableException,
     ModelNotFoundException,
 )
+from ml_host_backend.app.services.health_monitor import CircuitBreaker, health_monitor
+from ml_host_backend.app.services.http_client import create_session
+from ml_host_backend.app.services.metadata_cache import MetadataCache
 
 logger = logging.getLogger(__name__)
 
+# Seconds a cached model summary is used without refreshing it
+MODEL_METADATA_TTL_SECONDS = float(os.getenv("MODEL_METADATA_TTL_SECONDS", "30"))
+# Seconds an expired model summary is still used, while it is refreshed in the background
+MODEL_METADATA_MAX_STALE_SECONDS = float(
+    os.getenv("MODEL_METADATA_MAX_STALE_SECONDS", "300")
+)
+
+# Timeouts in seconds per train hub endpoint
+MLFLOW_MODELS_TIMEOUT = float(os.getenv("MLFLOW_MODELS_TIMEOUT", "10"))
+# Timeout in seconds between two received chunks of a model artifact download
+MLFLOW_ARTIFACT_TIMEOUT = float(os.getenv("MLFLOW_ARTIFACT_TIMEOUT", "60"))
+
+# our singleton pooled HTTP session to the train hub
+session = create_session()
+
+# our singleton circuit breaker, which holds the availability of the train hub
+mlflow_circuit_breaker = CircuitBreaker("mlflow")
+
+# our singleton cache of model summaries, keyed by model name
+model_summary_cache = MetadataCache(
+    ttl_seconds=MODEL_METADATA_TTL_SECONDS,
+    max_stale_seconds=MODEL_METADATA_MAX_STALE_SECONDS,
+)
+
 
 def get_mlflow_host_and_port():
     mlflow_host = os.getenv("MLFLOW_HOST")
@@ -23,23 +50,34 @@ def get_mlflow_host_and_port():
     return mlflow_host, mlflow_port
 
 
+def get_mlflow_health_url():
+    mlflow_host, mlflow_port = get_mlflow_host_and_port()
+    return f"http://{mlflow_host}:{mlflow_port}/health"
+
+
+# the health monitor probes the train hub in the background, not on the request path
+health_monitor.register("mlflow", get_mlflow_health_url, mlflow_circuit_breaker)
+
+
 def check_service_availability_or_throw():
     mlflow_host, mlflow_port = get_mlflow_host_and_port()
-    print(mlflow_port)
-    url = f"http://{mlflow_host}:{mlflow_port}/health"
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        logger.info("MLFlow service is available.")
-        return mlflow_host, mlflow_port
-    except requests.exceptions.ConnectionError as e:
-        logger.error(
-            f"MLFlow service is not available at provided host and port: {e}",
-            exc_info=True,
-        )
+    if not mlflow_circuit_breaker.allow_request():
+        logger.error("MLFlow service is not available, circuit is open.")
         raise MLFlowUnavailableException(
             "MLFlow service is not available at the provided host and port."
         )
+    return mlflow_host, mlflow_port
+
+
+def handle_connection_error(e):
+    mlflow_circuit_breaker.record_failure()
+    logger.error(
+        f"MLFlow service is not available at provided host and port: {e}",
+        exc_info=True,
+    )
+    raise MLFlowUnavailableException(
+        "MLFlow service is not available at the provided host and port."
+    ) from e
 
 
 def list_all_models_from_mlflow(credentials):
@@ -49,24 +87,32 @@ def list_all_models_from_mlflow(credentials):
     headers = {"Authorization": f"Bearer {credentials.credentials}"}
     logger.info(f"Fetching models summary from MLFlow at: {url}")
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = session.get(url, headers=headers, timeout=MLFLOW_MODELS_TIMEOUT)
+        mlflow_circuit_breaker.record_success()
         response.raise_for_status()
         data = response.json()
         if isinstance(data, dict) and "models" in data:
             return data["models"]
         return data
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        handle_connection_error(e)
     except Exception as e:
         logger.error(f"Failed to fetch models summary from MLFlow: {e}", exc_info=True)
         raise MLFlowException(f"Failed to fetch models summary from MLFlow: {e}")
 
 
 def get_single_model_summary_from_mlflow(model_name: str, credentials):
+    """
+    Function to fetch the summary of a single model from MLFlow, uncached.
+    Only the metadata cache stores the fetched summaries.
+    """
     logger.info(f"Fetching summary for model: {model_name} from MLFlow.")
     mlflow_host, mlflow_port = check_service_availability_or_throw()
     url = f"http://{mlflow_host}:{mlflow_port}/models/{model_name}"
     headers = {"Authorization": f"Bearer {credentials.credentials}"}
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = session.get(url, headers=headers, timeout=MLFLOW_MODELS_TIMEOUT)
+        mlflow_circuit_breaker.record_success()
         if response.status_code == 404:
             logger.warning(f"Model not found: {model_name}")
             raise ModelNotFoundException(message=f"Model '{model_name}' not found")
@@ -79,6 +125,72 @@ def get_single_model_summary_from_mlflow(model_name: str, credentials):
         return data
     except ModelNotFoundException:
         raise
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        handle_connection_error(e)
     except Exception as e:
         logger.error(f"Failed to fetch model summary from MLFlow: {e}", exc_info=True)
         raise MLFlowException(f"Failed to fetch model summary from MLFlow: {e}")
+
+
+def open_model_artifact_from_mlflow(
+    model_name: str, kind: str, credentials, version=None
+):
+    """
+    Function to request the model file of a version of a model from MLFlow, by default
+    of the latest version. Returns the streaming response, the caller reads its content
+    in chunks and closes it.
+    """
+    logger.info(f"Downloading {kind} artifact of model: {model_name} from MLFlow.")
+    mlflow_host, mlflow_port = check_service_availability_or_throw()
+    url = f"http://{mlflow_host}:{mlflow_port}/models/{model_name}/artifact"
+    headers = {"Authorization": f"Bearer {credentials.credentials}"}
+    try:
+        response = session.get(
+            url,
+            headers=headers,
+            params=(
+                {"kind": kind}
+                if version is None
+                else {"kind": kind, "version": version}
+            ),
+            stream=True,
+            timeout=MLFLOW_ARTIFACT_TIMEOUT,
+        )
+        mlflow_circuit_breaker.record_success()
+        if response.status_code == 404:
+            response.close()
+            logger.warning(f"No {kind} artifact found for model: {model_name}")
+            raise ModelNotFoundException(
+                message=f"No {kind} artifact found for model '{model_name}'"
+            )
+        response.raise_for_status()
+        return response
+    except ModelNotFoundException:
+        raise
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        handle_connection_error(e)
+    except Exception as e:
+        logger.error(
+            f"Failed to download model artifact from MLFlow: {e}", exc_info=True
+        )
+        raise MLFlowException(f"Failed to download model artifact from MLFlow: {e}")
+
+
+def get_cached_model_summary_from_mlflow(model_name: str, credentials):
+    """
+    Function to get the summary of a single model from the metadata cache.
+    Expired summaries are refreshed in the background, so MLFlow is only queried
+    on the request path for unknown models.
+    """
+    return model_summary_cache.get(
+        model_name,
+        lambda: get_single_model_summary_from_mlflow(model_name, credentials),
+    )
+
+
+def invalidate_cached_model_summary(model_name: str = None):
+    """
+    Function to drop the cached summary of a model, or of all models if no name is given.
+    """
+    logger.info(f"Invalidating cached model summary for: {model_name or 'all models'}")
+    model_summary_cache.invalidate(model_name)
@@ -0,0 +1,371 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from ml_host_backend.app.exceptions.service_exceptions import (
+    ModelMemoryBudgetException,
+)
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of models kept in memory at the same time
+MODEL_CACHE_MAX_MODELS = int(os.getenv("MODEL_CACHE_MAX_MODELS", "4"))
+# Memory budget for all cached models in MB, 0 disables the budget
+MODEL_CACHE_MAX_MB = int(os.getenv("MODEL_CACHE_MAX_MB", "0"))
+# Budget of the resident memory (RSS) of the whole process in MB, 0 disables the budget
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+# Batch size, for which the activation memory of a model is estimated
+MODEL_ACTIVATION_BATCH_SIZE = int(os.getenv("MODEL_ACTIVATION_BATCH_SIZE", "16"))
+
+
+def get_process_rss_bytes():
+    """
+    Resident memory of this process, None if it can't be read (e.g. not on Linux).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def estimate_model_bytes(model):
+    """
+    Approximate the memory held by the weights of a Keras model.
+    """
+    # models, which aren't Keras models, report their size themselves
+    model_bytes = getattr(model, "model_bytes", None)
+    if isinstance(model_bytes, int):
+        return model_bytes
+    try:
+        return int(
+            sum(
+                int(np.prod(weight.shape)) * np.dtype(weight.dtype).itemsize
+                for weight in model.weights
+            )
+        )
+    except Exception as e:
+        logger.warning(f"Could not estimate model size: {e}")
+        return 0
+
+
+def _iter_leaf_layers(layers):
+    for layer in layers:
+        sublayers = getattr(layer, "layers", None)
+        if isinstance(sublayers, list) and sublayers:
+            yield from _iter_leaf_layers(sublayers)
+        else:
+            yield layer
+
+
+def estimate_activation_bytes(model, batch_size=MODEL_ACTIVATION_BATCH_SIZE):
+    """
+    Approximate the peak memory of the activations of a Keras model during a forward pass.
+    The input and output of a layer are alive at the same time, so the peak is estimated
+    by the two largest layer outputs.
+    """
+    activation_bytes = getattr(model, "activation_bytes", None)
+    if isinstance(activation_bytes, int):
+        return activation_bytes
+    # compiled models wrap the Keras model
+    layers = getattr(getattr(model, "model", model), "layers", None)
+    if not isinstance(layers, list):
+        # not a Keras model, e.g. a TFLite interpreter with a preallocated arena
+        return 0
+    output_bytes = []
+    try:
+        for layer in _iter_leaf_layers(layers):
+            try:
+                outputs = layer.output
+            except Exception:
+                # layers, which were never called, have no output
+                continue
+            for output in outputs if isinstance(outputs, (list, tuple)) else [outputs]:
+                output_bytes.append(
+                    int(np.prod([int(dim) for dim in output.shape[1:]]))
+                    * np.dtype(output.dtype).itemsize
+                )
+    except Exception as e:
+        logger.warning(f"Could not estimate activation size: {e}")
+        return 0
+    return sum(sorted(output_bytes)[-2:]) * batch_size
+
+
+class ResidentModel:
+    """
+    A loaded model with its estimated resident memory and usage.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.param_bytes = estimate_model_bytes(model)
+        self.activation_bytes = estimate_activation_bytes(model)
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.hits = 0
+
+    @property
+    def size_bytes(self):
+        return self.param_bytes + self.activation_bytes
+
+
+class _LoadLock:
+    """
+    Lock of the loads of one model, with the number of requests holding or waiting for it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+class ModelCache:
+    """
+    Thread-safe LRU cache for loaded models, keyed by (model name, version).
+    Models are evicted least recently used first, as soon as either the maximum
+    number of models or the memory budget is exceeded.
+
+    With a memory budget for the process, the estimated size of a model (weights and
+    activations) is reserved before it is loaded, evicting other models if needed.
+    The reservation is held until the model is cached, so concurrent loads don't exceed
+    the budget together, a load waits for the others, if evicting isn't enough.
+    The memory of the process, which isn't held by cached models, is measured from its
+    resident memory. Loads, which can never fit into the budget, are refused.
+    """
+
+    def __init__(
+        self,
+        max_models=MODEL_CACHE_MAX_MODELS,
+        max_bytes=None,
+        memory_budget_bytes=MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+        rss_reader=get_process_rss_bytes,
+    ):
+        self.max_models = max_models
+        self.max_bytes = (
+            MODEL_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        )
+        self.memory_budget_bytes = memory_budget_bytes
+        self.rss_reader = rss_reader
+        self._entries = OrderedDict()  # key -> ResidentModel
+        self._reservations = {}  # key -> bytes reserved for a model being loaded
+        self._lock = threading.Lock()
+        # notified, when a reservation is released
+        self._reservation_released = threading.Condition(self._lock)
+        # One lock per key, so a model is only loaded once by concurrent requests
+        self._load_locks = {}  # key -> _LoadLock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refused = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            entry.hits += 1
+            entry.last_used = time.time()
+            return entry.model
+
+    def put(self, key, model):
+        """
+        Cache a loaded model. Raises ModelMemoryBudgetException, if it can never fit
+        into the memory budget, the model isn't cached then.
+        """
+        entry = ResidentModel(model)
+        with self._lock:
+            self._release_reservation(key)
+            self._entries.pop(key, None)
+            # the weights of a loaded model are resident already, but not accounted yet
+            self._make_room(key, entry.size_bytes, unaccounted_bytes=entry.param_bytes)
+            self._entries[key] = entry
+            self._evict()
+
+    def get_or_load(self, key, loader, size_hint=0):
+        """
+        Return the cached model for key, or load it with loader() and cache it.
+        size_hint is the estimated size of the model, reserved before it is loaded.
+        """
+        model = self.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            load_lock = self._load_locks.get(key)
+            if load_lock is None:
+                load_lock = self._load_locks[key] = _LoadLock()
+            load_lock.users += 1
+        try:
+            with load_lock.lock:
+                # Another request might have loaded the model in the meantime
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        self._entries.move_to_end(key)
+                        entry.last_used = time.time()
+                        return entry.model
+                    self._make_room(key, size_hint)
+                    self._reservations[key] = size_hint
+                try:
+                    logger.info(f"Loading model {key} into the model cache.")
+                    model = loader()
+                    self.put(key, model)
+                finally:
+                    with self._lock:
+                        self._release_reservation(key)
+        finally:
+            with self._lock:
+                # requests waiting for the lock must find the same lock
+                load_lock.users -= 1
+                if load_lock.users == 0:
+                    self._load_locks.pop(key, None)
+        return model
+
+    def invalidate(self, key=None):
+        """
+        Remove a single model or, if no key is given, all models from the cache.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def unload(self, model_name, version=None):
+        """
+        Remove all versions or a single version of a model, returns the removed keys.
+        """
+        with self._lock:
+            keys = [
+                key
+                for key in self._entries
+                if key[0] == model_name
+                and (version is None or str(key[1]) == str(version))
+            ]
+            for key in keys:
+                del self._entries[key]
+        for key in keys:
+            logger.info(f"Unloaded model {key} from the model cache.")
+        return keys
+
+    def residency(self):
+        """
+        The loaded models, their estimated sizes and usage, and the memory of the process.
+        """
+        with self._lock:
+            return {
+                "models": [
+                    {
+                        "name": key[0],
+                        "version": key[1],
+                        "size_bytes": entry.size_bytes,
+                        "param_bytes": entry.param_bytes,
+                        "activation_bytes": entry.activation_bytes,
+                        "loaded_at": entry.loaded_at,
+                        "last_used": entry.last_used,
+                        "hits": entry.hits,
+                    }
+                    for key, entry in self._entries.items()
+                ],
+                "size_bytes": self._total_bytes(),
+                "rss_bytes": self.rss_reader(),
+                "memory_budget_bytes": self.memory_budget_bytes,
+            }
+
+    def stats(self):
+        residency = self.residency()
+        with self._lock:
+            return {
+                "models": residency["models"],
+                "size_bytes": residency["size_bytes"],
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refused": self.refused,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.refused = 0
+
+    def _cached_bytes(self):
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def _total_bytes(self):
+        # cached models and the reservations of models being loaded
+        return self._cached_bytes() + sum(self._reservations.values())
+
+    def _release_reservation(self, key):
+        # must be called holding the lock
+        if self._reservations.pop(key, None) is not None:
+            self._reservation_released.notify_all()
+
+    def _evict_oldest(self):
+        # must be called holding the lock
+        key, _ = self._entries.popitem(last=False)
+        self.evictions += 1
+        logger.info(f"Evicted model {key} from the model cache.")
+
+    def _make_room(self, key, size_bytes, unaccounted_bytes=0):
+        # must be called holding the lock
+        if not self.memory_budget_bytes:
+            return
+        while True:
+            rss = self.rss_reader()
+            # memory of the process, which isn't held by cached models, the partially
+            # loaded models are counted in full by their reservations on top of it
+            baseline = (
+                0
+                if rss is None
+                else max(0, rss - self._cached_bytes() - unaccounted_bytes)
+            )
+            if baseline + size_bytes > self.memory_budget_bytes:
+                self.refused += 1
+                logger.error(
+                    f"Model {key} needs {size_bytes} bytes, only {self.memory_budget_bytes - baseline} bytes of the memory budget are available."
+                )
+                raise ModelMemoryBudgetException(
+                    f"Model {key[0]} doesn't fit into the memory budget."
+                )
+            while (
+                self._entries
+                and baseline + self._total_bytes() + size_bytes
+                > self.memory_budget_bytes
+            ):
+                self._evict_oldest()
+            if (
+                not self._reservations
+                or baseline + self._total_bytes() + size_bytes
+                <= self.memory_budget_bytes
+            ):
+                return
+            # the memory is reserved by other loads, wait until one of them finished
+            logger.info(
+                f"Model {key} waits for the loads of {list(self._reservations)}."
+            )
+            self._reservation_released.wait()
+
+    def _evict(self):
+        # Always keep the most recently used model, even if it exceeds the budget
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_models
+            or (self.max_bytes and self._total_bytes() > self.max_bytes)
+        ):
+            self._evict_oldest()
+
+
+# our singleton model cache
+model_cache = ModelCache()
@@ -2,25 +2,55 @@ import logging
 import os
 
 import numpy as np
-import pandas as pd
-import tensorflow as tf
 from ml_host_backend.app.exceptions.client_exceptions import InvalidArgumentException
-from ml_host_backend.app.services.meta import classes_2, classes_4, models_summary
+from ml_host_backend.app.metrics import UNKNOWN_MODEL, StageTimer
+from ml_host_backend.app.schemas.prediction import (
+    BatchPredictionResponse,
+    FilePrediction,
+    PredictionResponse,
+)
+from ml_host_backend.app.services.artifact_cache import (
+    ARTIFACT_CACHE_ENABLED,
+    artifact_cache,
+)
+from ml_host_backend.app.services.batching_service import predict_single_image
+from ml_host_backend.app.services.compiled_inference import compile_model
+from ml_host_backend.app.services.meta import classes_2, classes_4
+from ml_host_backend.app.services.model_cache import model_cache
+from ml_host_backend.app.services.prediction_cache import prediction_cache
+from ml_host_backend.app.services.tflite_backend import TFLiteModel, get_tflite_artifact
+from ml_host_backend.app.startup_timing import lazy_import, warm_up
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
+# tensorflow is imported on first use, to keep startup fast
+tf = lazy_import("tensorflow")
+
 logger = logging.getLogger(__name__)
 
 DRIVE_URL = os.getenv("GOOGLE_DRIVE_URL")
+# Maximum number of images accepted by a single batch prediction request
+MAX_PREDICTION_BATCH_SIZE = int(os.getenv("MAX_PREDICTION_BATCH_SIZE", "32"))
+# Whether JPEGs are decoded at reduced resolution, close to the model input size
+FAST_JPEG_DECODE = os.getenv("FAST_JPEG_DECODE", "true").lower() == "true"
+# Downscale ratios supported by the JPEG decoder, largest first
+JPEG_DECODE_RATIOS = (8, 4, 2)
+JPEG_MAGIC_BYTES = b"\xff\xd8\xff"
+
+
+def warm_up_imports():
+    """
+    Function to import the inference dependencies ahead of the first prediction.
+    """
+    warm_up(tf)
 
 
 def prepare_image_for_model(
     image, model, normalize=False
-):  # Convert the image to TensorFlow tensor
-    # Copy the image to avoid overwriting
-    img_tf = tf.convert_to_tensor(image.copy())
+):  # Convert the image to TensorFlow tensor, a no-op for decoded image tensors
+    img_tf = tf.convert_to_tensor(image)
     channels = model.input_shape[-1]  # Expected number of channels (1=gray, 3=RGB)
     target_size = model.input_shape[1:3]  # Expected image size (height, width)
 
@@ -28,15 +58,15 @@ def prepare_image_for_model(
     if img_tf.ndim == 2:  # Grayscale (H, W)
         img_tf = tf.expand_dims(img_tf, axis=-1)  # (H, W, 1)
 
+    # Resize to target model input size, before the channels are converted
+    img_tf = tf.image.resize(img_tf, target_size)
+
     # Convert grayscale to RGB if model expects 3 channels
     if img_tf.shape[-1] == 1 and channels == 3:
         img_tf = tf.image.grayscale_to_rgb(img_tf)
     elif img_tf.shape[-1] == 3 and channels == 1:
         img_tf = tf.image.rgb_to_grayscale(img_tf)
 
-    # Resize to target model input size
-    img_tf = tf.image.resize(img_tf, target_size)
-
     # Normalize to range [0, 1] if specified
     if normalize:
         img_tf = img_tf / 255.0
@@ -44,28 +74,86 @@ def prepare_image_for_model(
     return img_tf  # Return the processed image
 
 
-def read_and_prepare_image(file_content, model):
+def get_jpeg_decode_ratio(image_shape, target_size):
+    """
+    Function to get the largest JPEG downscale ratio, at which the image is still
+    decoded at least at the target size (height, width).
+    """
+    height, width = int(image_shape[0]), int(image_shape[1])
+    for ratio in JPEG_DECODE_RATIOS:
+        if height // ratio >= target_size[0] and width // ratio >= target_size[1]:
+            return ratio
+    return 1
+
+
+def decode_image(file_content, target_size):
+    """
+    Function to decode an uploaded image as grayscale. JPEGs are downscaled while
+    decoding (in the DCT domain), close to the target size, instead of decoding
+    the full resolution image and resizing it afterwards.
+    """
+    if FAST_JPEG_DECODE and file_content[:3] == JPEG_MAGIC_BYTES:
+        image_shape = tf.image.extract_jpeg_shape(file_content)
+        ratio = get_jpeg_decode_ratio(image_shape, target_size)
+        return tf.io.decode_jpeg(file_content, channels=1, ratio=ratio)
+    return tf.image.decode_image(file_content, channels=1)
+
+
+def read_and_prepare_image(file_content, model, timer):
     try:
-        image = tf.image.decode_image(file_content, channels=1).numpy()
+        with timer.stage("decode"):
+            image = decode_image(file_content, model.input_shape[1:3])
         logger.debug("Image decoded successfully.")
     except Exception as e:
         logger.error(f"Failed to decode image: {str(e)}", exc_info=True)
         raise InvalidArgumentException("Could not decode image.")
 
-    image_array = prepare_image_for_model(image, model, normalize=True)
-    logger.debug(
-        "Image converted to numpy array, normalized, and channel dimension added."
-    )
+    with timer.stage("preprocess"):
+        image_array = prepare_image_for_model(image, model, normalize=True)
+    logger.debug("Image resized, normalized, and channel dimension added.")
 
     return image_array
 
 
-def download_latest_model_version(model_name: str):
+def download_model_artifact(model_name: str, model_summary: dict, kind, credentials):
     """
-    TODO: Implement
-    Function to load the latest version of a model from MLFlow.
+    Function to get the local path of a model file from the artifact cache,
+    it is downloaded from MLFlow on a cache miss.
     """
-    return models_summary
+    from ml_host_backend.app.services.mlflow_service import (
+        open_model_artifact_from_mlflow,
+    )
+
+    version = get_model_version(model_summary)
+    return artifact_cache.fetch(
+        model_name,
+        version,
+        kind,
+        lambda: open_model_artifact_from_mlflow(model_name, kind, credentials, version),
+    )
+
+
+def download_latest_model_version(model_name: str, credentials):
+    """
+    Function to download the latest version of a model from MLFlow into the artifact cache.
+    The cached summary is dropped, so the next prediction uses the downloaded version.
+    """
+    from ml_host_backend.app.services.mlflow_service import (
+        get_single_model_summary_from_mlflow,
+        invalidate_cached_model_summary,
+    )
+
+    model_summary = get_single_model_summary_from_mlflow(model_name, credentials)
+    kinds = ["keras"]
+    tflite_artifact = get_tflite_artifact(model_summary)
+    if tflite_artifact:
+        kinds.append(tflite_artifact[0])
+    artifacts = {
+        kind: download_model_artifact(model_name, model_summary, kind, credentials)
+        for kind in kinds
+    }
+    invalidate_cached_model_summary(model_name)
+    return {"version": get_model_version(model_summary), "artifacts": artifacts}
 
 
 def list_summary_of_all_models(credentials):
@@ -90,40 +178,285 @@ def show_summary_of_single_model(model_name: str, credentials):
     return get_single_model_summary_from_mlflow(model_name, credentials)
 
 
-def predict_image_classification(model_name, file_content, credentials):
+def get_model_filepath(model_name: str, model_summary: dict, kind, credentials):
     """
-    Function to predict image classification using the specified model.
+    Function to get the path, from which a model file is loaded. That is the shared mlruns
+    volume, or the local artifact cache if it is enabled.
     """
+    if kind == "keras":
+        filepath = model_summary["model_filepath"]
+    else:
+        filepath = get_tflite_artifact(model_summary)[1]
+    if not ARTIFACT_CACHE_ENABLED:
+        return filepath
+    return download_model_artifact(model_name, model_summary, kind, credentials)
 
-    logger.info("Identifying model for prediction.")
-    model_summary = show_summary_of_single_model(model_name, credentials)
 
-    logger.info(f"Predicting image classification with model: {model_name}")
+def get_model_size_hint(model_summary: dict, tflite_artifact=None):
+    """
+    Function to estimate the size of a model before it is loaded, by its file size.
+    Returns 0, if the file isn't available locally.
+    """
+    filepath = (
+        tflite_artifact[1] if tflite_artifact else model_summary.get("model_filepath")
+    )
+    if filepath and os.path.isfile(filepath):
+        return os.path.getsize(filepath)
+    return 0
 
-    model_path = model_summary["model_filepath"]
-    model = tf.keras.models.load_model(model_path)
 
-    logger.info(f"Preparing image for prediction with model: {model_name}")
-    image_prepared = read_and_prepare_image(file_content, model)
+def get_model(model_name: str, model_summary: dict, credentials=None):
+    """
+    Function to get a loaded model from the model cache, loading it on a cache miss.
+    """
+    key = (model_name, model_summary.get("version"))
+    tflite_artifact = get_tflite_artifact(model_summary)
+    loaded = []
+
+    def load_model():
+        loaded.append(True)
+        if tflite_artifact:
+            return TFLiteModel(
+                get_model_filepath(
+                    model_name, model_summary, tflite_artifact[0], credentials
+                )
+            )
+        return compile_model(
+            tf.keras.models.load_model(
+                get_model_filepath(model_name, model_summary, "keras", credentials)
+            )
+        )
+
+    model = model_cache.get_or_load(
+        key, load_model, size_hint=get_model_size_hint(model_summary, tflite_artifact)
+    )
+    StageTimer(*key).count_cache_request("model", hit=not loaded)
+    return model
+
+
+def warm_up_model(model_name: str, model_summary: dict, credentials=None):
+    """
+    Function to load a model into the model cache and run a dummy inference,
+    so graph tracing and kernel selection happen before the first request.
+    """
+    model = get_model(model_name, model_summary, credentials)
+    # a numpy batch, so TFLite models are warmed up without starting the TensorFlow runtime
+    dummy_batch = np.zeros((1, *model.input_shape[1:]), dtype=np.float32)
+    model.predict(dummy_batch)
+    logger.info(f"Warmed up model: {model_name}")
+    return model
+
 
+def get_classes(model_summary: dict):
+    """
+    Function to get the human readable classes matching the model output.
+    """
     class_names = model_summary["class_names"]
     # the class names are a list of strings, e.g. ["cat", "dog", "bird"], we must decode it into a python list
     if isinstance(class_names, str):
         class_names = class_names.strip().split(",")
     if len(class_names) == 2:
-        classes = classes_2
+        return classes_2
     elif len(class_names) == 4:
-        classes = classes_4
+        return classes_4
+    logger.error(f"Unsupported number of classes: {len(class_names)}")
+    raise InvalidArgumentException(
+        f"Model has an unsupported number of classes: {len(class_names)}"
+    )
+
+
+def get_predicted_class_and_probabilities(pred, classes):
+    """
+    Function to map the model output of one image to its class and class probabilities.
+    """
+    probabilities = [float(probability) for probability in pred]
+    predicted_class = classes[int(np.argmax(pred))]
+    return predicted_class, dict(zip(classes, probabilities))
+
+
+def get_served_artifact_kind(model_summary: dict):
+    """
+    Function to get the kind of the model file, which serves the predictions.
+    """
+    tflite_artifact = get_tflite_artifact(model_summary)
+    return tflite_artifact[0] if tflite_artifact else "keras"
+
+
+def get_model_version(model_summary: dict):
+    version = model_summary.get("version")
+    return None if version is None else str(version)
+
+
+def get_model_summary_for_prediction(model_name: str, credentials):
+    """
+    Function to get the model summary for predictions, served from the metadata cache.
+    """
+    from ml_host_backend.app.services.mlflow_service import (
+        get_cached_model_summary_from_mlflow,
+    )
+
+    return get_cached_model_summary_from_mlflow(model_name, credentials)
+
+
+def predict_prepared_image(
+    model_name, file_content, model_summary, credentials, timer=None
+):
+    """
+    Function to run the model on a single uploaded image, returns the predicted class
+    and the class probabilities.
+    """
+    logger.info(f"Predicting image classification with model: {model_name}")
+    timer = timer or StageTimer(model_name, get_model_version(model_summary))
+
+    model_path = model_summary["model_filepath"]
+    with timer.stage("load"):
+        model = get_model(model_name, model_summary, credentials)
+
+    logger.info(f"Preparing image for prediction with model: {model_name}")
+    image_prepared = read_and_prepare_image(file_content, model, timer)
+
+    classes = get_classes(model_summary)
 
-    image_batch = tf.expand_dims(image_prepared, axis=0)
-    pred = model.predict(image_batch)[0]
+    # Concurrent requests for the same model are predicted together
+    key = (model_name, model_summary.get("version"))
+    with timer.stage("forward"):
+        pred = predict_single_image(key, model, image_prepared)
 
-    pred_df = pd.DataFrame(columns=["Predicted"] + classes)
-    pred_df.loc[model_name] = [classes[np.argmax(pred)]] + pred.round(3).astype(
-        "str"
-    ).tolist()  # Write prediction into table
-    pred_df.index.name = "Model"
+    with timer.stage("serialize"):
+        predicted_class, probabilities = get_predicted_class_and_probabilities(
+            pred, classes
+        )
 
     logger.info(f"Prediction completed for model: {model_path}")
+    return {"predicted_class": predicted_class, "probabilities": probabilities}
+
+
+def predict_image_classification(model_name, file_content, credentials):
+    """
+    Function to predict image classification using the specified model.
+    Results are cached by image content and model version.
+    """
+
+    logger.info("Identifying model for prediction.")
+    # labelled with the model name only after the model resolved
+    timer = StageTimer(UNKNOWN_MODEL)
+    with timer.stage("metadata"):
+        model_summary = get_model_summary_for_prediction(model_name, credentials)
+        model_version = get_model_version(model_summary)
+        timer.model_name = model_name
+        timer.model_version = model_version
+
+    computed = []
+
+    def compute():
+        computed.append(True)
+        return predict_prepared_image(
+            model_name, file_content, model_summary, credentials, timer
+        )
+
+    cache_key = prediction_cache.make_key(
+        file_content,
+        model_name,
+        model_version,
+        get_served_artifact_kind(model_summary),
+    )
+    result = prediction_cache.get_or_compute(cache_key, compute)
+    timer.count_cache_request("prediction", hit=not computed)
+
     # Return the prediction report
-    return pred_df
+    return PredictionResponse(
+        model_name=model_name,
+        model_version=model_version,
+        predicted_class=result["predicted_class"],
+        probabilities=result["probabilities"],
+    )
+
+
+def predict_image_classification_batch(model_name, files, credentials):
+    """
+    Function to predict image classification for many images with one forward pass.
+    Cached images are not predicted again.
+
+    Parameters:
+    - files: list of (file name, file content) tuples
+    """
+    if not files:
+        raise InvalidArgumentException("No images provided for prediction.")
+    if len(files) > MAX_PREDICTION_BATCH_SIZE:
+        raise InvalidArgumentException(
+            f"Too many images, at most {MAX_PREDICTION_BATCH_SIZE} images are allowed per batch."
+        )
+
+    logger.info("Identifying model for batch prediction.")
+    # labelled with the model name only after the model resolved
+    timer = StageTimer(UNKNOWN_MODEL)
+    with timer.stage("metadata"):
+        model_summary = get_model_summary_for_prediction(model_name, credentials)
+        model_version = get_model_version(model_summary)
+        timer.model_name = model_name
+        timer.model_version = model_version
+
+    artifact_kind = get_served_artifact_kind(model_summary)
+    cache_keys = [
+        prediction_cache.make_key(
+            file_content, model_name, model_version, artifact_kind
+        )
+        for _, file_content in files
+    ]
+    results = {key: prediction_cache.get(key) for key in cache_keys}
+    for key in cache_keys:
+        timer.count_cache_request("prediction", hit=results[key] is not None)
+    # identical images within the batch are predicted once
+    missing = {}
+    for key, (_, file_content) in zip(cache_keys, files):
+        if results[key] is None:
+            missing.setdefault(key, file_content)
+
+    if missing:
+        with timer.stage("load"):
+            model = get_model(model_name, model_summary, credentials)
+        classes = get_classes(model_summary)
+
+        logger.info(
+            f"Preparing {len(missing)} images for prediction with model: {model_name}"
+        )
+        images_prepared = [
+            read_and_prepare_image(file_content, model, timer)
+            for file_content in missing.values()
+        ]
+
+        # Run all images through the model as one stacked tensor
+        with timer.stage("forward"):
+            image_batch = tf.stack(images_prepared, axis=0)
+            preds = model.predict(image_batch)
+        timer.observe_batch_size(len(images_prepared), path="request")
+
+        with timer.stage("serialize"):
+            for key, pred in zip(missing, preds):
+                predicted_class, probabilities = get_predicted_class_and_probabilities(
+                    pred, classes
+                )
+                results[key] = {
+                    "predicted_class": predicted_class,
+                    "probabilities": probabilities,
+                }
+        for key in missing:
+            prediction_cache.put(key, results[key])
+
+    predictions = [
+        FilePrediction(
+            file_name=file_name,
+            predicted_class=results[key]["predicted_class"],
+            probabilities=results[key]["probabilities"],
+        )
+        for (file_name, _), key in zip(files, cache_keys)
+    ]
+
+    logger.info(
+        f"Batch prediction of {len(files)} images completed for model: {model_name}"
+    )
+    return BatchPredictionResponse(
+        model_name=model_name,
+        model_version=model_version,
+        predictions=predictions,
+    )
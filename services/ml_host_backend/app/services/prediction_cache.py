@@ -0,0 +1,243 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Number of predictions kept in memory, 0 disables the prediction cache
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "1024"))
+# SQLite file, which keeps predictions across restarts, empty keeps them in memory only
+PREDICTION_CACHE_DB_PATH = os.getenv("PREDICTION_CACHE_DB_PATH", "")
+# Number of predictions kept on disk, older predictions are pruned
+PREDICTION_CACHE_DB_MAX_ENTRIES = int(
+    os.getenv("PREDICTION_CACHE_DB_MAX_ENTRIES", "100000")
+)
+# The disk tier is pruned once every this many writes
+PRUNE_INTERVAL = 100
+
+
+def hash_image(file_content):
+    return hashlib.sha256(file_content).hexdigest()
+
+
+class PredictionCache:
+    """
+    Cache of prediction results keyed by (image hash, model name, model version).
+
+    Results are kept in an in-memory LRU tier and, if a database path is given, in an
+    SQLite tier, which survives restarts. Concurrent requests for the same key share
+    one computation (single flight).
+    """
+
+    def __init__(
+        self,
+        max_entries=PREDICTION_CACHE_MAX_ENTRIES,
+        db_path=PREDICTION_CACHE_DB_PATH,
+        db_max_entries=PREDICTION_CACHE_DB_MAX_ENTRIES,
+    ):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.db_max_entries = db_max_entries
+        self._entries = OrderedDict()  # key -> result
+        self._inflight = {}  # key -> future of the running computation
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._db_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(file_content, model_name, model_version, artifact_kind):
+        """
+        The served artifact kind is part of the key, the keras model and the
+        quantized variants of the same version predict different probabilities.
+        """
+        return (
+            hash_image(file_content),
+            model_name,
+            str(model_version),
+            artifact_kind,
+        )
+
+    def _connect(self):
+        # must be called holding the db lock
+        if self._db is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "image_hash TEXT, model_name TEXT, model_version TEXT, "
+                "artifact_kind TEXT, result TEXT, created REAL, "
+                "PRIMARY KEY (image_hash, model_name, model_version, artifact_kind))"
+            )
+            self._db.commit()
+        return self._db
+
+    def _get_from_disk(self, key):
+        if not self.db_path:
+            return None
+        try:
+            with self._db_lock:
+                row = (
+                    self._connect()
+                    .execute(
+                        "SELECT result FROM predictions "
+                        "WHERE image_hash = ? AND model_name = ? AND model_version = ? "
+                        "AND artifact_kind = ?",
+                        key,
+                    )
+                    .fetchone()
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read prediction cache database: {e}")
+            return None
+        return None if row is None else json.loads(row[0])
+
+    def _put_to_disk(self, key, result):
+        if not self.db_path:
+            return
+        try:
+            with self._db_lock:
+                db = self._connect()
+                db.execute(
+                    "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, json.dumps(result), time.time()),
+                )
+                self._db_writes += 1
+                if self._db_writes % PRUNE_INTERVAL == 0:
+                    db.execute(
+                        "DELETE FROM predictions WHERE rowid IN ("
+                        "SELECT rowid FROM predictions ORDER BY created DESC "
+                        "LIMIT -1 OFFSET ?)",
+                        (self.db_max_entries,),
+                    )
+                db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write prediction cache database: {e}")
+
+    def _put_to_memory(self, key, result):
+        # must be called holding the lock
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+        result = self._get_from_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._put_to_memory(key, result)
+        return result
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._put_to_memory(key, result)
+        self._put_to_disk(key, result)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result for key, or compute() it. Concurrent calls for a key,
+        which is not cached yet, wait for the first call instead of computing it again.
+        """
+        if not self.enabled:
+            return compute()
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = compute()
+            self.put(key, result)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def invalidate(self):
+        """
+        Remove all predictions from both tiers.
+        """
+        with self._lock:
+            self._entries.clear()
+        if not self.db_path:
+            return
+        try:
+            with self._db_lock:
+                db = self._connect()
+                db.execute("DELETE FROM predictions")
+                db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to clear prediction cache database: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": bool(self.db_path),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "shared": self.shared,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+            self.shared = 0
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# our singleton prediction cache
+prediction_cache = PredictionCache()
@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+
+import numpy as np
+from ml_host_backend.app.startup_timing import lazy_import
+
+# tensorflow is imported on first use, to keep startup fast
+tf = lazy_import("tensorflow")
+
+logger = logging.getLogger(__name__)
+
+# Inference backend of the host backend, "keras" or "tflite"
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras").lower()
+# Number of CPU threads of one TFLite interpreter
+TFLITE_NUM_THREADS = int(os.getenv("TFLITE_NUM_THREADS", "2"))
+# Quantized variant served by the TFLite backend, "float16" or "int8", empty serves the float model
+TFLITE_VARIANT = os.getenv("TFLITE_VARIANT", "")
+
+
+def get_interpreter_class(allow_tensorflow=True):
+    """
+    Function to get the TFLite interpreter, the standalone LiteRT or tflite_runtime packages
+    are preferred if installed. Without allow_tensorflow, the interpreter of TensorFlow isn't
+    used as fallback, e.g. in the parent process of forked workers, as importing TensorFlow
+    there would hang the workers.
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            if not allow_tensorflow:
+                raise ImportError(
+                    "Neither ai-edge-litert nor tflite-runtime is installed, the TFLite "
+                    "interpreter of TensorFlow isn't fork-safe."
+                )
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteModel:
+    """
+    Runs a TFLite flatbuffer with the TFLite interpreter. The default op resolver applies
+    the XNNPACK delegate on CPU. The interpreter is not thread-safe, calls are serialized.
+    """
+
+    # False in the parent process of forked workers, while the models are preloaded
+    allow_tensorflow = True
+
+    def __init__(self, tflite_filepath, num_threads=TFLITE_NUM_THREADS):
+        self.tflite_filepath = tflite_filepath
+        self.model_bytes = os.path.getsize(tflite_filepath)
+        self._interpreter = get_interpreter_class(self.allow_tensorflow)(
+            model_path=tflite_filepath, num_threads=num_threads
+        )
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        self._lock = threading.Lock()
+        logger.info(
+            f"Loaded TFLite model {tflite_filepath} with {num_threads} threads."
+        )
+
+    @property
+    def input_shape(self):
+        return (None, *(int(dim) for dim in self._input["shape"][1:]))
+
+    def predict(self, images):
+        images = np.asarray(images, dtype=self._input["dtype"])
+        with self._lock:
+            if images.shape[0] != self._batch_size:
+                # the interpreter is resized for every new batch size
+                self._interpreter.resize_tensor_input(
+                    self._input["index"], list(images.shape)
+                )
+                self._interpreter.allocate_tensors()
+                self._batch_size = images.shape[0]
+            self._interpreter.set_tensor(self._input["index"], images)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output["index"]).copy()
+
+
+# served artifacts resolved per model summary, so the fallbacks are only logged once per model version
+_resolved_artifacts = {}
+_resolved_artifacts_lock = threading.Lock()
+
+
+def get_tflite_artifact(model_summary: dict):
+    """
+    Function to get the kind and path of the TFLite model file to serve, if the model is
+    served by the TFLite backend. Quantized variants are only available, if they passed
+    the accuracy gate of the train hub, otherwise the float TFLite model is served.
+    Returns None, if the Keras model is served.
+    """
+    if INFERENCE_BACKEND != "tflite":
+        return None
+    quantized_filepath = None
+    if TFLITE_VARIANT:
+        quantized_filepath = (model_summary.get("quantized_filepaths") or {}).get(
+            TFLITE_VARIANT
+        )
+    key = (
+        model_summary.get("name"),
+        model_summary.get("version"),
+        TFLITE_VARIANT,
+        quantized_filepath,
+        model_summary.get("tflite_filepath"),
+    )
+    with _resolved_artifacts_lock:
+        if key not in _resolved_artifacts:
+            _resolved_artifacts[key] = _resolve_tflite_artifact(
+                model_summary, quantized_filepath
+            )
+        return _resolved_artifacts[key]
+
+
+def _resolve_tflite_artifact(model_summary: dict, quantized_filepath):
+    name = f"{model_summary.get('name')} version {model_summary.get('version')}"
+    if quantized_filepath:
+        return TFLITE_VARIANT, quantized_filepath
+    if TFLITE_VARIANT:
+        logger.warning(
+            f"No servable {TFLITE_VARIANT} variant for {name}, serving the float model."
+        )
+    if not model_summary.get("tflite_filepath"):
+        logger.warning(f"No TFLite model for {name}, serving the Keras model.")
+        return None
+    return "tflite", model_summary["tflite_filepath"]
@@ -0,0 +1,114 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from ml_host_backend.app.metrics import TOKEN_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Number of verified tokens kept in memory, 0 disables the token cache
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+# Seconds an invalid token is remembered, before its signature is checked again
+TOKEN_CACHE_NEGATIVE_TTL_SECONDS = float(
+    os.getenv("TOKEN_CACHE_NEGATIVE_TTL_SECONDS", "5")
+)
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCache:
+    """
+    LRU cache of verified JWTs keyed by the token digest, the tokens themselves are
+    not kept. Valid tokens are cached with their claims until they expire, invalid
+    tokens are cached with their error for a short time, so the signature of a token
+    is only checked the first time it is seen.
+    """
+
+    def __init__(
+        self,
+        max_entries=TOKEN_CACHE_MAX_ENTRIES,
+        negative_ttl_seconds=TOKEN_CACHE_NEGATIVE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries = OrderedDict()  # digest -> (claims, error, valid until)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        """
+        Return the (claims, error) of a cached token, or None if it isn't cached.
+        """
+        digest = hash_token(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[2] < time.time():
+                # expired tokens and negative entries are verified again
+                del self._entries[digest]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                result = "miss"
+            else:
+                self._entries.move_to_end(digest)
+                if entry[1] is None:
+                    self.hits += 1
+                    result = "hit"
+                else:
+                    self.negative_hits += 1
+                    result = "negative_hit"
+        TOKEN_CACHE_REQUESTS.labels(result=result).inc()
+        return None if entry is None else entry[:2]
+
+    def put_valid(self, token, claims, expires):
+        self._put(token, (claims, None, expires))
+
+    def put_invalid(self, token, error):
+        self._put(token, (None, error, time.time() + self.negative_ttl_seconds))
+
+    def _put(self, token, entry):
+        if self.max_entries <= 0:
+            return
+        digest = hash_token(token)
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    round((self.hits + self.negative_hits) / lookups, 4)
+                    if lookups
+                    else None
+                ),
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.negative_hits = 0
+            self.misses = 0
+
+
+# our singleton token cache
+token_cache = TokenCache()
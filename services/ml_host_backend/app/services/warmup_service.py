@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+import time
+
+from fastapi.security import HTTPAuthorizationCredentials
+from ml_host_backend.app.exceptions.service_exceptions import (
+    MLFlowUnavailableException,
+    MLUserMgmtUnavailableException,
+)
+
+logger = logging.getLogger(__name__)
+
+# Models loaded and warmed up at startup, a comma separated list of names or "all"
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "")
+# Service user, which fetches the model summaries from MLFlow during warm-up
+PRELOAD_USERNAME = os.getenv("PRELOAD_USERNAME", "")
+PRELOAD_PASSWORD = os.getenv("PRELOAD_PASSWORD", "")
+# Dependencies may start after us, retry unavailable dependencies this often
+PRELOAD_MAX_ATTEMPTS = int(os.getenv("PRELOAD_MAX_ATTEMPTS", "5"))
+PRELOAD_RETRY_SECONDS = float(os.getenv("PRELOAD_RETRY_SECONDS", "5"))
+
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+
+
+class ModelWarmUp:
+    """
+    Loads the configured models at startup and runs a dummy inference on each of them.
+    The service reports ready, when the warm-up has finished. Models failing to warm up
+    are reported, but don't keep the service unready, they are loaded on first use instead.
+    """
+
+    def __init__(
+        self,
+        model_names=PRELOAD_MODELS,
+        username=PRELOAD_USERNAME,
+        password=PRELOAD_PASSWORD,
+        max_attempts=PRELOAD_MAX_ATTEMPTS,
+        retry_seconds=PRELOAD_RETRY_SECONDS,
+    ):
+        self.model_names = model_names.strip()
+        self.username = username
+        self.password = password
+        self.max_attempts = max(1, max_attempts)
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._thread = None
+        self.state = PENDING
+        self.models = {}  # model name -> "ready" or error message
+        self.seconds = None
+
+    def is_ready(self):
+        with self._lock:
+            return self.state == READY
+
+    def status(self):
+        with self._lock:
+            return {
+                "status": self.state,
+                "models": dict(self.models),
+                "seconds": self.seconds,
+            }
+
+    def start(self):
+        """
+        Run the warm-up in a background thread, so the service answers /health meanwhile.
+        """
+        with self._lock:
+            if self.state != PENDING:
+                return
+            self.state = RUNNING
+        self._thread = threading.Thread(
+            target=self._run, name="model-warm-up", daemon=True
+        )
+        self._thread.start()
+
+    def run(self, fork_safe_only=False):
+        """
+        Run the warm-up in the calling thread. With fork_safe_only, only models served by
+        the TFLite backend are loaded, Keras models are loaded on first use instead.
+        """
+        with self._lock:
+            self.state = RUNNING
+        self._run(fork_safe_only)
+
+    def _set_model_status(self, model_name, status):
+        with self._lock:
+            self.models[model_name] = status
+
+    def _run(self, fork_safe_only=False):
+        start = time.perf_counter()
+        try:
+            if self.model_names:
+                self._warm_up_models(fork_safe_only)
+            else:
+                logger.info("No models configured for preloading.")
+        except Exception as e:
+            logger.error(f"Model warm-up failed: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self.seconds = round(time.perf_counter() - start, 3)
+                self.state = READY
+            logger.info(f"Model warm-up finished in {self.seconds} seconds.")
+
+    def _with_retries(self, fn, *args):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return fn(*args)
+            except (MLFlowUnavailableException, MLUserMgmtUnavailableException):
+                if attempt == self.max_attempts:
+                    raise
+                logger.warning(
+                    f"Dependency unavailable during warm-up, retrying in {self.retry_seconds} seconds."
+                )
+                time.sleep(self.retry_seconds)
+
+    def _get_credentials(self):
+        from ml_host_backend.app.services.auth_service import login_user
+
+        token = self._with_retries(login_user, self.username, self.password)
+        return HTTPAuthorizationCredentials(
+            scheme="Bearer", credentials=token["access_token"]
+        )
+
+    def _get_model_names(self, credentials):
+        from ml_host_backend.app.services.mlflow_service import (
+            list_all_models_from_mlflow,
+        )
+
+        if self.model_names.lower() == "all":
+            models = self._with_retries(list_all_models_from_mlflow, credentials)
+            return [model["name"] for model in models]
+        return [name.strip() for name in self.model_names.split(",") if name.strip()]
+
+    def _warm_up_models(self, fork_safe_only=False):
+        from ml_host_backend.app.services.mlflow_service import (
+            get_cached_model_summary_from_mlflow,
+        )
+        from ml_host_backend.app.services.models_service import warm_up_model
+        from ml_host_backend.app.services.tflite_backend import get_tflite_artifact
+
+        credentials = self._get_credentials()
+        model_names = self._get_model_names(credentials)
+        logger.info(f"Preloading models: {model_names}")
+        for model_name in model_names:
+            try:
+                # through the metadata cache, so the first prediction finds the summary cached
+                model_summary = self._with_retries(
+                    get_cached_model_summary_from_mlflow, model_name, credentials
+                )
+                if fork_safe_only and not get_tflite_artifact(model_summary):
+                    logger.warning(
+                        f"Model {model_name} isn't served by TFLite, it is loaded on first use."
+                    )
+                    self._set_model_status(model_name, "loaded on first use")
+                    continue
+                warm_up_model(model_name, model_summary, credentials)
+                self._set_model_status(model_name, READY)
+            except Exception as e:
+                logger.error(f"Failed to warm up model {model_name}: {e}")
+                self._set_model_status(model_name, str(e))
+
+
+# our singleton model warm-up, started with the app
+model_warm_up = ModelWarmUp()
+
+
+def preload_models_before_fork():
+    """
+    Function to warm up the configured models in the parent process of forked workers,
+    the workers share the loaded models copy-on-write then.
+
+    TensorFlow isn't fork-safe, a worker hangs on its first inference, if the parent
+    started the TensorFlow runtime. Hence only TFLite models are preloaded with the
+    standalone TFLite interpreter, Keras models are loaded by every worker on its own.
+    """
+    from ml_host_backend.app.services import auth_service, mlflow_service
+    from ml_host_backend.app.services.tflite_backend import (
+        INFERENCE_BACKEND,
+        TFLiteModel,
+    )
+
+    if INFERENCE_BACKEND != "tflite":
+        logger.warning(
+            "Keras models can't be shared by forked workers, every worker loads its own models."
+        )
+        return
+    TFLiteModel.allow_tensorflow = False
+    try:
+        model_warm_up.run(fork_safe_only=True)
+    finally:
+        # the workers may fall back to TensorFlow for models, which weren't preloaded
+        TFLiteModel.allow_tensorflow = True
+    # the workers must not share the keep-alive connections of the parent
+    mlflow_service.session.close()
+    auth_service.session.close()
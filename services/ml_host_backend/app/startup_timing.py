@@ -0,0 +1,134 @@
+import builtins
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+import types
+
+logger = logging.getLogger(__name__)
+
+# Whether module import times are recorded and logged at startup
+STARTUP_TIMING = os.getenv("STARTUP_TIMING", "true").lower() == "true"
+# Imports nested deeper than this are accounted to the module importing them
+STARTUP_TIMING_MAX_DEPTH = int(os.getenv("STARTUP_TIMING_MAX_DEPTH", "2"))
+# Number of slowest modules listed in the startup timing report
+STARTUP_TIMING_TOP_MODULES = int(os.getenv("STARTUP_TIMING_TOP_MODULES", "15"))
+
+
+class ImportTimer:
+    """
+    Records the time spent importing modules for the first time, by wrapping the builtin
+    import function. Times are inclusive, i.e. they contain the nested imports.
+    """
+
+    def __init__(self, max_depth=STARTUP_TIMING_MAX_DEPTH):
+        self.max_depth = max_depth
+        self.started_at = time.perf_counter()
+        self.startup_seconds = None  # recorded once, when the timer is uninstalled
+        self.timings = {}  # module name -> (seconds, depth)
+        self._original_import = None
+        self._local = threading.local()
+
+    def install(self):
+        if self._original_import is not None:
+            return
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall(self):
+        """
+        Restores the builtin import function, the app is started now.
+        """
+        if self._original_import is None:
+            return
+        builtins.__import__ = self._original_import
+        self._original_import = None
+        if self.startup_seconds is None:
+            self.startup_seconds = time.perf_counter() - self.started_at
+
+    def record(self, name, seconds, depth=0):
+        self.timings[name] = (seconds, depth)
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        depth = getattr(self._local, "depth", 0)
+        if level != 0 or name in sys.modules or depth > self.max_depth:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self._local.depth = depth
+            self.record(name, time.perf_counter() - start, depth)
+
+    def report(self, top=STARTUP_TIMING_TOP_MODULES):
+        """
+        Returns the startup time and the slowest module imports. While the timer is still
+        installed, the time since the timer was created is reported as startup time.
+        """
+        slowest = sorted(self.timings.items(), key=lambda item: -item[1][0])[:top]
+        startup_seconds = self.startup_seconds
+        if startup_seconds is None:
+            startup_seconds = time.perf_counter() - self.started_at
+        return {
+            "startup_seconds": round(startup_seconds, 3),
+            "imports": [
+                {"module": name, "seconds": round(seconds, 3), "depth": depth}
+                for name, (seconds, depth) in slowest
+            ],
+        }
+
+
+# our singleton import timer, installed by the app package before anything else is imported
+import_timer = ImportTimer()
+
+
+class LazyModule(types.ModuleType):
+    """
+    Placeholder for a heavy module, which is imported on first attribute access.
+    The import time is recorded in the startup timing report.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is not None:
+            return module
+        with self.__dict__["_lazy_lock"]:
+            module = self.__dict__["_lazy_module"]
+            if module is None:
+                start = time.perf_counter()
+                module = importlib.import_module(self.__name__)
+                seconds = time.perf_counter() - start
+                import_timer.record(f"{self.__name__} (lazy)", seconds)
+                logger.info(f"Imported {self.__name__} in {seconds:.3f} seconds.")
+                self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+def lazy_import(name):
+    """
+    Function to defer the import of a heavy module until it is used for the first time.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def warm_up(*modules):
+    """
+    Function to import lazily imported modules ahead of their first use.
+    """
+    for module in modules:
+        if isinstance(module, LazyModule):
+            module.load()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the compiled inference function against model.predict.
+
+Runs every model listed in app/services/meta.py, which is found in the models directory
+as <model name>.keras, with single images and small batches and prints the latencies.
+
+Usage (from the services directory):
+    python -m ml_host_backend.benchmarks.benchmark_inference --models-dir /path/to/models
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+import tensorflow as tf
+from ml_host_backend.app.services.compiled_inference import CompiledModel
+from ml_host_backend.app.services.meta import models_summary
+
+
+def measure(predict, images, iterations, warmup_iterations=3):
+    for _ in range(warmup_iterations):
+        predict(images)
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        predict(images)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), np.percentile(latencies, 95)
+
+
+def benchmark_model(model, batch_sizes, iterations, jit_compile):
+    compiled = CompiledModel(model, jit_compile=jit_compile)
+    results = []
+    for batch_size in batch_sizes:
+        images = np.random.rand(batch_size, *model.input_shape[1:]).astype("float32")
+        predict_p50, predict_p95 = measure(
+            lambda x: model.predict(x, verbose=0), images, iterations
+        )
+        compiled_p50, compiled_p95 = measure(compiled.predict, images, iterations)
+        results.append(
+            (batch_size, predict_p50, predict_p95, compiled_p50, compiled_p95)
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--models-dir", required=True)
+    parser.add_argument("--batch-sizes", default="1,4,16")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--jit-compile", action="store_true")
+    args = parser.parse_args()
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    print(
+        f"{'model':<45} {'batch':>5} {'predict p50':>12} {'p95':>8} {'compiled p50':>13} {'p95':>8} {'speedup':>8}"
+    )
+    for model_summary in models_summary:
+        model_path = os.path.join(args.models_dir, f"{model_summary['name']}.keras")
+        if not os.path.exists(model_path):
+            print(f"{model_summary['name']:<45} skipped, {model_path} not found")
+            continue
+        model = tf.keras.models.load_model(model_path)
+        for batch_size, p50, p95, c50, c95 in benchmark_model(
+            model, batch_sizes, args.iterations, args.jit_compile
+        ):
+            print(
+                f"{model_summary['name']:<45} {batch_size:>5} {p50:>10.2f}ms {p95:>6.2f}ms {c50:>11.2f}ms {c95:>6.2f}ms {p50 / c50:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,23 @@
+# load the OpenSSL bindings of cryptography before TensorFlow, a dynamically linked
+# OpenSSL (e.g. of conda) otherwise resolves symbols of TensorFlow's bundled BoringSSL
+import jwt.algorithms  # noqa: F401
 import pytest
 from fastapi.testclient import TestClient
 from ml_host_backend.app.main import app
+from ml_host_backend.app.services.auth_service import (
+    ml_user_mgmt_circuit_breaker,
+    revocation_list,
+    verification_keys,
+)
+from ml_host_backend.app.services.google_drive_service import folder_listing_cache
+from ml_host_backend.app.services.mlflow_service import (
+    mlflow_circuit_breaker,
+    model_summary_cache,
+)
+from ml_host_backend.app.services.model_cache import model_cache
+from ml_host_backend.app.services.prediction_cache import prediction_cache
+from ml_host_backend.app.services.token_cache import token_cache
+from ml_host_backend.tests.tokens import TEST_KID, TEST_PRIVATE_KEY
 
 
 # fixture for TestClient instance
@@ -8,3 +25,65 @@ from ml_host_backend.app.main import app
 def test_host_backend_client():
     client = TestClient(app)
     yield client
+
+
+# every test starts with an empty model cache
+@pytest.fixture(autouse=True)
+def clear_model_cache():
+    model_cache.invalidate()
+    model_cache.reset_stats()
+    yield
+    model_cache.invalidate()
+
+
+# every test starts with an empty model metadata cache
+@pytest.fixture(autouse=True)
+def clear_model_summary_cache():
+    model_summary_cache.invalidate()
+    model_summary_cache.reset_stats()
+    yield
+    model_summary_cache.invalidate()
+
+
+# every test starts with an empty prediction cache
+@pytest.fixture(autouse=True)
+def clear_prediction_cache():
+    prediction_cache.invalidate()
+    prediction_cache.reset_stats()
+    yield
+    prediction_cache.invalidate()
+
+
+# every test verifies its tokens again
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    token_cache.invalidate()
+    token_cache.reset_stats()
+    yield
+    token_cache.invalidate()
+
+
+# every test verifies with the test key, and starts with an empty revocation list
+@pytest.fixture(autouse=True)
+def install_test_verification_key():
+    verification_keys.set({TEST_KID: TEST_PRIVATE_KEY.public_key()})
+    revocation_list.set([])
+    yield
+    verification_keys.clear()
+    revocation_list.clear()
+
+
+# every test scans the Google Drive folder again
+@pytest.fixture(autouse=True)
+def clear_google_drive_listing():
+    folder_listing_cache.invalidate()
+    yield
+    folder_listing_cache.invalidate()
+
+
+# every test starts with closed circuits, i.e. available dependencies
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    mlflow_circuit_breaker.reset()
+    ml_user_mgmt_circuit_breaker.reset()
+    yield
@@ -0,0 +1,96 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from ml_host_backend.app.exceptions.service_exceptions import (
+    ModelMemoryBudgetException,
+)
+from ml_host_backend.app.main import app
+from ml_host_backend.app.services.meta import classes_4
+from ml_host_backend.app.services.model_cache import model_cache
+from ml_host_backend.tests.tokens import make_token
+
+base_endpoint = "/api/admin"
+
+admin_token = make_token(600, roles=["admin"])
+headers = {"Authorization": f"Bearer {admin_token}"}
+
+model_summary = {
+    "name": "model1",
+    "version": "2",
+    "model_filepath": "path/to/model1",
+    "class_names": classes_4,
+}
+
+
+def make_model():
+    weight = MagicMock()
+    weight.shape = (1000,)
+    weight.dtype = "float32"
+    model = MagicMock()
+    model.weights = [weight]
+    model.predict.return_value = np.array([[0.1, 0.0, 0.0, 0.0]])
+    return model
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@patch("ml_host_backend.app.services.models_service.tf.keras.models.load_model")
+@patch(
+    "ml_host_backend.app.services.mlflow_service.get_cached_model_summary_from_mlflow"
+)
+def test_load_list_and_unload_model(mock_get_summary, mock_load_model, client):
+    mock_get_summary.return_value = model_summary
+    mock_load_model.return_value = make_model()
+
+    response = client.post(f"{base_endpoint}/models/model1/load", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["version"] == "2"
+
+    response = client.get(f"{base_endpoint}/models", headers=headers)
+    assert response.status_code == 200
+    models = response.json()["models"]
+    assert [(model["name"], model["version"]) for model in models] == [("model1", "2")]
+    assert models[0]["param_bytes"] == 4000
+    assert "last_used" in models[0]
+    assert "rss_bytes" in response.json()
+
+    response = client.delete(f"{base_endpoint}/models/model1", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["versions"] == ["2"]
+    assert model_cache.residency()["models"] == []
+
+    response = client.delete(f"{base_endpoint}/models/model1", headers=headers)
+    assert response.status_code == 404
+
+
+@patch("ml_host_backend.app.routes.admin.get_model")
+@patch(
+    "ml_host_backend.app.services.mlflow_service.get_cached_model_summary_from_mlflow"
+)
+def test_load_model_exceeding_memory_budget(mock_get_summary, mock_get_model, client):
+    mock_get_summary.return_value = model_summary
+    mock_get_model.side_effect = ModelMemoryBudgetException()
+
+    response = client.post(f"{base_endpoint}/models/model1/load", headers=headers)
+    assert response.status_code == 507
+
+
+def test_admin_endpoints_require_token(client):
+    response = client.get(f"{base_endpoint}/models")
+    assert response.status_code in (401, 403)
+
+
+def test_admin_routes_require_the_admin_role(client):
+    user_headers = {"Authorization": f"Bearer {make_token(600)}"}
+    assert (
+        client.get(f"{base_endpoint}/models", headers=user_headers).status_code == 403
+    )
+    response = client.post(f"{base_endpoint}/models/model1/load", headers=user_headers)
+    assert response.status_code == 403
+    response = client.delete(f"{base_endpoint}/models/model1", headers=user_headers)
+    assert response.status_code == 403
@@ -1,32 +1,25 @@
+import hashlib
 import io
-import time
 from unittest.mock import MagicMock, patch
 
-import jwt
 import numpy as np
 import pytest
+import requests
 from fastapi.testclient import TestClient
 from ml_host_backend.app.main import app
+from ml_host_backend.app.services.artifact_cache import ArtifactCache
 from ml_host_backend.app.services.meta import classes_2, classes_4
+from ml_host_backend.tests.tokens import make_token
 from PIL import Image
+from prometheus_client import REGISTRY
 
 mock_model = MagicMock()
 mock_model.predict.return_value = np.array([[0.1, 0.0, 0.0, 0.0]])
 mock_model.input_shape = [-1, 224, 224, 3]  # Batch, Height, Width, Channels (RGB)
 base_endpoint = "/api/models"
 
-JWT_SECRET = "secret"  # this should be specified in a vault in a real application
-JWT_ALGORITHM = "HS256"
-active_token = jwt.encode(
-    {"user_id": "user123", "expires": time.time() + 600},
-    JWT_SECRET,
-    algorithm=JWT_ALGORITHM,
-)
-expired_token = jwt.encode(
-    {"user_id": "testuser", "expires": time.time() - 600},
-    JWT_SECRET,
-    algorithm=JWT_ALGORITHM,
-)
+active_token = make_token(600)
+expired_token = make_token(-600, user_id="testuser")
 incorrect_token = "Bearer any"
 invalid_token = "21243sdsaada"
 
@@ -54,7 +47,7 @@ def patch_mlflow_host_and_port():
 def test_get_summary_of_all_models(client):
     expected_models = models_summary
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get:
         mock_response = MagicMock()
         mock_response.json.return_value = {"models": expected_models}
@@ -65,7 +58,7 @@ def test_get_summary_of_all_models(client):
         )
         assert response.status_code == 200
         assert response.json() == expected_models
-        assert mock_requests_get.call_count == 2
+        assert mock_requests_get.call_count == 1
         called_url = mock_requests_get.call_args[0][0]
         assert "/models" in called_url
 
@@ -75,7 +68,7 @@ def test_get_summary_of_all_models_mlflow_timeout(client):
     import requests
 
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get:
         mock_requests_get.side_effect = requests.exceptions.ConnectionError(
             "Request timed out"
@@ -94,7 +87,7 @@ def test_get_summary_of_single_model(client):
     available_model = models_summary[0]["name"]
     mlflow_response = models_summary[0]
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get:
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -107,14 +100,14 @@ def test_get_summary_of_single_model(client):
         )
         assert response.status_code == 200
         assert response.json() == mlflow_response
-        assert mock_requests_get.call_count == 2
+        assert mock_requests_get.call_count == 1
         called_url = mock_requests_get.call_args[0][0]
         assert f"/models/{available_model}" in called_url
 
 
 def test_get_summary_of_single_model_not_found(client):
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get:
         unavailable_model = "nonexistent"
         mock_response = MagicMock()
@@ -127,7 +120,7 @@ def test_get_summary_of_single_model_not_found(client):
         )
         assert response.status_code == 404
         assert response.json()["message"] == f"Model '{unavailable_model}' not found"
-        assert mock_requests_get.call_count == 2
+        assert mock_requests_get.call_count == 1
         called_url = mock_requests_get.call_args[0][0]
         assert f"/models/{unavailable_model}" in called_url
 
@@ -136,7 +129,7 @@ def test_get_summary_of_model_found(client):
     available_model = models_summary[0]["name"]
     mlflow_response = models_summary[0]
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get:
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -149,7 +142,7 @@ def test_get_summary_of_model_found(client):
         )
         assert response.status_code == 200
         assert response.json() == mlflow_response
-        assert mock_requests_get.call_count == 2
+        assert mock_requests_get.call_count == 1
         called_url = mock_requests_get.call_args[0][0]
         assert f"/models/{available_model}" in called_url
 
@@ -165,7 +158,7 @@ def test_make_prediction_for_image_success(client):
     available_model = models_summary[0]["name"]
     file = {"file": ("test.png", img_bytes, "image/png")}
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get, patch(
         "ml_host_backend.app.services.models_service.tf.keras.models.load_model",
         return_value=mock_model,
@@ -181,14 +174,24 @@ def test_make_prediction_for_image_success(client):
             headers={"Authorization": f"Bearer {active_token}"},
         )
         assert response.status_code == 200
-        assert response.json()["Predicted"][available_model] == "COVID"
+        assert response.json() == {
+            "model_name": available_model,
+            "model_version": None,
+            "predicted_class": "COVID",
+            "probabilities": {
+                "COVID": 0.1,
+                "Lung Opacity": 0.0,
+                "Normal": 0.0,
+                "Viral Pneumonia": 0.0,
+            },
+        }
 
 
 def test_make_prediction_for_image_invalid_file(client):
     available_model = models_summary[0]["name"]
     mlflow_response = models_summary[0]
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get, patch(
         "ml_host_backend.app.services.models_service.tf.keras.models.load_model",
         return_value=mock_model,
@@ -226,7 +229,7 @@ def test_make_prediction_for_large_image_file(client):
     img_bytes.seek(0)
     available_model = models_summary[0]["name"]
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get, patch(
         "ml_host_backend.app.services.models_service.tf.keras.models.load_model",
         return_value=mock_model,
@@ -252,7 +255,7 @@ def test_make_prediction_for_image_prediction_invalid_input(client):
     mlflow_response = models_summary[0]
 
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get, patch(
         "ml_host_backend.app.services.models_service.tf.keras.models.load_model",
         return_value=mock_model,
@@ -285,7 +288,7 @@ def test_missing_auth_token(client):
 def test_auth_fails_for_get_all_with_expired_token(client):
     expected_models = models_summary
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get:
         mock_response = MagicMock()
         mock_response.json.return_value = {"models": expected_models}
@@ -300,7 +303,7 @@ def test_auth_fails_for_get_all_with_expired_token(client):
 def test_auth_fails_for_get_all_with_invalid_token(client):
     expected_models = models_summary
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get:
         mock_response = MagicMock()
         mock_response.json.return_value = {"models": expected_models}
@@ -315,7 +318,7 @@ def test_auth_fails_for_get_all_with_invalid_token(client):
 def test_auth_fails_for_get_all_with_incorrect_token(client):
     expected_models = models_summary
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get:
         mock_response = MagicMock()
         mock_response.json.return_value = {"models": expected_models}
@@ -331,7 +334,7 @@ def test_auth_fails_for_get_one_with_incorrect_token(client):
     available_model = models_summary[0]["name"]
     mlflow_response = models_summary[0]
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get:
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -349,7 +352,7 @@ def test_auth_fails_for_get_one_with_invalid_token(client):
     available_model = models_summary[0]["name"]
     mlflow_response = models_summary[0]
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get:
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -367,7 +370,7 @@ def test_auth_fails_for_get_one_with_expired_token(client):
     available_model = models_summary[0]["name"]
     mlflow_response = models_summary[0]
     with patch(
-        "ml_host_backend.app.services.mlflow_service.requests.get"
+        "ml_host_backend.app.services.mlflow_service.session.get"
     ) as mock_requests_get:
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -379,3 +382,326 @@ def test_auth_fails_for_get_one_with_expired_token(client):
             headers={"Authorization": f"Bearer {expired_token}"},
         )
         assert response.status_code == 401
+
+
+def test_make_prediction_loads_model_only_once(client):
+    available_model = models_summary[0]["name"]
+    mlflow_response = models_summary[0]
+    with patch(
+        "ml_host_backend.app.services.mlflow_service.session.get"
+    ) as mock_requests_get, patch(
+        "ml_host_backend.app.services.models_service.tf.keras.models.load_model",
+        return_value=mock_model,
+    ) as mock_load_model:
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = mlflow_response
+        mock_response.raise_for_status.return_value = None
+        mock_requests_get.return_value = mock_response
+        for index in range(3):
+            # distinct images, identical images would be served by the prediction cache
+            img = Image.new("RGB", (224, 224), color=(index, index, index))
+            img_bytes = io.BytesIO()
+            img.save(img_bytes, format="PNG")
+            img_bytes.seek(0)
+            response = client.post(
+                f"{base_endpoint}/{available_model}/predict",
+                files={"file": ("test.png", img_bytes, "image/png")},
+                headers={"Authorization": f"Bearer {active_token}"},
+            )
+            assert response.status_code == 200
+        assert mock_load_model.call_count == 1
+
+        response = client.get(
+            f"{base_endpoint}/cache/stats",
+            headers={"Authorization": f"Bearer {active_token}"},
+        )
+        assert response.status_code == 200
+        assert response.json()["hits"] == 2
+        assert response.json()["misses"] == 1
+
+
+def make_png(size=(224, 224), color=(128, 128, 128)):
+    img = Image.new("RGB", size, color=color)
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format="PNG")
+    img_bytes.seek(0)
+    return img_bytes
+
+
+def test_make_prediction_for_images_batch(client):
+    available_model = models_summary[0]["name"]
+    mlflow_response = models_summary[0]
+    batch_model = MagicMock()
+    batch_model.input_shape = [-1, 224, 224, 3]
+    batch_model.predict.side_effect = lambda batch: np.tile(
+        [[0.1, 0.7, 0.1, 0.1]], (batch.shape[0], 1)
+    )
+    files = [
+        ("files", ("first.png", make_png(), "image/png")),
+        ("files", ("second.png", make_png((512, 512)), "image/png")),
+        ("files", ("third.png", make_png(color=(64, 64, 64)), "image/png")),
+    ]
+    with patch(
+        "ml_host_backend.app.services.mlflow_service.session.get"
+    ) as mock_requests_get, patch(
+        "ml_host_backend.app.services.models_service.tf.keras.models.load_model",
+        return_value=batch_model,
+    ):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = mlflow_response
+        mock_response.raise_for_status.return_value = None
+        mock_requests_get.return_value = mock_response
+        response = client.post(
+            f"{base_endpoint}/{available_model}/predict/batch",
+            files=files,
+            headers={"Authorization": f"Bearer {active_token}"},
+        )
+        assert response.status_code == 200
+        predictions = response.json()["predictions"]
+        assert [prediction["file_name"] for prediction in predictions] == [
+            "first.png",
+            "second.png",
+            "third.png",
+        ]
+        for prediction in predictions:
+            assert prediction["predicted_class"] == "Lung Opacity"
+            assert prediction["probabilities"]["Lung Opacity"] == 0.7
+        # all images are predicted with a single forward pass
+        assert batch_model.predict.call_count == 1
+        assert batch_model.predict.call_args[0][0].shape == (3, 224, 224, 3)
+
+
+def test_make_prediction_for_images_batch_invalid_file(client):
+    available_model = models_summary[0]["name"]
+    mlflow_response = models_summary[0]
+    files = [
+        ("files", ("first.png", make_png(), "image/png")),
+        ("files", ("test.txt", b"not an image", "text/plain")),
+    ]
+    with patch(
+        "ml_host_backend.app.services.mlflow_service.session.get"
+    ) as mock_requests_get, patch(
+        "ml_host_backend.app.services.models_service.tf.keras.models.load_model",
+        return_value=mock_model,
+    ):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = mlflow_response
+        mock_response.raise_for_status.return_value = None
+        mock_requests_get.return_value = mock_response
+        response = client.post(
+            f"{base_endpoint}/{available_model}/predict/batch",
+            files=files,
+            headers={"Authorization": f"Bearer {active_token}"},
+        )
+        assert response.status_code == 400
+        assert response.json()["message"] == "Could not decode image."
+
+
+def test_make_prediction_for_images_batch_too_many_files(client):
+    available_model = models_summary[0]["name"]
+    files = [("files", (f"{i}.png", make_png(), "image/png")) for i in range(3)]
+    with patch(
+        "ml_host_backend.app.services.models_service.MAX_PREDICTION_BATCH_SIZE", 2
+    ):
+        response = client.post(
+            f"{base_endpoint}/{available_model}/predict/batch",
+            files=files,
+            headers={"Authorization": f"Bearer {active_token}"},
+        )
+        assert response.status_code == 400
+
+
+def test_make_prediction_uses_cached_model_summary(client):
+    available_model = models_summary[0]["name"]
+    mlflow_response = models_summary[0]
+    with patch(
+        "ml_host_backend.app.services.mlflow_service.session.get"
+    ) as mock_requests_get, patch(
+        "ml_host_backend.app.services.models_service.tf.keras.models.load_model",
+        return_value=mock_model,
+    ):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = mlflow_response
+        mock_response.raise_for_status.return_value = None
+        mock_requests_get.return_value = mock_response
+
+        def predict():
+            return client.post(
+                f"{base_endpoint}/{available_model}/predict",
+                files={"file": ("test.png", make_png(), "image/png")},
+                headers={"Authorization": f"Bearer {active_token}"},
+            )
+
+        assert predict().status_code == 200
+        calls_after_first_prediction = mock_requests_get.call_count
+        assert predict().status_code == 200
+        # the second prediction doesn't query MLFlow anymore
+        assert mock_requests_get.call_count == calls_after_first_prediction
+
+        response = client.post(
+            f"{base_endpoint}/{available_model}/refresh",
+            headers={"Authorization": f"Bearer {active_token}"},
+        )
+        assert response.status_code == 200
+        assert predict().status_code == 200
+        assert mock_requests_get.call_count > calls_after_first_prediction
+
+
+def test_make_prediction_for_same_image_is_cached(client):
+    available_model = models_summary[0]["name"]
+    mlflow_response = models_summary[0]
+    with patch(
+        "ml_host_backend.app.services.mlflow_service.session.get"
+    ) as mock_requests_get, patch(
+        "ml_host_backend.app.services.models_service.predict_single_image",
+        return_value=np.array([0.1, 0.7, 0.1, 0.1]),
+    ) as mock_predict, patch(
+        "ml_host_backend.app.services.models_service.tf.keras.models.load_model",
+        return_value=mock_model,
+    ):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = mlflow_response
+        mock_response.raise_for_status.return_value = None
+        mock_requests_get.return_value = mock_response
+        for _ in range(2):
+            response = client.post(
+                f"{base_endpoint}/{available_model}/predict",
+                files={"file": ("test.png", make_png(), "image/png")},
+                headers={"Authorization": f"Bearer {active_token}"},
+            )
+            assert response.status_code == 200
+            assert response.json()["predicted_class"] == "Lung Opacity"
+        assert mock_predict.call_count == 1
+
+        response = client.get(
+            f"{base_endpoint}/cache/predictions/stats",
+            headers={"Authorization": f"Bearer {active_token}"},
+        )
+        assert response.status_code == 200
+        assert response.json()["hits"] == 1
+        assert response.json()["misses"] == 1
+
+
+def test_download_model_into_artifact_cache(client, tmp_path):
+    available_model = models_summary[0]["name"]
+    mlflow_response = {**models_summary[0], "version": "1"}
+    content = b"model content"
+
+    def get(url, **kwargs):
+        response = MagicMock()
+        response.status_code = 200
+        response.raise_for_status.return_value = None
+        if url.endswith("/artifact"):
+            assert kwargs["params"] == {"kind": "keras", "version": "1"}
+            response.headers = {
+                "X-Content-SHA256": hashlib.sha256(content).hexdigest(),
+                "X-Model-Version": "1",
+            }
+            response.iter_content.return_value = [content]
+        else:
+            response.json.return_value = mlflow_response
+        return response
+
+    with patch(
+        "ml_host_backend.app.services.mlflow_service.session.get", side_effect=get
+    ), patch(
+        "ml_host_backend.app.services.models_service.artifact_cache",
+        ArtifactCache(directory=str(tmp_path), max_bytes=1024),
+    ):
+        response = client.post(
+            f"{base_endpoint}/{available_model}/download",
+            headers={"Authorization": f"Bearer {active_token}"},
+        )
+        assert response.status_code == 200
+        assert response.json()["version"] == "1"
+        with open(response.json()["artifacts"]["keras"], "rb") as f:
+            assert f.read() == content
+
+
+def test_make_prediction_records_stage_metrics(client):
+    mlflow_response = {**models_summary[0], "name": "metrics_model", "version": 7}
+    with patch(
+        "ml_host_backend.app.services.mlflow_service.session.get"
+    ) as mock_requests_get, patch(
+        "ml_host_backend.app.services.models_service.tf.keras.models.load_model",
+        return_value=mock_model,
+    ):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = mlflow_response
+        mock_response.raise_for_status.return_value = None
+        mock_requests_get.return_value = mock_response
+        for _ in range(2):
+            response = client.post(
+                f"{base_endpoint}/metrics_model/predict",
+                files={"file": ("test.png", make_png(), "image/png")},
+                headers={"Authorization": f"Bearer {active_token}"},
+            )
+            assert response.status_code == 200
+
+    def get_sample(name, **labels):
+        return REGISTRY.get_sample_value(
+            name, {"model": "metrics_model", "version": "7", **labels}
+        )
+
+    # the second request is served by the prediction cache
+    assert get_sample("inference_stage_seconds_count", stage="metadata") == 2
+    for stage in ("load", "decode", "preprocess", "forward", "serialize"):
+        assert get_sample("inference_stage_seconds_count", stage=stage) == 1
+    assert (
+        get_sample("inference_cache_requests_total", cache="prediction", result="hit")
+        == 1
+    )
+    assert (
+        get_sample("inference_cache_requests_total", cache="model", result="miss") == 1
+    )
+    assert "inference_stage_seconds_bucket" in client.get("/metrics").text
+
+
+def test_refresh_login(client):
+    tokens = {"access_token": "new-access", "refresh_token": "new-refresh"}
+    response_mock = MagicMock()
+    response_mock.json.return_value = tokens
+    with patch(
+        "ml_host_backend.app.services.auth_service.get_ml_user_mgmt_host_and_port",
+        return_value=("localhost", "8003"),
+    ), patch(
+        "ml_host_backend.app.services.auth_service.session.post",
+        return_value=response_mock,
+    ) as mock_post:
+        response = client.post(
+            f"{base_endpoint}/login/refresh", json={"refresh_token": "old-refresh"}
+        )
+    assert response.status_code == 200
+    assert response.json() == tokens
+    assert mock_post.call_args.args[0] == "http://localhost:8003/token/refresh"
+    assert mock_post.call_args.kwargs["json"] == {"refresh_token": "old-refresh"}
+
+
+def test_refresh_login_with_invalid_refresh_token(client):
+    response_mock = MagicMock()
+    response_mock.raise_for_status.side_effect = requests.exceptions.HTTPError("401")
+    with patch(
+        "ml_host_backend.app.services.auth_service.get_ml_user_mgmt_host_and_port",
+        return_value=("localhost", "8003"),
+    ), patch(
+        "ml_host_backend.app.services.auth_service.session.post",
+        return_value=response_mock,
+    ):
+        response = client.post(
+            f"{base_endpoint}/login/refresh", json={"refresh_token": "used"}
+        )
+    assert response.status_code == 401
+
+
+def test_refresh_token_is_not_an_access_token(client):
+    refresh_token = make_token(600, token_type="refresh")
+    response = client.get(
+        f"{base_endpoint}/", headers={"Authorization": f"Bearer {refresh_token}"}
+    )
+    assert response.status_code == 401
@@ -0,0 +1,111 @@
+import hashlib
+import os
+from unittest.mock import MagicMock
+
+import pytest
+from ml_host_backend.app.exceptions.service_exceptions import (
+    ArtifactChecksumException,
+    ArtifactVersionException,
+)
+from ml_host_backend.app.services.artifact_cache import ArtifactCache
+
+
+def make_response(content, version="1", sha256=None):
+    response = MagicMock()
+    response.headers = {
+        "X-Content-SHA256": sha256 or hashlib.sha256(content).hexdigest(),
+        "X-Model-Version": version,
+    }
+    response.iter_content.return_value = [content[:3], content[3:]]
+    return response
+
+
+def test_fetch_downloads_once_and_verifies_checksum(tmp_path):
+    cache = ArtifactCache(directory=str(tmp_path), max_bytes=1024)
+    open_artifact = MagicMock(return_value=make_response(b"model content"))
+
+    path = cache.fetch("model1", "1", "keras", open_artifact)
+    assert path.endswith(".keras")
+    with open(path, "rb") as f:
+        assert f.read() == b"model content"
+    assert cache.fetch("model1", "1", "keras", open_artifact) == path
+    assert open_artifact.call_count == 1
+    open_artifact.return_value.close.assert_called_once()
+    # no partially written files are left behind
+    assert [
+        name for name in os.listdir(tmp_path / "blobs") if name.endswith(".part")
+    ] == []
+
+
+def test_fetch_rejects_corrupted_download(tmp_path):
+    cache = ArtifactCache(directory=str(tmp_path), max_bytes=1024)
+    response = make_response(b"model content", sha256="0" * 64)
+
+    with pytest.raises(ArtifactChecksumException):
+        cache.fetch("model1", "1", "keras", lambda: response)
+    assert cache.get("model1", "1", "keras") is None
+    assert os.listdir(tmp_path / "blobs") == []
+
+
+def test_fetch_rejects_another_version(tmp_path):
+    cache = ArtifactCache(directory=str(tmp_path), max_bytes=1024)
+    response = make_response(b"version 2", version="2")
+
+    with pytest.raises(ArtifactVersionException):
+        cache.fetch("model1", "1", "keras", lambda: response)
+    response.close.assert_called_once()
+    assert cache.get("model1", "1", "keras") is None
+    assert cache.get("model1", "2", "keras") is None
+
+
+def test_index_survives_restart(tmp_path):
+    cache = ArtifactCache(directory=str(tmp_path), max_bytes=1024)
+    path = cache.fetch("model1", "1", "tflite", lambda: make_response(b"tflite"))
+    assert path.endswith(".tflite")
+
+    restarted = ArtifactCache(directory=str(tmp_path), max_bytes=1024)
+    assert restarted.get("model1", "1", "tflite") == path
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    cache = ArtifactCache(directory=str(tmp_path), max_bytes=1024)
+    first = cache.fetch("model1", "1", "keras", lambda: make_response(b"same"))
+    second = cache.fetch("model1", "2", "keras", lambda: make_response(b"same", "2"))
+    assert first == second
+    assert cache.stats()["bytes"] == 4
+
+
+def test_least_recently_used_artifacts_are_evicted(tmp_path):
+    cache = ArtifactCache(directory=str(tmp_path), max_bytes=20)
+    first = cache.fetch("model1", "1", "keras", lambda: make_response(b"a" * 10))
+    cache.fetch("model2", "1", "keras", lambda: make_response(b"b" * 10))
+    # model1 is used again, so model2 is the least recently used
+    cache.get("model1", "1", "keras")
+    cache.fetch("model3", "1", "keras", lambda: make_response(b"c" * 10))
+
+    assert cache.get("model1", "1", "keras") == first
+    assert cache.get("model2", "1", "keras") is None
+    assert cache.get("model3", "1", "keras") is not None
+    assert cache.stats()["evictions"] == 1
+    assert len(os.listdir(tmp_path / "blobs")) == 2
+
+
+def test_workers_sharing_the_directory_keep_each_others_entries(tmp_path):
+    worker1 = ArtifactCache(directory=str(tmp_path), max_bytes=20)
+    worker2 = ArtifactCache(directory=str(tmp_path), max_bytes=20)
+    first = worker1.fetch("model1", "1", "keras", lambda: make_response(b"a" * 10))
+    worker2.fetch("model2", "1", "keras", lambda: make_response(b"b" * 10))
+
+    # the download of the other worker is found, and isn't overwritten in the index
+    open_artifact = MagicMock()
+    assert worker2.fetch("model1", "1", "keras", open_artifact) == first
+    open_artifact.assert_not_called()
+    assert worker1.stats()["artifacts"] == ["model1/1/keras", "model2/1/keras"]
+
+    # an artifact evicted by the other worker is downloaded again
+    worker2.fetch("model3", "1", "keras", lambda: make_response(b"c" * 10))
+    assert worker1.get("model2", "1", "keras") is None
+    assert sorted(ArtifactCache(directory=str(tmp_path)).stats()["artifacts"]) == [
+        "model1/1/keras",
+        "model3/1/keras",
+    ]
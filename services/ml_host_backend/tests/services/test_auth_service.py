@@ -0,0 +1,137 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+from ml_host_backend.app.exceptions.client_exceptions import UnauthroizedException
+from ml_host_backend.app.exceptions.service_exceptions import (
+    MLUserMgmtUnavailableException,
+)
+from ml_host_backend.app.services import auth_service
+from ml_host_backend.tests.tokens import TEST_KID, TEST_PRIVATE_KEY, make_token
+
+
+@pytest.fixture(scope="module")
+def keys():
+    keys = {}
+    for kid in ("key-1", "key-2"):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+        jwk.update({"kid": kid, "use": "sig", "alg": "RS256"})
+        keys[kid] = (private_key, jwk)
+    return keys
+
+
+@pytest.fixture(autouse=True)
+def ml_user_mgmt_env(monkeypatch):
+    monkeypatch.setenv("ML_USER_MGMT_HOST", "localhost")
+    monkeypatch.setenv("ML_USER_MGMT_PORT", "8003")
+    # these tests fetch the keys of the fake ML User Mgmt, instead of using the test key
+    auth_service.verification_keys.clear()
+
+
+def sign(keys, kid, expires_in=600, jti="1"):
+    payload = {"user_id": "user123", "expires": time.time() + expires_in, "jti": jti}
+    return jwt.encode(payload, keys[kid][0], algorithm="RS256", headers={"kid": kid})
+
+
+def jwks_response(keys, published):
+    response = MagicMock()
+    response.json.return_value = {"keys": [keys[kid][1] for kid in published]}
+    return response
+
+
+def test_rs256_token_is_verified_with_cached_keys(keys):
+    with patch.object(
+        auth_service.session, "get", return_value=jwks_response(keys, ["key-1"])
+    ) as mock_get:
+        for _ in range(3):
+            payload = auth_service.decode_jwt(sign(keys, "key-1"))
+            assert payload["user_id"] == "user123"
+    mock_get.assert_called_once()
+    assert mock_get.call_args.args[0] == "http://localhost:8003/.well-known/jwks.json"
+
+
+def test_unknown_key_id_fetches_the_keys_again(keys):
+    with patch.object(
+        auth_service.session, "get", return_value=jwks_response(keys, ["key-1"])
+    ):
+        auth_service.decode_jwt(sign(keys, "key-1"))
+    auth_service.verification_keys._attempted_at = float("-inf")
+    with patch.object(
+        auth_service.session,
+        "get",
+        return_value=jwks_response(keys, ["key-1", "key-2"]),
+    ) as mock_get:
+        auth_service.decode_jwt(sign(keys, "key-2"))
+        # a second unknown key within the refresh interval doesn't cause a fetch
+        with pytest.raises(UnauthroizedException):
+            auth_service.decode_jwt(
+                jwt.encode({}, keys["key-1"][0], "RS256", {"kid": "x"})
+            )
+    mock_get.assert_called_once()
+
+
+def test_unreachable_ml_user_mgmt_is_reported_without_fetching_again(keys):
+    with patch.object(
+        auth_service.session, "get", side_effect=ConnectionError("refused")
+    ) as mock_get:
+        for _ in range(3):
+            with pytest.raises(MLUserMgmtUnavailableException):
+                auth_service.decode_jwt(sign(keys, "key-1"))
+    # failed fetches are rate limited, requests don't wait for the timeout every time
+    mock_get.assert_called_once()
+
+
+def test_stale_keys_are_used_while_ml_user_mgmt_is_unreachable(keys):
+    with patch.object(
+        auth_service.session, "get", return_value=jwks_response(keys, ["key-1"])
+    ):
+        auth_service.verification_refresher.refresh()
+    auth_service.verification_keys._fetched_at = float("-inf")
+    auth_service.verification_keys._attempted_at = float("-inf")
+    with patch.object(
+        auth_service.session, "get", side_effect=ConnectionError("refused")
+    ) as mock_get:
+        auth_service.verification_keys.refresh_if_stale()
+        assert auth_service.decode_jwt(sign(keys, "key-1"))["user_id"] == "user123"
+    mock_get.assert_called_once()
+
+
+def test_hs256_tokens_are_rejected():
+    token = jwt.encode(
+        {"user_id": "user123", "expires": time.time() + 600}, "secret", "HS256"
+    )
+    with patch.object(auth_service.session, "get") as mock_get:
+        with pytest.raises(UnauthroizedException, match="Invalid token."):
+            auth_service.decode_jwt(token)
+    mock_get.assert_not_called()
+
+
+def test_revoked_token_is_rejected_also_when_cached(keys):
+    auth_service.verification_keys.set(
+        {
+            "key-1": keys["key-1"][0].public_key(),
+            TEST_KID: TEST_PRIVATE_KEY.public_key(),
+        }
+    )
+    token = sign(keys, "key-1", jti="revoked-later")
+    assert auth_service.verify_jwt(token)
+
+    revoked = MagicMock()
+    revoked.json.return_value = {
+        "revoked": [{"jti": "revoked-later", "expires": time.time() + 600}],
+        "as_of": 123.0,
+    }
+    auth_service.revocation_list._synced_at = float("-inf")
+    auth_service.revocation_list._attempted_at = float("-inf")
+    with patch.object(auth_service.session, "get", return_value=revoked) as mock_get:
+        with pytest.raises(UnauthroizedException, match="Token is revoked."):
+            auth_service.verify_jwt(token)
+        # other tokens are still valid, the list is only synced once
+        assert auth_service.verify_jwt(make_token(600))
+    mock_get.assert_called_once()
+    assert mock_get.call_args.args[0] == "http://localhost:8003/revoked"
+    assert mock_get.call_args.kwargs["params"] == {"since": 0.0}
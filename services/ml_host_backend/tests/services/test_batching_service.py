@@ -0,0 +1,86 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+import tensorflow as tf
+from ml_host_backend.app.services import batching_service
+from ml_host_backend.app.services.batching_service import (
+    MicroBatcher,
+    predict_single_image,
+)
+
+
+def make_model():
+    model = MagicMock()
+    # every image is predicted as its mean pixel value, so callers can check their row
+    model.predict.side_effect = lambda batch: tf.reduce_mean(batch, axis=[1, 2]).numpy()
+    return model
+
+
+def test_concurrent_requests_are_predicted_in_one_batch():
+    batcher = MicroBatcher("test", window_seconds=0.2, max_batch_size=8)
+    model = make_model()
+    results = {}
+
+    def request(value):
+        image = tf.fill((4, 4, 1), float(value))
+        results[value] = batcher.predict(model, image)
+
+    threads = [threading.Thread(target=request, args=(value,)) for value in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.predict.call_count == 1
+    assert model.predict.call_args[0][0].shape == (5, 4, 4, 1)
+    for value in range(5):
+        np.testing.assert_allclose(results[value], [value])
+
+
+def test_batch_is_limited_by_max_batch_size():
+    batcher = MicroBatcher("test", window_seconds=0.2, max_batch_size=2)
+    model = make_model()
+    futures = [batcher.submit(model, tf.fill((4, 4, 1), 1.0)) for _ in range(5)]
+    for future in futures:
+        future.result(timeout=5)
+    batch_sizes = [call[0][0].shape[0] for call in model.predict.call_args_list]
+    assert max(batch_sizes) <= 2
+    assert sum(batch_sizes) == 5
+
+
+def test_prediction_errors_are_passed_to_every_caller():
+    batcher = MicroBatcher("test", window_seconds=0.01, max_batch_size=4)
+    model = MagicMock()
+    model.predict.side_effect = RuntimeError("forward pass failed")
+    future = batcher.submit(model, tf.fill((4, 4, 1), 1.0))
+    with pytest.raises(RuntimeError):
+        future.result(timeout=5)
+
+
+def test_predict_single_image_without_batching():
+    model = make_model()
+    with patch(
+        "ml_host_backend.app.services.batching_service.MICRO_BATCH_WINDOW_MS", 0
+    ):
+        pred = predict_single_image(("model1", "1"), model, tf.fill((4, 4, 1), 3.0))
+    np.testing.assert_allclose(pred, [3.0])
+    assert model.predict.call_args[0][0].shape == (1, 4, 4, 1)
+
+
+def test_idle_batchers_are_stopped_and_removed():
+    model = make_model()
+    with patch(
+        "ml_host_backend.app.services.batching_service.MICRO_BATCH_IDLE_SECONDS", 0.05
+    ):
+        pred = predict_single_image(("idle", "1"), model, tf.fill((4, 4, 1), 2.0))
+        np.testing.assert_allclose(pred, [2.0])
+        batcher = batching_service._batchers[("idle", "1")]
+        batcher._thread.join(timeout=5)
+        assert not batcher.is_alive()
+        assert ("idle", "1") not in batching_service._batchers
+
+        # the next request starts a new batcher
+        pred = predict_single_image(("idle", "1"), model, tf.fill((4, 4, 1), 3.0))
+    np.testing.assert_allclose(pred, [3.0])
@@ -0,0 +1,35 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import tensorflow as tf
+from ml_host_backend.app.services.compiled_inference import (
+    CompiledModel,
+    compile_model,
+)
+from ml_host_backend.app.services.model_cache import estimate_model_bytes
+
+
+def make_keras_model():
+    inputs = tf.keras.Input(shape=(8, 8, 1))
+    x = tf.keras.layers.Flatten()(inputs)
+    outputs = tf.keras.layers.Dense(2, activation="softmax")(x)
+    return tf.keras.Model(inputs, outputs)
+
+
+def test_compiled_model_matches_predict():
+    model = make_keras_model()
+    compiled = compile_model(model)
+    assert isinstance(compiled, CompiledModel)
+    assert compiled.input_shape == model.input_shape
+    assert estimate_model_bytes(compiled) == estimate_model_bytes(model)
+
+    # the same compiled function serves every batch size
+    for batch_size in (1, 3):
+        images = np.random.rand(batch_size, 8, 8, 1).astype("float32")
+        expected = model.predict(images, verbose=0)
+        np.testing.assert_allclose(compiled.predict(images), expected, rtol=1e-5)
+
+
+def test_compile_model_falls_back_to_model():
+    model = MagicMock()
+    assert compile_model(model) is model
@@ -1,39 +1,110 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch
 
 import pytest
 from ml_host_backend.app.exceptions.service_exceptions import (
+    GoogleDriveDownloadException,
     GoogleDriveFolderEmptyException,
     ModelNotFoundException,
 )
 from ml_host_backend.app.services.google_drive_service import (
     download_model_from_google_drive,
+    download_models_from_google_drive,
+    get_list_of_models_from_google_drive,
 )
 
+MODEL_CONTENT = bytes(range(256)) * 64
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """Serves MODEL_CONTENT for every path and supports "Range: bytes=<start>-" requests."""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("Range")))
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].split("=")[1].split("-")[0])
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                f"bytes {start}-{len(MODEL_CONTENT) - 1}/{len(MODEL_CONTENT)}",
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(MODEL_CONTENT) - start))
+        self.end_headers()
+        self.wfile.write(MODEL_CONTENT[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def file_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def drive_folder(file_server, tmp_path):
+    with (
+        patch(
+            "ml_host_backend.app.services.google_drive_service.gdown.download_folder"
+        ) as mock_download_folder,
+        patch(
+            "ml_host_backend.app.services.google_drive_service.MODEL_FOLDER",
+            str(tmp_path),
+        ),
+        patch(
+            "ml_host_backend.app.services.google_drive_service.DRIVE_DOWNLOAD_URL",
+            f"http://127.0.0.1:{file_server.server_port}/{{id}}",
+        ),
+    ):
+        mock_download_folder.return_value = [
+            ("id_a", "model_a.keras", "model_a.keras"),
+            ("id_b", "model_b.keras", "model_b.keras"),
+        ]
+        yield mock_download_folder
+
 
 @patch("ml_host_backend.app.services.google_drive_service.gdown.download_folder")
 @patch("ml_host_backend.app.services.google_drive_service.gdown.download")
-@patch("os.getenv")
-@pytest.mark.skip
-def test_load_model_success(mock_getenv, mock_download, mock_download_folder):
-    # Mock environment variable
-    mock_getenv.return_value = "https://drive.google.com/folder_url"
-
+def test_load_model_success(mock_download, mock_download_folder, tmp_path):
     # Mock file list returned by gdown.download_folder
     mock_download_folder.return_value = [
         ("file_id_123", "test_model.h5", "./data/models/test_model.h5")
     ]
 
     # Mock gdown.download to simulate successful download
-    mock_download.return_value = "models/test_model.h5"
+    def download(url, output, quiet, resume):
+        with open(output, "wb") as f:
+            f.write(b"model content")
+        return output
 
-    # Call the function
-    result = download_model_from_google_drive("test_model.h5")
+    mock_download.side_effect = download
+
+    with patch(
+        "ml_host_backend.app.services.google_drive_service.MODEL_FOLDER", str(tmp_path)
+    ):
+        # Call the function twice, the second call finds the downloaded model
+        result = download_model_from_google_drive("test_model.h5")
+        assert download_model_from_google_drive("test_model.h5") == result
 
     # Assertions
-    assert result == "./data/models/test_model.h5"
+    assert result == str(tmp_path / "test_model.h5")
     mock_download_folder.assert_called_once()
     mock_download.assert_called_once_with(
-        id="file_id_123", output="./data/models/test_model.h5", quiet=False
+        url="https://drive.google.com/uc?id=file_id_123",
+        output=result,
+        quiet=False,
+        resume=True,
     )
 
 
@@ -70,3 +141,57 @@ def test_google_drive_folder_empty(mock_getenv, mock_download_folder):
         GoogleDriveFolderEmptyException, match="No files found or invalid folder URL."
     ):
         download_model_from_google_drive("test_model.h5")
+
+
+def test_list_of_models_is_cached(drive_folder):
+    assert get_list_of_models_from_google_drive() == drive_folder.return_value
+    assert get_list_of_models_from_google_drive() == drive_folder.return_value
+    drive_folder.assert_called_once()
+
+
+def test_download_is_resumed_and_skipped(drive_folder, file_server, tmp_path):
+    # an interrupted download left the first half of the file behind
+    download_model_from_google_drive("model_a.keras")
+    (tmp_path / "model_a.keras").unlink()
+    (tmp_path / "model_a.keras.abc.part").write_bytes(MODEL_CONTENT[:8192])
+    file_server.requests.clear()
+
+    model_path = download_model_from_google_drive("model_a.keras")
+    assert open(model_path, "rb").read() == MODEL_CONTENT
+    # gdown probes the URL, before it requests the missing bytes
+    assert file_server.requests[-1] == ("/id_a", "bytes=8192-")
+    assert not list(tmp_path.glob("*.part"))
+
+    # the identical local copy isn't downloaded again
+    file_server.requests.clear()
+    download_model_from_google_drive("model_a.keras")
+    assert file_server.requests == []
+
+    # a modified local copy is downloaded again
+    (tmp_path / "model_a.keras").write_bytes(b"corrupted")
+    download_model_from_google_drive("model_a.keras")
+    assert open(model_path, "rb").read() == MODEL_CONTENT
+    assert file_server.requests == [("/id_a", None)]
+
+
+def test_partial_download_of_another_file_is_not_resumed(
+    drive_folder, file_server, tmp_path
+):
+    (tmp_path / "model_a.keras.abc.part").write_bytes(b"x" * 8192)
+
+    model_path = download_model_from_google_drive("model_a.keras")
+    assert open(model_path, "rb").read() == MODEL_CONTENT
+    assert file_server.requests == [("/id_a", None)]
+
+
+def test_download_models_in_parallel(drive_folder, file_server, tmp_path):
+    model_paths = download_models_from_google_drive(["model_a.keras", "model_b.keras"])
+    assert model_paths == {
+        "model_a.keras": str(tmp_path / "model_a.keras"),
+        "model_b.keras": str(tmp_path / "model_b.keras"),
+    }
+    assert sorted(path for path, _ in file_server.requests) == ["/id_a", "/id_b"]
+    drive_folder.assert_called_once()
+
+    with pytest.raises(GoogleDriveDownloadException, match="missing.keras"):
+        download_models_from_google_drive(["model_a.keras", "missing.keras"])
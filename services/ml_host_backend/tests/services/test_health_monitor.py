@@ -0,0 +1,56 @@
+from unittest.mock import MagicMock, patch
+
+import requests
+from ml_host_backend.app.services.health_monitor import CircuitBreaker, HealthMonitor
+
+
+def test_circuit_opens_after_threshold_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert not breaker.allow_request()
+    assert breaker.status()["state"] == "open"
+
+
+def test_success_resets_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow_request()
+
+
+def test_circuit_half_opens_after_reset_time():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    assert breaker.status()["state"] == "half_open"
+    # a failing trial request opens the circuit again
+    breaker.record_failure()
+    assert breaker.status()["state"] == "open"
+    breaker.allow_request()
+    breaker.record_success()
+    assert breaker.status()["state"] == "closed"
+
+
+def test_health_monitor_feeds_circuit_breaker():
+    monitor = HealthMonitor(interval_seconds=60, timeout_seconds=1)
+    breaker = CircuitBreaker("dependency", failure_threshold=1, reset_seconds=60)
+    monitor.register("dependency", lambda: "http://localhost:5000/health", breaker)
+    with patch.object(monitor._session, "get") as mock_get:
+        mock_get.side_effect = requests.exceptions.ConnectionError("refused")
+        assert not monitor.check("dependency")
+        assert monitor.status() == {"dependency": {"state": "open", "failures": 1}}
+
+        mock_get.side_effect = None
+        mock_get.return_value = MagicMock()
+        assert monitor.check("dependency")
+        assert monitor.status()["dependency"]["state"] == "closed"
+        mock_get.assert_called_with("http://localhost:5000/health", timeout=1)
+
+
+def test_health_of_dependencies_endpoint(test_host_backend_client):
+    response = test_host_backend_client.get("/health/dependencies")
+    assert response.status_code == 200
+    assert set(response.json()) == {"mlflow", "ml_user_mgmt"}
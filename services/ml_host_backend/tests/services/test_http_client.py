@@ -0,0 +1,14 @@
+from ml_host_backend.app.services import auth_service, mlflow_service
+from ml_host_backend.app.services.http_client import create_session
+
+
+def test_create_session_uses_connection_pool():
+    session = create_session(pool_connections=2, pool_maxsize=8)
+    adapter = session.get_adapter("http://localhost:5000/health")
+    assert adapter._pool_connections == 2
+    assert adapter._pool_maxsize == 8
+    assert session.get_adapter("https://localhost:5000/health") is not None
+
+
+def test_services_use_their_own_pooled_session():
+    assert mlflow_service.session is not auth_service.session
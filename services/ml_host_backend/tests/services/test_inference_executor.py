@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from ml_host_backend.app.exceptions.client_exceptions import (
+    ClientDisconnectedException,
+)
+from ml_host_backend.app.exceptions.service_exceptions import (
+    InferenceQueueFullException,
+)
+from ml_host_backend.app.services.inference_executor import InferenceExecutor
+
+
+def connected_request():
+    request = MagicMock()
+    request.is_disconnected = AsyncMock(return_value=False)
+    return request
+
+
+def test_run_returns_result():
+    executor = InferenceExecutor(max_workers=2, max_queue=2)
+    result = asyncio.run(executor.run(connected_request(), lambda x: x * 2, 21))
+    assert result == 42
+    assert executor.stats()["queued"] == 0
+    assert executor.stats()["running"] == 0
+
+
+def test_run_does_not_block_event_loop():
+    executor = InferenceExecutor(max_workers=1, max_queue=1)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(
+            executor.run(connected_request(), time.sleep, 0.3), ticker()
+        )
+
+    asyncio.run(main())
+    # the ticker kept running while the blocking job was executed
+    assert len(ticks) == 5
+    assert ticks[-1] - ticks[0] < 0.3
+
+
+def test_submit_rejects_when_queue_is_full():
+    executor = InferenceExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+    futures = [executor.submit(release.wait) for _ in range(2)]
+    with pytest.raises(InferenceQueueFullException):
+        executor.submit(release.wait)
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+
+
+def test_run_cancels_queued_job_on_client_disconnect():
+    executor = InferenceExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+    blocking = executor.submit(release.wait)
+    job = MagicMock()
+    request = MagicMock()
+    request.is_disconnected = AsyncMock(return_value=True)
+    with pytest.raises(ClientDisconnectedException):
+        asyncio.run(executor.run(request, job))
+    release.set()
+    blocking.result(timeout=5)
+    job.assert_not_called()
+    assert executor.stats()["queued"] == 0
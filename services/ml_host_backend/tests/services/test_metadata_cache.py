@@ -0,0 +1,77 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+from ml_host_backend.app.services.metadata_cache import MetadataCache
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_fresh_entry_is_served_from_cache():
+    cache = MetadataCache(ttl_seconds=60, max_stale_seconds=60)
+    fetch = MagicMock(return_value={"version": "1"})
+    assert cache.get("model1", fetch) == {"version": "1"}
+    assert cache.get("model1", fetch) == {"version": "1"}
+    assert fetch.call_count == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_stale_entry_is_served_while_refreshed_in_background():
+    cache = MetadataCache(ttl_seconds=0, max_stale_seconds=60)
+    cache.set("model1", {"version": "1"})
+    release = threading.Event()
+
+    def fetch():
+        release.wait(timeout=5)
+        return {"version": "2"}
+
+    # the stale value is returned immediately, without waiting for the refresh
+    assert cache.get("model1", fetch) == {"version": "1"}
+    assert cache.stats()["stale_hits"] == 1
+    release.set()
+    assert wait_for(lambda: cache._entries["model1"][0] == {"version": "2"})
+
+
+def test_expired_entry_is_fetched_synchronously():
+    cache = MetadataCache(ttl_seconds=0, max_stale_seconds=0)
+    cache.set("model1", {"version": "1"})
+    assert cache.get("model1", lambda: {"version": "2"}) == {"version": "2"}
+    assert cache.stats()["misses"] == 1
+
+
+def test_failed_refresh_keeps_stale_entry():
+    cache = MetadataCache(ttl_seconds=0, max_stale_seconds=60)
+    cache.set("model1", {"version": "1"})
+    fetch = MagicMock(side_effect=Exception("MLFlow down"))
+    assert cache.get("model1", fetch) == {"version": "1"}
+    assert wait_for(lambda: not cache._refreshing)
+    assert cache._entries["model1"][0] == {"version": "1"}
+
+
+def test_invalidate_removes_entry():
+    cache = MetadataCache(ttl_seconds=60, max_stale_seconds=60)
+    cache.set("model1", {"version": "1"})
+    cache.set("model2", {"version": "1"})
+    cache.invalidate("model1")
+    fetch = MagicMock(return_value={"version": "2"})
+    assert cache.get("model1", fetch) == {"version": "2"}
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+
+
+def test_fetch_does_not_restore_an_entry_invalidated_meanwhile():
+    cache = MetadataCache(ttl_seconds=60, max_stale_seconds=60)
+
+    def fetch():
+        # the model is updated, while its old summary is fetched
+        cache.invalidate("model1")
+        return {"version": "1"}
+
+    assert cache.get("model1", fetch) == {"version": "1"}
+    assert cache.stats()["entries"] == 0
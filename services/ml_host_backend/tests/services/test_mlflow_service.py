@@ -1,13 +1,17 @@
 from unittest.mock import MagicMock, patch
 
 import pytest
+import requests
 from ml_host_backend.app.exceptions.service_exceptions import (
     MLFlowException,
+    MLFlowUnavailableException,
     ModelNotFoundException,
 )
 from ml_host_backend.app.services.mlflow_service import (
     get_single_model_summary_from_mlflow,
     list_all_models_from_mlflow,
+    mlflow_circuit_breaker,
+    model_summary_cache,
 )
 
 
@@ -15,7 +19,7 @@ from ml_host_backend.app.services.mlflow_service import (
     "ml_host_backend.app.services.mlflow_service.get_mlflow_host_and_port",
     return_value=("localhost", "5000"),
 )
-@patch("ml_host_backend.app.services.mlflow_service.requests.get")
+@patch("ml_host_backend.app.services.mlflow_service.session.get")
 def test_list_all_models_success(mock_requests_get, mock_get_host_port):
     mock_response = MagicMock()
     mock_response.json.return_value = {
@@ -25,9 +29,8 @@ def test_list_all_models_success(mock_requests_get, mock_get_host_port):
     mock_requests_get.return_value = mock_response
     result = list_all_models_from_mlflow(type("", (), {"credentials": "token123"})())
     assert result == [{"name": "model1"}, {"name": "model2"}]
-    assert mock_requests_get.call_count == 2
+    assert mock_requests_get.call_count == 1
     expected_calls = [
-        (("http://localhost:5000/health",), {"timeout": 10}),
         (
             ("http://localhost:5000/models",),
             {"headers": {"Authorization": "Bearer token123"}, "timeout": 10},
@@ -43,7 +46,7 @@ def test_list_all_models_success(mock_requests_get, mock_get_host_port):
     "ml_host_backend.app.services.mlflow_service.get_mlflow_host_and_port",
     return_value=("localhost", "5000"),
 )
-@patch("ml_host_backend.app.services.mlflow_service.requests.get")
+@patch("ml_host_backend.app.services.mlflow_service.session.get")
 def test_list_all_models_no_models_key(mock_requests_get, mock_get_host_port):
     mock_response = MagicMock()
     mock_response.json.return_value = [{"name": "model1"}]
@@ -57,13 +60,9 @@ def test_list_all_models_no_models_key(mock_requests_get, mock_get_host_port):
     "ml_host_backend.app.services.mlflow_service.get_mlflow_host_and_port",
     return_value=("localhost", "5000"),
 )
-@patch("ml_host_backend.app.services.mlflow_service.requests.get")
+@patch("ml_host_backend.app.services.mlflow_service.session.get")
 def test_list_all_models_raises_mlflow_exception(mock_requests_get, mock_get_host_port):
-    mock_response = MagicMock()
-    mock_response.status_code = 200
-    mock_response.raise_for_status.return_value = None
-    # return 200 for the health check but raise an exception for the model summary
-    mock_requests_get.side_effect = [mock_response, Exception("Connection error")]
+    mock_requests_get.side_effect = Exception("Connection error")
     with pytest.raises(MLFlowException):
         list_all_models_from_mlflow(type("", (), {"credentials": "token123"})())
 
@@ -72,7 +71,7 @@ def test_list_all_models_raises_mlflow_exception(mock_requests_get, mock_get_hos
     "ml_host_backend.app.services.mlflow_service.get_mlflow_host_and_port",
     return_value=("localhost", "5000"),
 )
-@patch("ml_host_backend.app.services.mlflow_service.requests.get")
+@patch("ml_host_backend.app.services.mlflow_service.session.get")
 def test_get_single_model_summary_success(mock_requests_get, mock_get_host_port):
     mock_response = MagicMock()
     mock_response.status_code = 200
@@ -83,9 +82,10 @@ def test_get_single_model_summary_success(mock_requests_get, mock_get_host_port)
         "model1", type("", (), {"credentials": "token123"})()
     )
     assert result == {"name": "model1", "version": "1"}
-    assert mock_requests_get.call_count == 2
+    assert mock_requests_get.call_count == 1
+    # only the metadata cache stores summaries
+    assert model_summary_cache.stats()["entries"] == 0
     expected_calls = [
-        (("http://localhost:5000/health",), {"timeout": 10}),
         (
             ("http://localhost:5000/models/model1",),
             {"headers": {"Authorization": "Bearer token123"}, "timeout": 10},
@@ -101,7 +101,7 @@ def test_get_single_model_summary_success(mock_requests_get, mock_get_host_port)
     "ml_host_backend.app.services.mlflow_service.get_mlflow_host_and_port",
     return_value=("localhost", "5000"),
 )
-@patch("ml_host_backend.app.services.mlflow_service.requests.get")
+@patch("ml_host_backend.app.services.mlflow_service.session.get")
 def test_get_single_model_summary_not_found(mock_requests_get, mock_get_host_port):
     mock_response = MagicMock()
     mock_response.status_code = 404
@@ -117,17 +117,32 @@ def test_get_single_model_summary_not_found(mock_requests_get, mock_get_host_por
     "ml_host_backend.app.services.mlflow_service.get_mlflow_host_and_port",
     return_value=("localhost", "5000"),
 )
-@patch("ml_host_backend.app.services.mlflow_service.requests.get")
+@patch("ml_host_backend.app.services.mlflow_service.session.get")
 def test_get_single_model_summary_other_exception(
     mock_requests_get, mock_get_host_port
 ):
-    # First call (healthcheck) returns a successful response, second call raises Exception
-    mock_response = MagicMock()
-    mock_response.status_code = 200
-    mock_response.raise_for_status.return_value = None
-    # return 200 for the health check but raise an exception for the model summary
-    mock_requests_get.side_effect = [mock_response, Exception("Timeout")]
+    mock_requests_get.side_effect = Exception("Timeout")
     with pytest.raises(MLFlowException):
         get_single_model_summary_from_mlflow(
             "model1", type("", (), {"credentials": "token123"})()
         )
+
+
+@patch(
+    "ml_host_backend.app.services.mlflow_service.get_mlflow_host_and_port",
+    return_value=("localhost", "5000"),
+)
+@patch("ml_host_backend.app.services.mlflow_service.session.get")
+def test_circuit_opens_after_connection_errors(mock_requests_get, mock_get_host_port):
+    mock_requests_get.side_effect = requests.exceptions.ConnectionError("refused")
+    credentials = type("", (), {"credentials": "token123"})()
+    for _ in range(mlflow_circuit_breaker.failure_threshold):
+        with pytest.raises(MLFlowUnavailableException):
+            get_single_model_summary_from_mlflow("model1", credentials)
+    assert mlflow_circuit_breaker.status()["state"] == "open"
+
+    # requests fail fast without calling MLFlow, while the circuit is open
+    mock_requests_get.reset_mock()
+    with pytest.raises(MLFlowUnavailableException):
+        get_single_model_summary_from_mlflow("model1", credentials)
+    mock_requests_get.assert_not_called()
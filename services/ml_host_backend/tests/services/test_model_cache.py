@@ -0,0 +1,231 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+import tensorflow as tf
+from ml_host_backend.app.exceptions.service_exceptions import (
+    ModelMemoryBudgetException,
+)
+from ml_host_backend.app.services.model_cache import (
+    ModelCache,
+    estimate_activation_bytes,
+    estimate_model_bytes,
+)
+
+
+def make_model(num_weights):
+    weight = MagicMock()
+    weight.shape = (num_weights,)
+    weight.dtype = "float32"
+    model = MagicMock()
+    model.weights = [weight]
+    return model
+
+
+def test_estimate_model_bytes():
+    assert estimate_model_bytes(make_model(1000)) == 4000
+
+
+def test_get_or_load_caches_model():
+    cache = ModelCache(max_models=2, max_bytes=0)
+    loader = MagicMock(return_value=make_model(10))
+    first = cache.get_or_load(("model1", "1"), loader)
+    second = cache.get_or_load(("model1", "1"), loader)
+    assert first is second
+    assert loader.call_count == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 0
+
+
+def test_new_version_is_loaded_separately():
+    cache = ModelCache(max_models=2, max_bytes=0)
+    cache.get_or_load(("model1", "1"), lambda: make_model(10))
+    loader = MagicMock(return_value=make_model(10))
+    cache.get_or_load(("model1", "2"), loader)
+    assert loader.call_count == 1
+
+
+def test_evicts_least_recently_used_by_count():
+    cache = ModelCache(max_models=2, max_bytes=0)
+    cache.put(("model1", "1"), make_model(10))
+    cache.put(("model2", "1"), make_model(10))
+    cache.get(("model1", "1"))  # model2 is now least recently used
+    cache.put(("model3", "1"), make_model(10))
+    assert cache.get(("model2", "1")) is None
+    assert cache.get(("model1", "1")) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicts_least_recently_used_by_memory_budget():
+    cache = ModelCache(max_models=10, max_bytes=10000)
+    cache.put(("model1", "1"), make_model(1000))  # 4000 bytes
+    cache.put(("model2", "1"), make_model(1000))  # 8000 bytes
+    cache.put(("model3", "1"), make_model(1000))  # 12000 bytes -> evict model1
+    assert cache.get(("model1", "1")) is None
+    assert cache.stats()["size_bytes"] == 8000
+
+
+def test_keeps_single_model_exceeding_budget():
+    cache = ModelCache(max_models=10, max_bytes=100)
+    cache.put(("model1", "1"), make_model(1000))
+    assert cache.get(("model1", "1")) is not None
+
+
+def test_concurrent_loads_only_load_once():
+    cache = ModelCache(max_models=2, max_bytes=0)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return make_model(np.int64(10))
+
+    threads = [
+        threading.Thread(target=cache.get_or_load, args=(("model1", "1"), loader))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    # the load lock is removed, once no request holds or waits for it
+    assert cache._load_locks == {}
+
+
+def test_estimate_activation_bytes():
+    model = tf.keras.Sequential(
+        [
+            tf.keras.Input((8, 8, 1)),
+            tf.keras.layers.Conv2D(4, 3, padding="same"),  # 1024 bytes per image
+            tf.keras.layers.Flatten(),  # 1024 bytes per image
+            tf.keras.layers.Dense(2),  # 8 bytes per image
+        ]
+    )
+    assert estimate_activation_bytes(model, batch_size=2) == 4096
+    assert estimate_activation_bytes(make_model(10)) == 0
+
+
+def test_refuses_model_which_can_never_fit():
+    # 9000 of the 10000 bytes are used by the process itself
+    rss = {"bytes": 9000}
+    cache = ModelCache(
+        max_models=10,
+        max_bytes=0,
+        memory_budget_bytes=10000,
+        rss_reader=lambda: rss["bytes"],
+    )
+    loader = MagicMock(return_value=make_model(1000))
+    with pytest.raises(ModelMemoryBudgetException):
+        cache.get_or_load(("model1", "1"), loader, size_hint=4000)
+    loader.assert_not_called()
+
+    def load_without_size_hint():
+        rss["bytes"] += 4000
+        return make_model(1000)
+
+    # without a size hint, the model is refused after it is loaded
+    with pytest.raises(ModelMemoryBudgetException):
+        cache.get_or_load(("model1", "1"), load_without_size_hint)
+    assert cache.get(("model1", "1")) is None
+    assert cache.stats()["refused"] == 2
+
+
+def test_evicts_least_recently_used_by_process_memory_budget():
+    # the process itself uses 2000 bytes, the rest is held by the cached models
+    cache = ModelCache(
+        max_models=10,
+        max_bytes=0,
+        memory_budget_bytes=10000,
+        rss_reader=lambda: 2000 + cache._total_bytes(),
+    )
+    cache.get_or_load(("model1", "1"), lambda: make_model(1000), size_hint=4000)
+    cache.get_or_load(("model2", "1"), lambda: make_model(1000), size_hint=4000)
+    # 2000 + 8000 + 4000 bytes exceed the budget, model1 is evicted before the load
+    cache.get_or_load(("model3", "1"), lambda: make_model(1000), size_hint=4000)
+    assert [model["name"] for model in cache.residency()["models"]] == [
+        "model2",
+        "model3",
+    ]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_concurrent_loads_share_the_memory_budget():
+    # the process itself uses 2000 bytes, models being loaded aren't resident yet
+    cache = ModelCache(
+        max_models=10,
+        max_bytes=0,
+        memory_budget_bytes=10000,
+        rss_reader=lambda: 2000
+        + sum(entry.size_bytes for entry in cache._entries.values()),
+    )
+    loading = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def load_first():
+        loading.set()
+        release.wait(timeout=5)
+        order.append("model1")
+        return make_model(1000)
+
+    def load_second():
+        order.append("model2")
+        return make_model(1000)
+
+    first = threading.Thread(
+        target=cache.get_or_load,
+        args=(("model1", "1"), load_first),
+        kwargs={"size_hint": 5000},
+    )
+    first.start()
+    assert loading.wait(timeout=5)
+    # 2000 + 5000 reserved + 5000 bytes exceed the budget, the second load waits
+    second = threading.Thread(
+        target=cache.get_or_load,
+        args=(("model2", "1"), load_second),
+        kwargs={"size_hint": 5000},
+    )
+    second.start()
+    time.sleep(0.1)
+    assert order == []
+    release.set()
+    first.join(timeout=5)
+    second.join(timeout=5)
+    assert order == ["model1", "model2"]
+    assert cache._reservations == {}
+
+
+def test_failed_load_releases_its_reservation():
+    cache = ModelCache(
+        max_models=10, max_bytes=0, memory_budget_bytes=10000, rss_reader=lambda: 0
+    )
+    with pytest.raises(OSError):
+        cache.get_or_load(
+            ("model1", "1"), MagicMock(side_effect=OSError()), size_hint=4000
+        )
+    assert cache._reservations == {}
+    assert cache._load_locks == {}
+
+
+def test_residency_and_unload():
+    cache = ModelCache(max_models=10, max_bytes=0)
+    cache.put(("model1", "1"), make_model(1000))
+    cache.put(("model1", "2"), make_model(1000))
+    cache.get(("model1", "2"))
+
+    models = cache.residency()["models"]
+    assert [(model["version"], model["hits"]) for model in models] == [
+        ("1", 0),
+        ("2", 1),
+    ]
+    assert models[0]["param_bytes"] == 4000
+    assert models[1]["last_used"] >= models[1]["loaded_at"]
+
+    assert cache.unload("model1", "1") == [("model1", "1")]
+    assert cache.unload("model1") == [("model1", "2")]
+    assert cache.unload("model1") == []
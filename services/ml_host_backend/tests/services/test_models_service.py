@@ -0,0 +1,70 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+import tensorflow as tf
+from ml_host_backend.app.exceptions.service_exceptions import ModelNotFoundException
+from ml_host_backend.app.metrics import StageTimer
+from ml_host_backend.app.services.models_service import (
+    decode_image,
+    get_jpeg_decode_ratio,
+    predict_image_classification,
+    read_and_prepare_image,
+)
+from prometheus_client import REGISTRY
+
+
+def make_image(height, width, encode):
+    image = np.random.randint(0, 255, (height, width, 1), dtype=np.uint8)
+    return encode(tf.constant(image)).numpy()
+
+
+def test_get_jpeg_decode_ratio():
+    assert get_jpeg_decode_ratio((3000, 2400), (224, 224)) == 8
+    assert get_jpeg_decode_ratio((1000, 1000), (224, 224)) == 4
+    assert get_jpeg_decode_ratio((600, 600), (299, 299)) == 2
+    assert get_jpeg_decode_ratio((300, 300), (224, 224)) == 1
+
+
+def test_decode_jpeg_at_reduced_resolution():
+    content = make_image(2000, 1800, tf.io.encode_jpeg)
+    image = decode_image(content, (224, 224))
+    assert tuple(image.shape) == (250, 225, 1)
+
+
+def test_decode_png_at_full_resolution():
+    content = make_image(500, 400, tf.io.encode_png)
+    image = decode_image(content, (224, 224))
+    assert tuple(image.shape) == (500, 400, 1)
+
+
+def test_read_and_prepare_jpeg_for_rgb_model():
+    model = MagicMock()
+    model.input_shape = (None, 224, 224, 3)
+    content = make_image(2000, 1800, tf.io.encode_jpeg)
+    image = read_and_prepare_image(content, model, StageTimer("test"))
+    assert tuple(image.shape) == (224, 224, 3)
+    assert float(tf.reduce_max(image)) <= 1.0
+
+
+@patch(
+    "ml_host_backend.app.services.models_service.get_model_summary_for_prediction",
+    side_effect=ModelNotFoundException(),
+)
+def test_metadata_stage_of_unknown_models_is_not_labelled_with_the_name(_):
+    with pytest.raises(ModelNotFoundException):
+        predict_image_classification("no_such_model", b"", credentials=None)
+
+    labels = {"stage": "metadata", "version": ""}
+    assert (
+        REGISTRY.get_sample_value(
+            "inference_stage_seconds_count", {"model": "no_such_model", **labels}
+        )
+        is None
+    )
+    assert (
+        REGISTRY.get_sample_value(
+            "inference_stage_seconds_count", {"model": "unknown", **labels}
+        )
+        >= 1
+    )
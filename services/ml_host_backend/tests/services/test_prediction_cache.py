@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from ml_host_backend.app.services.prediction_cache import PredictionCache
+
+result = {"predicted_class": "COVID", "probabilities": {"Normal": 0.1, "COVID": 0.9}}
+
+
+def test_make_key_uses_image_hash_model_version_and_artifact_kind():
+    key = PredictionCache.make_key(b"image", "model1", "1", "keras")
+    assert key[1:] == ("model1", "1", "keras")
+    assert key == PredictionCache.make_key(b"image", "model1", "1", "keras")
+    assert key != PredictionCache.make_key(b"image", "model1", "2", "keras")
+    assert key != PredictionCache.make_key(b"other", "model1", "1", "keras")
+    assert key != PredictionCache.make_key(b"image", "model1", "1", "int8")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = PredictionCache(max_entries=2, db_path="")
+    cache.put("a", result)
+    cache.put("b", result)
+    cache.get("a")
+    cache.put("c", result)
+    assert cache.get("b") is None
+    assert cache.get("a") == result
+    assert cache.get("c") == result
+
+
+def test_disk_tier_without_artifact_kind_is_dropped(tmp_path):
+    db_path = str(tmp_path / "predictions.db")
+    db = sqlite3.connect(db_path)
+    db.execute(
+        "CREATE TABLE predictions (image_hash TEXT, model_name TEXT, "
+        "model_version TEXT, result TEXT, created REAL, "
+        "PRIMARY KEY (image_hash, model_name, model_version))"
+    )
+    db.execute("INSERT INTO predictions VALUES ('hash', 'model1', '1', '{}', 0)")
+    db.commit()
+    db.close()
+
+    cache = PredictionCache(max_entries=2, db_path=db_path)
+    key = PredictionCache.make_key(b"image", "model1", "1", "keras")
+    cache.put(key, result)
+    assert cache.get(("hash", "model1", "1", "keras")) is None
+    cache.close()
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "predictions.db")
+    key = PredictionCache.make_key(b"image", "model1", "1", "int8")
+    cache = PredictionCache(max_entries=2, db_path=db_path)
+    cache.put(key, result)
+    cache.close()
+
+    restarted = PredictionCache(max_entries=2, db_path=db_path)
+    assert restarted.get(key) == result
+    assert restarted.get((*key[:3], "keras")) is None
+    assert restarted.stats()["disk_hits"] == 1
+    restarted.invalidate()
+    assert restarted.get(key) is None
+    restarted.close()
+
+
+def test_disabled_cache_always_computes():
+    cache = PredictionCache(max_entries=0, db_path="")
+    calls = []
+    for _ in range(2):
+        cache.get_or_compute("a", lambda: calls.append(1) or result)
+    assert len(calls) == 2
+
+
+def test_concurrent_requests_share_one_computation():
+    cache = PredictionCache(max_entries=2, db_path="")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return result
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.get_or_compute("a", compute))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [result] * 4
+    assert cache.stats()["shared"] == 3
+
+
+def test_failed_computation_is_not_cached():
+    cache = PredictionCache(max_entries=2, db_path="")
+
+    def compute():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("a", compute)
+    assert cache.get_or_compute("a", lambda: result) == result
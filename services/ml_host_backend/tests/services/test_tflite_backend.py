@@ -0,0 +1,88 @@
+import logging
+import sys
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import tensorflow as tf
+from ml_host_backend.app.services.model_cache import estimate_model_bytes
+from ml_host_backend.app.services.tflite_backend import (
+    TFLiteModel,
+    get_interpreter_class,
+    get_tflite_artifact,
+)
+
+
+def make_tflite_model(tmp_path):
+    inputs = tf.keras.Input(shape=(8, 8, 1))
+    x = tf.keras.layers.Flatten()(inputs)
+    outputs = tf.keras.layers.Dense(2, activation="softmax")(x)
+    model = tf.keras.Model(inputs, outputs)
+    tflite_filepath = tmp_path / "model.tflite"
+    tflite_filepath.write_bytes(
+        tf.lite.TFLiteConverter.from_keras_model(model).convert()
+    )
+    return model, str(tflite_filepath)
+
+
+def test_tflite_model_matches_keras_model(tmp_path):
+    model, tflite_filepath = make_tflite_model(tmp_path)
+    tflite_model = TFLiteModel(tflite_filepath, num_threads=1)
+    assert tflite_model.input_shape == (None, 8, 8, 1)
+    assert estimate_model_bytes(tflite_model) == tflite_model.model_bytes > 0
+
+    # the interpreter is resized for every batch size
+    for batch_size in (1, 3, 1):
+        images = np.random.rand(batch_size, 8, 8, 1).astype("float32")
+        np.testing.assert_allclose(
+            tflite_model.predict(images), model(images).numpy(), rtol=1e-5
+        )
+
+
+def test_get_tflite_artifact():
+    summary = {
+        "name": "model1",
+        "tflite_filepath": "/path/to/model1.tflite",
+        "quantized_filepaths": {"int8": "/path/to/model1_int8.tflite"},
+    }
+    backend = "ml_host_backend.app.services.tflite_backend.INFERENCE_BACKEND"
+    variant = "ml_host_backend.app.services.tflite_backend.TFLITE_VARIANT"
+    with patch(backend, "keras"):
+        assert get_tflite_artifact(summary) is None
+    with patch(backend, "tflite"):
+        assert get_tflite_artifact(summary) == ("tflite", "/path/to/model1.tflite")
+        assert get_tflite_artifact({"name": "model1", "tflite_filepath": None}) is None
+        with patch(variant, "int8"):
+            assert get_tflite_artifact(summary) == (
+                "int8",
+                "/path/to/model1_int8.tflite",
+            )
+        # a variant, which didn't pass the accuracy gate, falls back to the float model
+        with patch(variant, "float16"):
+            assert get_tflite_artifact(summary) == ("tflite", "/path/to/model1.tflite")
+
+
+def test_tflite_fallback_is_logged_once_per_model_version(caplog):
+    backend = "ml_host_backend.app.services.tflite_backend.INFERENCE_BACKEND"
+    summary = {"name": "fallback_model", "version": "1", "tflite_filepath": None}
+    with patch(backend, "tflite"), caplog.at_level(logging.WARNING):
+        for _ in range(3):
+            assert get_tflite_artifact(summary) is None
+        assert get_tflite_artifact({**summary, "version": "2"}) is None
+    warnings = [
+        record.message
+        for record in caplog.records
+        if "fallback_model" in record.message
+    ]
+    assert len(warnings) == 2
+
+
+def test_interpreter_of_tensorflow_is_only_used_if_allowed():
+    # neither standalone runtime is importable
+    with patch.dict(
+        sys.modules,
+        {"ai_edge_litert.interpreter": None, "tflite_runtime.interpreter": None},
+    ):
+        assert get_interpreter_class() is tf.lite.Interpreter
+        with pytest.raises(ImportError):
+            get_interpreter_class(allow_tensorflow=False)
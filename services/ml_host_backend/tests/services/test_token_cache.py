@@ -0,0 +1,67 @@
+import time
+from unittest.mock import patch
+
+import jwt
+import pytest
+from ml_host_backend.app.exceptions.client_exceptions import UnauthroizedException
+from ml_host_backend.app.services.auth_service import verify_jwt
+from ml_host_backend.app.services.token_cache import TokenCache, token_cache
+from ml_host_backend.tests.tokens import make_token
+
+
+def test_valid_token_is_cached_until_it_expires():
+    cache = TokenCache(max_entries=10)
+    cache.put_valid("token", {"user_id": "user123"}, expires=time.time() + 60)
+    assert cache.get("token") == ({"user_id": "user123"}, None)
+
+    cache.put_valid("expired", {"user_id": "user123"}, expires=time.time() - 1)
+    assert cache.get("expired") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_invalid_token_is_cached_briefly():
+    cache = TokenCache(max_entries=10, negative_ttl_seconds=60)
+    cache.put_invalid("token", "Invalid token.")
+    assert cache.get("token") == (None, "Invalid token.")
+    assert cache.stats()["negative_hits"] == 1
+
+    cache = TokenCache(max_entries=10, negative_ttl_seconds=0)
+    cache.put_invalid("token", "Invalid token.")
+    time.sleep(0.01)
+    assert cache.get("token") is None
+
+
+def test_cache_is_bounded_and_keyed_by_digest():
+    cache = TokenCache(max_entries=2)
+    for token in ("token1", "token2", "token3"):
+        cache.put_valid(token, {}, expires=time.time() + 60)
+    assert cache.get("token1") is None
+    assert cache.get("token3") is not None
+    assert "token3" not in cache._entries
+    assert cache.stats()["entries"] == 2
+
+
+def test_signature_is_checked_once_per_token():
+    token = make_token(600)
+    with patch(
+        "ml_host_backend.app.services.auth_service.jwt.decode", wraps=jwt.decode
+    ) as mock_decode:
+        for _ in range(5):
+            assert verify_jwt(token)
+    assert mock_decode.call_count == 1
+    assert token_cache.stats()["hits"] == 4
+
+
+def test_invalid_tokens_are_rejected_from_cache():
+    token = make_token(600)[:-4] + "abcd"
+    with patch(
+        "ml_host_backend.app.services.auth_service.jwt.decode", wraps=jwt.decode
+    ) as mock_decode:
+        for _ in range(3):
+            with pytest.raises(UnauthroizedException, match="Invalid token."):
+                verify_jwt(token)
+    assert mock_decode.call_count == 1
+
+    with pytest.raises(UnauthroizedException, match="Token is expired."):
+        verify_jwt(make_token(-600))
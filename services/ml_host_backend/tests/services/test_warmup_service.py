@@ -0,0 +1,181 @@
+import os
+import signal
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+import tensorflow as tf
+from ml_host_backend.app.exceptions.service_exceptions import MLFlowUnavailableException
+from ml_host_backend.app.services.mlflow_service import model_summary_cache
+from ml_host_backend.app.services.model_cache import model_cache
+from ml_host_backend.app.services.tflite_backend import TFLiteModel
+from ml_host_backend.app.services.warmup_service import (
+    READY,
+    ModelWarmUp,
+    preload_models_before_fork,
+)
+
+mock_summary = {
+    "name": "model1",
+    "version": "1",
+    "model_filepath": "/path/to/model1.keras",
+}
+
+
+def make_model():
+    model = MagicMock()
+    model.input_shape = (None, 8, 8, 1)
+    model.predict.return_value = np.zeros((1, 2))
+    model.weights = []
+    return model
+
+
+def test_warm_up_without_models_is_ready():
+    warm_up = ModelWarmUp(model_names="")
+    assert not warm_up.is_ready()
+    warm_up.run()
+    assert warm_up.is_ready()
+    assert warm_up.status()["models"] == {}
+
+
+@patch("ml_host_backend.app.services.models_service.tf.keras.models.load_model")
+@patch(
+    "ml_host_backend.app.services.mlflow_service.get_single_model_summary_from_mlflow"
+)
+@patch("ml_host_backend.app.services.auth_service.login_user")
+def test_warm_up_loads_configured_models(mock_login, mock_get_summary, mock_load):
+    mock_login.return_value = {"access_token": "token"}
+    mock_get_summary.return_value = mock_summary
+    model = make_model()
+    mock_load.return_value = model
+
+    warm_up = ModelWarmUp(model_names="model1", username="user", password="pass")
+    warm_up.run()
+
+    assert warm_up.is_ready()
+    assert warm_up.status()["models"] == {"model1": READY}
+    mock_login.assert_called_once_with("user", "pass")
+    credentials = mock_get_summary.call_args[0][1]
+    assert credentials.credentials == "token"
+    # the model is cached and a dummy inference ran at its input shape
+    assert model_cache.get(("model1", "1")) is model
+    assert tuple(model.predict.call_args[0][0].shape) == (1, 8, 8, 1)
+    # the first prediction finds the summary cached
+    assert model_summary_cache.stats()["entries"] == 1
+
+
+@patch("ml_host_backend.app.services.models_service.tf.keras.models.load_model")
+@patch(
+    "ml_host_backend.app.services.mlflow_service.get_single_model_summary_from_mlflow"
+)
+@patch("ml_host_backend.app.services.mlflow_service.list_all_models_from_mlflow")
+@patch("ml_host_backend.app.services.auth_service.login_user")
+def test_warm_up_all_models(mock_login, mock_list, mock_get_summary, mock_load):
+    mock_login.return_value = {"access_token": "token"}
+    mock_list.return_value = [{"name": "model1"}, {"name": "model2"}]
+    mock_get_summary.side_effect = [mock_summary, MLFlowUnavailableException()]
+    mock_load.return_value = make_model()
+
+    warm_up = ModelWarmUp(model_names="all", max_attempts=1)
+    warm_up.run()
+
+    # a failing model is reported, but doesn't keep the service unready
+    assert warm_up.is_ready()
+    models = warm_up.status()["models"]
+    assert models["model1"] == READY
+    assert models["model2"] != READY
+
+
+@patch("ml_host_backend.app.services.warmup_service.time.sleep")
+@patch("ml_host_backend.app.services.auth_service.login_user")
+def test_warm_up_retries_unavailable_dependencies(mock_login, mock_sleep):
+    mock_login.side_effect = MLFlowUnavailableException()
+
+    warm_up = ModelWarmUp(model_names="model1", max_attempts=3, retry_seconds=1)
+    warm_up.run()
+
+    assert warm_up.is_ready()
+    assert mock_login.call_count == 3
+    assert mock_sleep.call_count == 2
+
+
+@patch("ml_host_backend.app.services.warmup_service.model_warm_up")
+@patch("ml_host_backend.app.services.tflite_backend.INFERENCE_BACKEND", "keras")
+def test_keras_models_are_not_preloaded_before_fork(mock_model_warm_up):
+    preload_models_before_fork()
+    mock_model_warm_up.run.assert_not_called()
+
+
+@patch("ml_host_backend.app.services.auth_service.session")
+@patch("ml_host_backend.app.services.mlflow_service.session")
+@patch("ml_host_backend.app.services.warmup_service.model_warm_up")
+@patch("ml_host_backend.app.services.tflite_backend.INFERENCE_BACKEND", "tflite")
+def test_tflite_models_are_preloaded_before_fork(
+    mock_model_warm_up, mock_mlflow_session, mock_auth_session
+):
+    allowed = []
+    mock_model_warm_up.run.side_effect = lambda **kwargs: allowed.append(
+        TFLiteModel.allow_tensorflow
+    )
+    preload_models_before_fork()
+    mock_model_warm_up.run.assert_called_once_with(fork_safe_only=True)
+    # the master preloads with the standalone interpreter, the workers may use TensorFlow
+    assert allowed == [False]
+    assert TFLiteModel.allow_tensorflow
+    # the forked workers open their own connections
+    mock_mlflow_session.close.assert_called_once()
+    mock_auth_session.close.assert_called_once()
+
+
+@patch("ml_host_backend.app.services.models_service.TFLiteModel")
+@patch("ml_host_backend.app.services.models_service.tf.keras.models.load_model")
+@patch(
+    "ml_host_backend.app.services.mlflow_service.get_single_model_summary_from_mlflow"
+)
+@patch("ml_host_backend.app.services.tflite_backend.INFERENCE_BACKEND", "tflite")
+@patch("ml_host_backend.app.services.auth_service.login_user")
+def test_fork_safe_warm_up_skips_keras_models(
+    mock_login, mock_get_summary, mock_load, mock_tflite_model
+):
+    mock_login.return_value = {"access_token": "token"}
+    mock_get_summary.side_effect = [
+        {**mock_summary, "tflite_filepath": "/path/to/model1.tflite"},
+        {**mock_summary, "name": "model2"},
+    ]
+    mock_tflite_model.return_value = make_model()
+
+    warm_up = ModelWarmUp(model_names="model1,model2")
+    warm_up.run(fork_safe_only=True)
+
+    assert warm_up.status()["models"] == {
+        "model1": READY,
+        "model2": "loaded on first use",
+    }
+    mock_load.assert_not_called()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_tflite_model_loaded_before_fork_predicts_in_child(tmp_path):
+    # TFLite interpreters keep working in forked workers, unlike the TensorFlow runtime
+    inputs = tf.keras.Input(shape=(8, 8, 1))
+    outputs = tf.keras.layers.Dense(2)(tf.keras.layers.Flatten()(inputs))
+    tflite_filepath = tmp_path / "model.tflite"
+    tflite_filepath.write_bytes(
+        tf.lite.TFLiteConverter.from_keras_model(
+            tf.keras.Model(inputs, outputs)
+        ).convert()
+    )
+    model = TFLiteModel(str(tflite_filepath), num_threads=2)
+    images = np.random.rand(2, 8, 8, 1).astype(np.float32)
+    expected = model.predict(images)
+
+    pid = os.fork()
+    if pid == 0:
+        matches = False
+        try:
+            signal.alarm(30)
+            matches = np.allclose(model.predict(images), expected)
+        finally:
+            os._exit(0 if matches else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
@@ -0,0 +1,75 @@
+import importlib
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# the conf is imported with a patched environment only, it sets PROMETHEUS_MULTIPROC_DIR
+GUNICORN_CONF = "ml_host_backend.app.gunicorn_conf"
+
+
+def load_conf(env, cpu_count):
+    with patch.dict(os.environ, env, clear=False), patch(
+        "os.cpu_count", return_value=cpu_count
+    ):
+        for name in (
+            "TF_NUM_INTRAOP_THREADS",
+            "TFLITE_NUM_THREADS",
+            "OMP_NUM_THREADS",
+            "INFERENCE_BACKEND",
+        ):
+            if name not in env:
+                os.environ.pop(name, None)
+        conf = importlib.reload(importlib.import_module(GUNICORN_CONF))
+        threads = {
+            name: os.environ[name]
+            for name in ("TF_NUM_INTRAOP_THREADS", "TFLITE_NUM_THREADS")
+        }
+    return conf, threads
+
+
+def test_cores_are_split_between_workers():
+    conf, threads = load_conf({"HOST_BACKEND_WORKERS": "4"}, cpu_count=8)
+    assert conf.workers == 4
+    assert conf.preload_app
+    assert threads == {"TF_NUM_INTRAOP_THREADS": "2", "TFLITE_NUM_THREADS": "2"}
+
+
+def test_every_worker_gets_a_thread():
+    _, threads = load_conf({"HOST_BACKEND_WORKERS": "4"}, cpu_count=2)
+    assert threads["TF_NUM_INTRAOP_THREADS"] == "1"
+
+
+def test_explicit_thread_settings_win():
+    _, threads = load_conf(
+        {"HOST_BACKEND_WORKERS": "2", "TFLITE_NUM_THREADS": "3"}, cpu_count=8
+    )
+    assert threads == {"TF_NUM_INTRAOP_THREADS": "4", "TFLITE_NUM_THREADS": "3"}
+
+
+def test_metrics_of_all_workers_are_collected(tmp_path):
+    stale = tmp_path / "counter_123.db"
+    stale.write_bytes(b"")
+    conf, _ = load_conf(
+        {"HOST_BACKEND_WORKERS": "2", "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)},
+        cpu_count=2,
+    )
+    assert conf.PROMETHEUS_MULTIPROC_DIR == str(tmp_path)
+    assert not stale.exists()
+
+    worker = MagicMock(pid=123)
+    with patch("prometheus_client.multiprocess.mark_process_dead") as mock_mark_dead:
+        conf.child_exit(MagicMock(), worker)
+    mock_mark_dead.assert_called_once_with(123)
+
+
+def test_workers_use_the_tflite_backend_by_default():
+    conf, _ = load_conf({"HOST_BACKEND_WORKERS": "2"}, cpu_count=2)
+    assert conf.INFERENCE_BACKEND == "tflite"
+
+
+def test_keras_backend_is_refused_for_more_than_one_worker():
+    with pytest.raises(RuntimeError):
+        load_conf({"HOST_BACKEND_WORKERS": "2", "INFERENCE_BACKEND": "keras"}, 2)
+    conf, _ = load_conf({"HOST_BACKEND_WORKERS": "1", "INFERENCE_BACKEND": "keras"}, 2)
+    assert conf.INFERENCE_BACKEND == "keras"
@@ -1,3 +1,6 @@
+from unittest.mock import patch
+
+
 def test_health_endpoint(test_host_backend_client):
     """Test health check endpoint (e.g., GET /health)."""
     response = test_host_backend_client.get("/health")
@@ -9,3 +12,25 @@ def test_invalid_endpoint(test_host_backend_client):
     """Test invalid endpoint."""
     response = test_host_backend_client.get("/invalid-endpoint")
     assert response.status_code == 404
+
+
+def test_startup_timing_endpoint(test_host_backend_client):
+    """Test startup timing report (e.g., GET /health/startup)."""
+    response = test_host_backend_client.get("/health/startup")
+    assert response.status_code == 200
+    assert response.json()["startup_seconds"] > 0
+
+
+@patch("ml_host_backend.app.main.model_warm_up")
+def test_ready_endpoint(mock_warm_up, test_host_backend_client):
+    """Test readiness endpoint (e.g., GET /ready) during and after warm-up."""
+    mock_warm_up.status.return_value = {"status": "running", "models": {}}
+    mock_warm_up.is_ready.return_value = False
+    response = test_host_backend_client.get("/ready")
+    assert response.status_code == 503
+
+    mock_warm_up.status.return_value = {"status": "ready", "models": {}}
+    mock_warm_up.is_ready.return_value = True
+    response = test_host_backend_client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
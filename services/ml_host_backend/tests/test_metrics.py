@@ -0,0 +1,61 @@
+import pytest
+from ml_host_backend.app.metrics import StageTimer
+from prometheus_client import REGISTRY
+
+
+def get_sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_stage_timer_records_stage_with_model_version():
+    timer = StageTimer("timer_model")
+    with timer.stage("metadata"):
+        timer.model_version = "3"
+
+    assert (
+        get_sample(
+            "inference_stage_seconds_count",
+            stage="metadata",
+            model="timer_model",
+            version="3",
+        )
+        == 1
+    )
+
+
+def test_stage_timer_records_failed_stage():
+    timer = StageTimer("timer_model", "1")
+    with pytest.raises(ValueError):
+        with timer.stage("decode"):
+            raise ValueError("broken image")
+
+    assert (
+        get_sample(
+            "inference_stage_seconds_count",
+            stage="decode",
+            model="timer_model",
+            version="1",
+        )
+        == 1
+    )
+
+
+def test_stage_timer_counts_cache_requests_and_batch_sizes():
+    timer = StageTimer("counter_model", 2)
+    timer.count_cache_request("prediction", hit=True)
+    timer.count_cache_request("prediction", hit=True)
+    timer.count_cache_request("prediction", hit=False)
+    timer.observe_batch_size(8, path="request")
+
+    labels = {"cache": "prediction", "model": "counter_model", "version": "2"}
+    assert get_sample("inference_cache_requests_total", result="hit", **labels) == 2
+    assert get_sample("inference_cache_requests_total", result="miss", **labels) == 1
+    assert (
+        get_sample(
+            "prediction_batch_size_sum",
+            model="counter_model",
+            version="2",
+            path="request",
+        )
+        == 8
+    )
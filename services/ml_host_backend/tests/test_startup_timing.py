@@ -0,0 +1,67 @@
+import builtins
+import sys
+import time
+
+from ml_host_backend.app.startup_timing import (
+    ImportTimer,
+    LazyModule,
+    lazy_import,
+    warm_up,
+)
+
+
+def test_import_timer_records_first_imports():
+    sys.modules.pop("colorsys", None)
+    timer = ImportTimer(max_depth=2)
+    original_import = builtins.__import__
+    timer.install()
+    try:
+        import colorsys  # noqa: F401
+    finally:
+        timer.uninstall()
+    assert builtins.__import__ is original_import
+    report = timer.report()
+    assert report["startup_seconds"] >= 0
+    assert [entry["module"] for entry in report["imports"]] == ["colorsys"]
+
+
+def test_startup_time_is_fixed_once_the_timer_is_uninstalled():
+    timer = ImportTimer()
+    timer.install()
+    timer.uninstall()
+    startup_seconds = timer.report()["startup_seconds"]
+    time.sleep(0.05)
+    assert timer.report()["startup_seconds"] == startup_seconds
+    # a second uninstall doesn't record the startup again
+    timer.install()
+    timer.uninstall()
+    assert timer.report()["startup_seconds"] == startup_seconds
+
+
+def test_import_timer_ignores_loaded_modules():
+    timer = ImportTimer()
+    timer.install()
+    try:
+        import json  # noqa: F401
+    finally:
+        timer.uninstall()
+    assert timer.report()["imports"] == []
+
+
+def test_lazy_import_defers_import():
+    sys.modules.pop("wave", None)
+    module = lazy_import("wave")
+    assert isinstance(module, LazyModule)
+    assert "wave" not in sys.modules
+    assert module.Error is sys.modules["wave"].Error
+
+
+def test_lazy_import_returns_loaded_module():
+    assert lazy_import("json") is sys.modules["json"]
+
+
+def test_warm_up_loads_module():
+    sys.modules.pop("netrc", None)
+    module = lazy_import("netrc")
+    warm_up(module)
+    assert "netrc" in sys.modules
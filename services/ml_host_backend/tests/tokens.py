@@ -0,0 +1,25 @@
+import time
+import uuid
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# the tests sign their tokens with this key, conftest installs it as verification key
+TEST_KID = "test-key"
+TEST_PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def make_token(
+    expires_in=600, user_id="user123", token_type=None, jti=None, roles=None
+):
+    payload = {
+        "user_id": user_id,
+        "expires": time.time() + expires_in,
+        "jti": jti or uuid.uuid4().hex,
+        "roles": roles or [],
+    }
+    if token_type is not None:
+        payload["type"] = token_type
+    return jwt.encode(
+        payload, TEST_PRIVATE_KEY, algorithm="RS256", headers={"kid": TEST_KID}
+    )
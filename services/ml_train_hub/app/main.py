@@ -1,20 +1,30 @@
 import logging
 import logging.config
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
 
 import ml_train_hub.app.exceptions.client_exceptions as ce
 import ml_train_hub.app.exceptions.service_exceptions as se
 from fastapi import BackgroundTasks, FastAPI, Security
 from fastapi.requests import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from ml_train_hub.app.logging_config import LOGGING_CONFIG
 from ml_train_hub.app.mlflow_util import (
+    ARTIFACT_KINDS,
     evaluate_and_log_metrics,
     get_mlflow_model,
+    get_mlflow_model_artifact,
     list_mlflow_models,
     log_mlflow_experiment,
 )
-from ml_train_hub.app.security import get_current_user
+from ml_train_hub.app.quantization_util import (
+    GATED_CLASS_NAME,
+    QUANTIZATION_VARIANTS,
+    quantize_and_register_variants,
+)
+from ml_train_hub.app.security import get_current_user, verification_refresher
 from prometheus_fastapi_instrumentator import Instrumentator
 
 # Configure logging
@@ -23,8 +33,16 @@ logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # fetch the JWT verification keys and revoked tokens in the background, not on the request path
+    verification_refresher.start()
+    yield
+    verification_refresher.stop()
+
+
 # our singleton MLFlow API
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # setup Prometheus instrumentator
 Instrumentator().instrument(app).expose(app)
@@ -78,7 +96,7 @@ async def list_models(
     This function returns a list of all available models in MLFlow
     """
 
-    # Verify the JWT via ml_user_mgmt/verify-token endpoint
+    # Verify the JWT locally, with the cached keys of ml_user_mgmt
     get_current_user(credentials)
 
     return {"models": list_mlflow_models()}
@@ -96,12 +114,47 @@ async def get_model(
     - model_name: The model to be retrieved
     """
 
-    # Verify the JWT via ml_user_mgmt/verify-token endpoint
+    # Verify the JWT locally, with the cached keys of ml_user_mgmt
     get_current_user(credentials)
 
     return get_mlflow_model(model_name)
 
 
+@app.get("/models/{model_name}/artifact")
+def get_model_artifact(
+    model_name: str,
+    kind: str = "keras",
+    version: Optional[str] = None,
+    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+):
+    """
+    This function streams the model file of a version of the desired model,
+    so it can be loaded without access to the MLFlow storage.
+    The headers X-Content-SHA256 and X-Model-Version hold its checksum and version.
+
+    Parameters:
+    - model_name: The model to be retrieved
+    - kind: "keras" (default), "tflite", or a quantized variant "float16" or "int8"
+    - version: The version of the model, by default the latest version
+    """
+
+    # Verify the JWT locally, with the cached keys of ml_user_mgmt
+    get_current_user(credentials)
+
+    if kind not in ARTIFACT_KINDS:
+        raise ce.InvalidArgumentException(
+            f"Unknown artifact kind '{kind}', expected one of {list(ARTIFACT_KINDS)}"
+        )
+
+    filepath, sha256, version = get_mlflow_model_artifact(model_name, kind, version)
+    return FileResponse(
+        filepath,
+        media_type="application/octet-stream",
+        filename=os.path.basename(filepath),
+        headers={"X-Content-SHA256": sha256, "X-Model-Version": str(version)},
+    )
+
+
 @app.post("/models/{model_name}/register")
 async def register_model(
     model_filepath: str,
@@ -126,7 +179,7 @@ async def register_model(
     - dict: Contains information about the registered run (e.g., run name).
     """
 
-    # Verify the JWT via ml_user_mgmt/verify-token endpoint
+    # Verify the JWT locally, with the cached keys of ml_user_mgmt
     get_current_user(credentials)
 
     # Optionally default to our standard experiment_name
@@ -152,3 +205,45 @@ async def register_model(
 
     # Don't wait for this, just return the registered modelinfo to the caller
     return modelinfo
+
+
+@app.post("/models/{model_name}/quantize")
+async def quantize_model(
+    model_name: str,
+    class_names: list[str],
+    max_num: int,
+    background_tasks: BackgroundTasks,
+    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+):
+    """
+    Produces float16 and int8 quantized variants of the latest version of a registered model.
+    Every variant is evaluated and stored as servable variant, if its COVID recall and f1 score
+    stay within the configured tolerance of the float model.
+
+    Args:
+    - model_name (str): Name of the registered model.
+    - max_num (int): Maximum number of predictions per evaluation in order to respect server ressources, if 0 then all evaluation data is used.
+    - class_names (list[str]): List of human-readable class names associated with the prediction indices in json-format in the request body, example: ["COVID", "Lung_Opacity", "Normal", "Viral Pneumonia"].
+    """
+
+    # Verify the JWT locally, with the cached keys of ml_user_mgmt
+    get_current_user(credentials)
+
+    if GATED_CLASS_NAME not in class_names:
+        raise ce.InvalidArgumentException(
+            f"Class names must contain '{GATED_CLASS_NAME}' for the accuracy gate."
+        )
+
+    # Make sure the model exists, before the long running quantization is started
+    get_mlflow_model(model_name)
+
+    # Quantization and evaluation take long, hence we let this do in a background task.
+    background_tasks.add_task(
+        quantize_and_register_variants, model_name, class_names, max_num
+    )
+    logger.info(f"Triggered background process for quantization of model: {model_name}")
+
+    return {
+        "message": f"Quantization of model {model_name} started.",
+        "variants": list(QUANTIZATION_VARIANTS),
+    }
@@ -1,5 +1,8 @@
+import hashlib
 import logging
 import os
+import tempfile
+import threading
 from datetime import datetime
 
 # import ml_train_hub.app.exceptions.client_exceptions as ce
@@ -7,7 +10,13 @@ import ml_train_hub.app.exceptions.service_exceptions as se
 import mlflow
 import mlflow.tensorflow
 from ml_train_hub.app.logging_config import LOGGING_CONFIG
-from ml_train_hub.app.model_util import evaluate_model, get_model_architecture
+from ml_train_hub.app.model_util import (
+    convert_to_tflite,
+    evaluate_model,
+    get_model_architecture,
+)
+from ml_train_hub.app.quantization_util import quantized_artifact_path
+from mlflow.exceptions import MlflowException
 from mlflow.models.model import ModelInfo
 from tensorflow.keras.models import load_model
 
@@ -21,6 +30,9 @@ logger = logging.getLogger(__name__)
 artifact_path = (
     "model"  # This is the subdirectory, in which we store model artifact files
 )
+tflite_artifact_path = (
+    "tflite"  # This is the subdirectory, in which we store the TFLite model file
+)
 
 
 # set our docker container running the local MLFlow service,
@@ -107,6 +119,7 @@ def log_mlflow_experiment(
                     model=model, artifact_path=artifact_path
                 )
                 logger.info(f"Logged experiment with run {run_name}")
+            log_tflite_model(model, model_filepath)
             return modelinfo
     except Exception as e:
         logger.error(
@@ -117,6 +130,23 @@ def log_mlflow_experiment(
         ) from e
 
 
+def log_tflite_model(model, model_filepath):
+    """
+    Convert the model to TFLite and log it as an artifact of the active run.
+    A failed conversion is logged, but doesn't fail the registration.
+    """
+    tflite_filename = os.path.splitext(os.path.basename(model_filepath))[0] + ".tflite"
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tflite_filepath = convert_to_tflite(
+                model, os.path.join(tmp_dir, tflite_filename)
+            )
+            mlflow.log_artifact(tflite_filepath, artifact_path=tflite_artifact_path)
+        logger.info(f"Logged TFLite model {tflite_filename}")
+    except Exception as e:
+        logger.error(f"Failed to convert model to TFLite: {e}")
+
+
 def evaluate_and_log_metrics(modelinfo: ModelInfo, class_names: list, max_num: int):
     """
     Background task, which calculates model performance from the evaluation dataset
@@ -184,6 +214,41 @@ def get_model_path(client, run):
     )
 
 
+def get_tflite_model_path(client, run):
+    """
+    Make the path to the TFLite model file stored in the MLFlow storage,
+    returns None for runs logged without a TFLite model
+
+    Args:
+        client: MLflow client, connected to the MLFlow server
+        run: the run to inspect
+    """
+    for artifact in client.list_artifacts(run.info.run_id, tflite_artifact_path):
+        if artifact.path.endswith(".tflite"):
+            return os.path.join(run.info.artifact_uri, artifact.path)
+    return None
+
+
+def get_quantized_model_paths(client, run):
+    """
+    Make the paths to the servable quantized variants of a model stored in the MLFlow storage,
+    only variants, which passed the accuracy gate, are stored
+
+    Args:
+        client: MLflow client, connected to the MLFlow server
+        run: the run to inspect
+    """
+    quantized_paths = {}
+    for variant_dir in client.list_artifacts(run.info.run_id, quantized_artifact_path):
+        for artifact in client.list_artifacts(run.info.run_id, variant_dir.path):
+            if artifact.path.endswith(".tflite"):
+                variant = os.path.basename(variant_dir.path)
+                quantized_paths[variant] = os.path.join(
+                    run.info.artifact_uri, artifact.path
+                )
+    return quantized_paths
+
+
 def get_model_params(run):
     """
     Get all parameters in a run.
@@ -207,12 +272,13 @@ def get_model_metrics(run):
     return metrics
 
 
-def get_mlflow_model(model_name):
+def get_mlflow_model(model_name, version=None):
     """
     Get a specific model from MLFlow.
 
     Args:
         model_name (str): Name of the model to retrieve.
+        version (str): Version of the model, by default the latest version
 
     Returns a dictionary of model key/value pairs
     """
@@ -221,13 +287,23 @@ def get_mlflow_model(model_name):
 
     client = mlflow.tracking.MlflowClient()
 
-    # Query the model versions
-    versions = client.search_model_versions(f"name='{model_name}'")
-    if not versions:
-        raise se.ModelNotFoundException(f"No versions found for model '{model_name}'")
+    if version is None:
+        # Query the model versions
+        versions = client.search_model_versions(f"name='{model_name}'")
+        if not versions:
+            raise se.ModelNotFoundException(
+                f"No versions found for model '{model_name}'"
+            )
 
-    # Get the latest version of the model
-    latest_version = versions[0]
+        # Get the latest version of the model
+        latest_version = versions[0]
+    else:
+        try:
+            latest_version = client.get_model_version(model_name, str(version))
+        except MlflowException as e:
+            raise se.ModelNotFoundException(
+                f"No version {version} found for model '{model_name}'"
+            ) from e
 
     # and its run data/info
     run = client.get_run(latest_version.run_id)
@@ -246,6 +322,8 @@ def get_mlflow_model(model_name):
         "name": model_name,
         "version": latest_version.version,
         "model_filepath": model_path,  # this is an absolute path matching our docker container file structure
+        "tflite_filepath": get_tflite_model_path(client, run),
+        "quantized_filepaths": get_quantized_model_paths(client, run),
         "model_uri": latest_version.source,
         "status": latest_version.status,
         "architecture": params.get("architecture", None),
@@ -289,6 +367,58 @@ def list_mlflow_models():
     return model_list
 
 
+# Cache of artifact checksums, keyed by (path, size, modification time)
+_artifact_checksums = {}
+_artifact_checksums_lock = threading.Lock()
+ARTIFACT_KINDS = ("keras", "tflite", "float16", "int8")
+
+
+def get_file_sha256(filepath, chunk_size=1024 * 1024):
+    """
+    Calculate the sha256 checksum of a file, checksums are cached as long as the file is unchanged
+    """
+    stat = os.stat(filepath)
+    key = (filepath, stat.st_size, stat.st_mtime_ns)
+    with _artifact_checksums_lock:
+        if key in _artifact_checksums:
+            return _artifact_checksums[key]
+
+    sha256 = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    checksum = sha256.hexdigest()
+    with _artifact_checksums_lock:
+        _artifact_checksums[key] = checksum
+    return checksum
+
+
+def get_mlflow_model_artifact(model_name, kind="keras", version=None):
+    """
+    Get the model file of a version of a model.
+
+    Args:
+        model_name (str): Name of the model
+        kind (str): "keras" for the keras model, "tflite" for the TFLite model,
+            "float16" or "int8" for a quantized variant
+        version (str): Version of the model, by default the latest version
+
+    Returns the path, sha256 checksum and version of the model file
+    """
+    model_data = get_mlflow_model(model_name, version)
+    if kind == "keras":
+        filepath = model_data["model_filepath"]
+    elif kind == "tflite":
+        filepath = model_data["tflite_filepath"]
+    else:
+        filepath = model_data["quantized_filepaths"].get(kind)
+    if not filepath or not os.path.isfile(filepath):
+        raise se.ModelNotFoundInArtifactsException(
+            f"No {kind} model file found in artifacts for model '{model_name}'"
+        )
+    return filepath, get_file_sha256(filepath), model_data["version"]
+
+
 # For debugging
 if __name__ == "__main__":
     get_mlflow_model("Test")
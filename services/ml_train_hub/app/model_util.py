@@ -12,6 +12,9 @@ from tensorflow.keras.utils import image_dataset_from_directory
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
 
+# Number of evaluation images per batch, rather small for saving system RAM
+EVALUATION_BATCH_SIZE = 8
+
 
 def get_model_architecture(model):
     """
@@ -64,14 +67,31 @@ def get_model_architecture(model):
     return json.dumps(architecture, indent=2)
 
 
-def evaluate_model(model, class_names, max_num):
+def convert_to_tflite(model, tflite_filepath):
+    """
+    We convert the keras model into a TFLite flatbuffer, which is served on CPU-only nodes
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    tflite_model = converter.convert()
+    with open(tflite_filepath, "wb") as f:
+        f.write(tflite_model)
+    logger.info(
+        f"Converted model to TFLite: {tflite_filepath} ({len(tflite_model)} bytes)"
+    )
+    return tflite_filepath
+
+
+def evaluate_model(model, class_names, max_num, dataset=None):
     """
-    We run an evaluation against the evaluation dataset and return according metrics
+    We run an evaluation against the evaluation dataset and return according metrics,
+    a dataset, which is already read and resized, can be passed to evaluate several models
+    on the same images
     """
     try:
-        # Read and resize the images to the models expected input shape
-        input_shape = model.input_shape[1:3]  # Expected image size (height, width)
-        dataset = read_and_resize_evaluation_dataset(class_names, input_shape)
+        if dataset is None:
+            # Read and resize the images to the models expected input shape
+            input_shape = model.input_shape[1:3]  # Expected image size (height, width)
+            dataset = read_and_resize_evaluation_dataset(class_names, input_shape)
         img_num = 0
         for batch in dataset:
             images, _ = batch
@@ -99,14 +119,15 @@ def evaluate_model(model, class_names, max_num):
         raise  # and forward the exception
 
 
-def read_and_resize_evaluation_dataset(class_names, input_shape=(224, 224)):
-    # Load the entire dataset for validation
+def read_and_resize_evaluation_dataset(class_names, input_shape=(224, 224), seed=None):
+    # Load the entire dataset for validation, a seed makes the shuffled file order reproducible
     dataset = image_dataset_from_directory(
         directory="data",
         class_names=class_names,  # only class names to include by model
         label_mode="int",  # for sparse_categorical_entropy training
-        batch_size=8,  # Use defined batch size, rather small for saving system RAM
+        batch_size=EVALUATION_BATCH_SIZE,
         image_size=input_shape,  # Resize input images
+        seed=seed,
     )
 
     # Optionally, you can cache and prefetch for performance, but takes high RAM usage!
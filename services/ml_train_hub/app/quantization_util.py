@@ -0,0 +1,228 @@
+import logging
+import os
+import tempfile
+
+import ml_train_hub.app.exceptions.client_exceptions as ce
+import ml_train_hub.app.exceptions.service_exceptions as se
+import mlflow
+import mlflow.tensorflow
+import numpy as np
+import tensorflow as tf
+from ml_train_hub.app.logging_config import LOGGING_CONFIG
+from ml_train_hub.app.model_util import (
+    EVALUATION_BATCH_SIZE,
+    evaluate_model,
+    preprocess_images,
+    read_and_resize_evaluation_dataset,
+)
+
+# Configure logging
+# init custom logging config
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger(__name__)
+
+
+# Some definitions
+quantized_artifact_path = (
+    "quantized"  # This is the subdirectory, in which we store the quantized variants
+)
+QUANTIZATION_VARIANTS = ("float16", "int8")
+# The class, whose recall and f1 score must be kept by a quantized variant
+GATED_CLASS_NAME = "COVID"
+# Maximum drop of the COVID recall and f1 score of a quantized variant against the float model
+QUANTIZATION_TOLERANCE = float(os.getenv("QUANTIZATION_TOLERANCE", "0.02"))
+# Number of evaluation images used to calibrate the int8 activation ranges
+QUANTIZATION_CALIBRATION_SAMPLES = int(
+    os.getenv("QUANTIZATION_CALIBRATION_SAMPLES", "100")
+)
+# Seed of the evaluation images, which are drawn if the evaluation is limited by max_num
+QUANTIZATION_EVALUATION_SEED = int(os.getenv("QUANTIZATION_EVALUATION_SEED", "42"))
+
+
+class TFLiteClassifier:
+    """
+    Adapter, which exposes a TFLite model with the input_shape and predict() of a
+    keras model, so it can be evaluated with evaluate_model()
+    """
+
+    def __init__(self, tflite_filepath):
+        self.interpreter = tf.lite.Interpreter(model_path=tflite_filepath)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self.input_shape = (
+            None,
+            *(int(dim) for dim in self.input_details["shape"][1:]),
+        )
+
+    def predict(self, images, verbose=0):
+        images = np.asarray(images, dtype=np.float32)
+        self.interpreter.resize_tensor_input(
+            self.input_details["index"], list(images.shape)
+        )
+        self.interpreter.allocate_tensors()
+        self.interpreter.set_tensor(self.input_details["index"], images)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_details["index"])
+
+
+def make_representative_dataset(model, class_names, num_samples):
+    """
+    We draw calibration images from the evaluation dataset, preprocessed like in evaluate_model()
+    """
+    dataset = read_and_resize_evaluation_dataset(class_names, model.input_shape[1:3])
+    dataset = preprocess_images(dataset, model)
+
+    def representative_dataset():
+        count = 0
+        for images, _ in dataset:
+            for image in images:
+                if count >= num_samples:
+                    return
+                count += 1
+                yield [tf.expand_dims(tf.cast(image, tf.float32), axis=0)]
+
+    return representative_dataset
+
+
+def make_fixed_evaluation_dataset(class_names, input_shape, max_num, cache_filepath):
+    """
+    We read the evaluation dataset once, so the float model and its variants are evaluated
+    on the same images. The dataset is shuffled again on every iteration, so with max_num
+    the first max_num images are drawn once and cached on disk
+    """
+    dataset = read_and_resize_evaluation_dataset(
+        class_names, input_shape, seed=QUANTIZATION_EVALUATION_SEED
+    )
+    if max_num > 0:
+        dataset = (
+            dataset.unbatch()
+            .take(max_num)
+            .batch(EVALUATION_BATCH_SIZE)
+            .cache(cache_filepath)
+        )
+    return dataset
+
+
+def quantize_model(
+    model,
+    variant,
+    tflite_filepath,
+    class_names=None,
+    num_samples=QUANTIZATION_CALIBRATION_SAMPLES,
+):
+    """
+    We convert the keras model into a quantized TFLite flatbuffer.
+    float16 stores the weights as float16, int8 quantizes weights and activations to int8
+    and calibrates the activation ranges with the evaluation dataset.
+    Inputs and outputs stay float32, so the variants are served like the float model.
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        converter.representative_dataset = make_representative_dataset(
+            model, class_names, num_samples
+        )
+    else:
+        raise ce.InvalidArgumentException(f"Unknown quantization variant: {variant}")
+
+    tflite_model = converter.convert()
+    with open(tflite_filepath, "wb") as f:
+        f.write(tflite_model)
+    logger.info(
+        f"Quantized model to {variant}: {tflite_filepath} ({len(tflite_model)} bytes)"
+    )
+    return tflite_filepath
+
+
+def is_within_tolerance(reference_metrics, metrics, tolerance=QUANTIZATION_TOLERANCE):
+    """
+    Check if the COVID recall and f1 score dropped at most by tolerance
+    """
+    for metric in ("recall", "f1_score"):
+        drop = (
+            reference_metrics[metric][GATED_CLASS_NAME]
+            - metrics[metric][GATED_CLASS_NAME]
+        )
+        if drop > tolerance:
+            logger.info(
+                f"COVID {metric} dropped by {drop:.4f}, tolerance is {tolerance}"
+            )
+            return False
+    return True
+
+
+def quantize_and_register_variants(
+    model_name, class_names, max_num, variants=QUANTIZATION_VARIANTS
+):
+    """
+    Background task, which quantizes the latest version of a registered model,
+    evaluates every variant and logs it as a servable artifact of the version's run,
+    if its COVID recall and f1 score stay within the tolerance of the float model
+    """
+    logger.info(f"Background process started: Quantization of model '{model_name}'")
+    try:
+        client = mlflow.tracking.MlflowClient()
+        versions = client.search_model_versions(f"name='{model_name}'")
+        if not versions:
+            raise se.ModelNotFoundException(
+                f"No versions found for model '{model_name}'"
+            )
+        latest_version = versions[0]
+        model = mlflow.tensorflow.load_model(latest_version.source)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Evaluate the float model on the same images as the variants
+            dataset = make_fixed_evaluation_dataset(
+                class_names,
+                model.input_shape[1:3],
+                max_num,
+                os.path.join(tmp_dir, "evaluation"),
+            )
+            reference_metrics = evaluate_model(model, class_names, max_num, dataset)
+
+            for variant in variants:
+                tflite_filepath = quantize_model(
+                    model,
+                    variant,
+                    os.path.join(tmp_dir, f"{model_name}_{variant}.tflite"),
+                    class_names,
+                )
+                metrics = evaluate_model(
+                    TFLiteClassifier(tflite_filepath), class_names, max_num, dataset
+                )
+                servable = is_within_tolerance(reference_metrics, metrics)
+
+                with mlflow.start_run(run_id=latest_version.run_id):
+                    mlflow.log_metric(
+                        f"{variant}_recall_{GATED_CLASS_NAME}",
+                        metrics["recall"][GATED_CLASS_NAME],
+                    )
+                    mlflow.log_metric(
+                        f"{variant}_f1_score_{GATED_CLASS_NAME}",
+                        metrics["f1_score"][GATED_CLASS_NAME],
+                    )
+                    if servable:
+                        mlflow.log_artifact(
+                            tflite_filepath,
+                            artifact_path=f"{quantized_artifact_path}/{variant}",
+                        )
+                client.set_model_version_tag(
+                    model_name,
+                    latest_version.version,
+                    f"quantized_{variant}",
+                    "servable" if servable else "rejected",
+                )
+                logger.info(
+                    f"Quantized variant {variant} of model '{model_name}' is {'servable' if servable else 'rejected'}"
+                )
+    except Exception as e:
+        logger.error(
+            f"Background process error: Quantization of model '{model_name}': {e}"
+        )
+    finally:
+        logger.info(
+            f"Background process finished: Quantization of model '{model_name}'"
+        )
@@ -1,8 +1,16 @@
 import logging
 import os
+import time
 
+import jwt
 import requests
 from fastapi import HTTPException, status
+from requests.adapters import HTTPAdapter
+from shared.token_verification import (
+    RevocationList,
+    VerificationKeys,
+    VerificationRefresher,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -32,14 +40,40 @@ else:
     USER_MGMT_URL = f"http://localhost:{USER_MGMT_PORT}"
 
 USER_MGMT_TOKEN_ENDPOINT = USER_MGMT_URL + "/token"
-USER_MGMT_VERIFY_ENDPOINT = USER_MGMT_URL + "/verify-token"
+USER_MGMT_JWKS_ENDPOINT = USER_MGMT_URL + "/.well-known/jwks.json"
+USER_MGMT_REVOKED_ENDPOINT = USER_MGMT_URL + "/revoked"
 logger.info(f"The ml_user_mgmt service is used at: {USER_MGMT_URL}")
 
+# Timeouts in seconds per ml_user_mgmt endpoint
+USER_MGMT_TOKEN_TIMEOUT = float(get_env_variable("USER_MGMT_TOKEN_TIMEOUT", "10"))
+USER_MGMT_VERIFY_TIMEOUT = float(get_env_variable("USER_MGMT_VERIFY_TIMEOUT", "5"))
+
+# The JWTs are verified locally with the public keys published by ml_user_mgmt
+JWT_ALGORITHM = "RS256"
+# Seconds the verification keys are used, before they are fetched again in the background
+JWKS_CACHE_SECONDS = float(get_env_variable("JWKS_CACHE_SECONDS", "300"))
+# Minimum seconds between two fetches of the keys or the revoked tokens, also after failures
+JWKS_MIN_REFRESH_SECONDS = float(get_env_variable("JWKS_MIN_REFRESH_SECONDS", "10"))
+# Seconds between two syncs of the revoked token IDs
+REVOCATION_SYNC_SECONDS = float(get_env_variable("REVOCATION_SYNC_SECONDS", "15"))
+
+# our singleton pooled HTTP session, which keeps connections to ml_user_mgmt alive
+session = requests.Session()
+session.mount(
+    "http://",
+    HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=int(get_env_variable("USER_MGMT_POOL_MAXSIZE", "32")),
+    ),
+)
+
 
 def issue_jwt_token(username, password):
     # Call the ml_auth endpoint for token generation
     credentials = {"username": username, "password": password}
-    resp = requests.post(USER_MGMT_TOKEN_ENDPOINT, json=credentials)
+    resp = session.post(
+        USER_MGMT_TOKEN_ENDPOINT, json=credentials, timeout=USER_MGMT_TOKEN_TIMEOUT
+    )
     if resp.status_code != status.HTTP_200_OK:
         logger.error("Failed to obtain JWT")
         raise HTTPException(
@@ -49,17 +83,71 @@ def issue_jwt_token(username, password):
     return resp.json().get("access_token")
 
 
-def verify_jwt_with_user_mgmt(token: str):
-    # Call the ml_auth endpoint for token verification
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(USER_MGMT_VERIFY_ENDPOINT, headers=headers)
-    if resp.status_code != status.HTTP_200_OK:
-        logger.error(f"Failed to verify JWT: {resp.status_code}")
+# our singleton cache of the JWT verification keys
+verification_keys = VerificationKeys(
+    url=lambda: USER_MGMT_JWKS_ENDPOINT,
+    session=session,
+    timeout=USER_MGMT_VERIFY_TIMEOUT,
+    ttl_seconds=JWKS_CACHE_SECONDS,
+    min_refresh_seconds=JWKS_MIN_REFRESH_SECONDS,
+)
+
+# our singleton list of revoked JWTs
+revocation_list = RevocationList(
+    url=lambda: USER_MGMT_REVOKED_ENDPOINT,
+    session=session,
+    timeout=USER_MGMT_VERIFY_TIMEOUT,
+    sync_seconds=REVOCATION_SYNC_SECONDS,
+    min_refresh_seconds=JWKS_MIN_REFRESH_SECONDS,
+)
+
+# our singleton background refresher of the keys and revocations, started at startup
+verification_refresher = VerificationRefresher(
+    verification_keys, revocation_list, interval_seconds=REVOCATION_SYNC_SECONDS
+)
+
+
+def verify_jwt(token: str):
+    """
+    Verify a JWT locally, with the cached keys and revocation list of ml_user_mgmt,
+    which are kept up to date by the verification_refresher.
+    """
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+        public_key = verification_keys.get(kid)
+        if public_key is None:
+            if not verification_keys.is_loaded():
+                # not the token is invalid, but ml_user_mgmt was never reachable
+                logger.error("No JWT verification keys are loaded")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Token verification unavailable",
+                )
+            raise jwt.InvalidTokenError(f"Unknown signing key {kid}")
+        payload = jwt.decode(token, public_key, algorithms=[JWT_ALGORITHM])
+    except jwt.InvalidTokenError as e:
+        logger.error(f"Failed to verify JWT: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
+        )
+    if payload.get("type", "access") != "access":
+        # refresh tokens are only accepted by ml_user_mgmt
+        logger.error("JWT is not an access token")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
+        )
+    if payload.get("expires", 0) < time.time():
+        logger.error("JWT is expired")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
+        )
+    if revocation_list.is_revoked(payload.get("jti")):
+        logger.error(f"JWT {payload.get('jti')} is revoked")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
         )
-    logger.info(f"Successfully verified JWT for user: {resp.json()}")
-    return resp.json()
+    logger.info(f"Successfully verified JWT for user: {payload.get('user_id')}")
+    return {"valid": True, "payload": payload}
 
 
 def get_current_user(credentials):
@@ -75,7 +163,7 @@ def get_current_user(credentials):
     if not token:
         logger.error("JWT missing")
         raise HTTPException(status_code=401, detail="Missing token")
-    return verify_jwt_with_user_mgmt(token)
+    return verify_jwt(token)
 
 
 """
@@ -89,6 +177,6 @@ from fastapi import Security
 async def secure_dummy(
     credentials: HTTPAuthorizationCredentials = Security(HTTPBearer())
 ):
-    user = get_current_user(credentials)  # This authenticates the user via a call to to ml_auth/verify-token
+    user = get_current_user(credentials)  # This verifies the JWT locally, with the keys published by ml_auth
     return {"message": f"Hello, {user['user']}!"}
 """
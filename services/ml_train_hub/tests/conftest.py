@@ -1,3 +1,6 @@
+# load the OpenSSL bindings of cryptography before TensorFlow, a dynamically linked
+# OpenSSL (e.g. of conda) otherwise resolves symbols of TensorFlow's bundled BoringSSL
+import jwt.algorithms  # noqa: F401
 import pytest
 from fastapi.testclient import TestClient
 from ml_train_hub.app.main import app
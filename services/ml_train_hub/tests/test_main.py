@@ -1,3 +1,7 @@
+import hashlib
+from unittest.mock import patch
+
+
 def test_ping(test_train_hub_client):
     """Test ping endpoint (e.g., GET /ping)."""
     response = test_train_hub_client.get("/ping")
@@ -16,3 +20,46 @@ def test_invalid_endpoint(test_train_hub_client):
     """Test invalid endpoint."""
     response = test_train_hub_client.get("/invalid-endpoint")
     assert response.status_code == 404
+
+
+@patch("ml_train_hub.app.mlflow_util.get_mlflow_model")
+@patch("ml_train_hub.app.main.get_current_user")
+def test_get_model_artifact(
+    mock_get_current_user, mock_get_model, test_train_hub_client, tmp_path
+):
+    """Test model artifact endpoint (e.g., GET /models/{model_name}/artifact)."""
+    model_filepath = tmp_path / "model.keras"
+    model_filepath.write_bytes(b"model content")
+    mock_get_model.return_value = {
+        "version": "3",
+        "model_filepath": str(model_filepath),
+        "tflite_filepath": None,
+        "quantized_filepaths": {},
+    }
+    response = test_train_hub_client.get(
+        "/models/Test/artifact", headers={"Authorization": "Bearer token"}
+    )
+    assert response.status_code == 200
+    assert response.content == b"model content"
+    assert (
+        response.headers["X-Content-SHA256"]
+        == hashlib.sha256(b"model content").hexdigest()
+    )
+    assert response.headers["X-Model-Version"] == "3"
+    mock_get_model.assert_called_with("Test", None)
+
+    response = test_train_hub_client.get(
+        "/models/Test/artifact?version=2", headers={"Authorization": "Bearer token"}
+    )
+    assert response.status_code == 200
+    mock_get_model.assert_called_with("Test", "2")
+
+    response = test_train_hub_client.get(
+        "/models/Test/artifact?kind=tflite", headers={"Authorization": "Bearer token"}
+    )
+    assert response.status_code == 404
+
+    response = test_train_hub_client.get(
+        "/models/Test/artifact?kind=onnx", headers={"Authorization": "Bearer token"}
+    )
+    assert response.status_code == 400
@@ -0,0 +1,21 @@
+import numpy as np
+import tensorflow as tf
+from ml_train_hub.app.model_util import convert_to_tflite
+
+
+def test_convert_to_tflite(tmp_path):
+    inputs = tf.keras.Input(shape=(8, 8, 1))
+    x = tf.keras.layers.Flatten()(inputs)
+    outputs = tf.keras.layers.Dense(2, activation="softmax")(x)
+    model = tf.keras.Model(inputs, outputs)
+
+    tflite_filepath = convert_to_tflite(model, str(tmp_path / "model.tflite"))
+
+    interpreter = tf.lite.Interpreter(model_path=tflite_filepath)
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()[0]
+    images = np.random.rand(1, 8, 8, 1).astype("float32")
+    interpreter.set_tensor(input_details["index"], images)
+    interpreter.invoke()
+    output = interpreter.get_tensor(interpreter.get_output_details()[0]["index"])
+    np.testing.assert_allclose(output, model(images).numpy(), rtol=1e-5)
@@ -0,0 +1,127 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+import tensorflow as tf
+from ml_train_hub.app.quantization_util import (
+    TFLiteClassifier,
+    is_within_tolerance,
+    make_fixed_evaluation_dataset,
+    quantize_and_register_variants,
+    quantize_model,
+)
+
+class_names = ["COVID", "Normal"]
+
+
+def make_model():
+    tf.keras.utils.set_random_seed(0)
+    inputs = tf.keras.Input(shape=(8, 8, 1))
+    x = tf.keras.layers.Conv2D(4, 3, activation="relu")(inputs)
+    x = tf.keras.layers.Flatten()(x)
+    outputs = tf.keras.layers.Dense(2, activation="softmax")(x)
+    return tf.keras.Model(inputs, outputs)
+
+
+def make_dataset(class_names, input_shape=(224, 224)):
+    images = np.random.rand(16, *input_shape, 3).astype("float32") * 255
+    labels = np.random.randint(0, len(class_names), 16)
+    return tf.data.Dataset.from_tensor_slices((images, labels)).batch(8)
+
+
+def metrics(recall, f1_score):
+    return {"recall": {"COVID": recall}, "f1_score": {"COVID": f1_score}}
+
+
+def test_is_within_tolerance():
+    reference = metrics(0.95, 0.90)
+    assert is_within_tolerance(reference, metrics(0.94, 0.89), tolerance=0.02)
+    assert is_within_tolerance(reference, metrics(0.97, 0.92), tolerance=0.02)
+    assert not is_within_tolerance(reference, metrics(0.90, 0.90), tolerance=0.02)
+    assert not is_within_tolerance(reference, metrics(0.95, 0.85), tolerance=0.02)
+
+
+@pytest.mark.parametrize("variant", ["float16", "int8"])
+@patch("ml_train_hub.app.quantization_util.read_and_resize_evaluation_dataset")
+def test_quantize_model(mock_read_dataset, variant, tmp_path):
+    mock_read_dataset.side_effect = make_dataset
+    model = make_model()
+
+    tflite_filepath = quantize_model(
+        model, variant, str(tmp_path / f"{variant}.tflite"), class_names, num_samples=8
+    )
+
+    # the quantized variant is evaluated like a keras model
+    classifier = TFLiteClassifier(tflite_filepath)
+    assert classifier.input_shape == (None, 8, 8, 1)
+    # same value range as the calibration images
+    images = np.random.rand(3, 8, 8, 1).astype("float32") * 255
+    preds = classifier.predict(images, verbose=0)
+    assert preds.shape == (3, 2)
+    np.testing.assert_allclose(preds, model(images).numpy(), atol=0.1)
+    assert mock_read_dataset.called == (variant == "int8")
+
+
+@patch("ml_train_hub.app.quantization_util.read_and_resize_evaluation_dataset")
+def test_fixed_evaluation_dataset_draws_the_same_images(mock_read_dataset, tmp_path):
+    # the evaluation dataset is shuffled again on every iteration
+    mock_read_dataset.side_effect = lambda class_names, input_shape, seed: (
+        make_dataset(class_names, input_shape).unbatch().shuffle(16).batch(8)
+    )
+    dataset = make_fixed_evaluation_dataset(
+        class_names, (8, 8), 5, str(tmp_path / "evaluation")
+    )
+
+    iterations = [
+        np.concatenate([images.numpy() for images, _ in dataset]) for _ in range(3)
+    ]
+    assert iterations[0].shape == (5, 8, 8, 3)
+    for images in iterations[1:]:
+        np.testing.assert_array_equal(images, iterations[0])
+    assert mock_read_dataset.call_count == 1
+
+
+@patch("ml_train_hub.app.quantization_util.mlflow")
+@patch("ml_train_hub.app.quantization_util.TFLiteClassifier")
+@patch("ml_train_hub.app.quantization_util.quantize_model")
+@patch("ml_train_hub.app.quantization_util.evaluate_model")
+@patch("ml_train_hub.app.quantization_util.make_fixed_evaluation_dataset")
+def test_quantize_and_register_variants(
+    mock_make_dataset,
+    mock_evaluate,
+    mock_quantize,
+    mock_classifier,
+    mock_mlflow,
+):
+    client = mock_mlflow.tracking.MlflowClient.return_value
+    client.search_model_versions.return_value = [
+        MagicMock(version="3", run_id="run-3", source="models:/Test/3")
+    ]
+    mock_mlflow.tensorflow.load_model.return_value = make_model()
+    mock_quantize.side_effect = lambda model, variant, path, class_names: path
+    # float16 keeps the COVID metrics, int8 loses too much recall
+    mock_evaluate.side_effect = [
+        metrics(0.95, 0.90),
+        metrics(0.94, 0.90),
+        metrics(0.80, 0.88),
+    ]
+
+    quantize_and_register_variants("Test", class_names, max_num=10)
+
+    # every model is evaluated on the same fixed evaluation dataset
+    dataset = mock_make_dataset.return_value
+    assert mock_make_dataset.call_args.args[:3] == (class_names, (8, 8), 10)
+    assert [call.args[3] for call in mock_evaluate.call_args_list] == [dataset] * 3
+
+    # only the servable variant is logged as artifact
+    mock_mlflow.log_artifact.assert_called_once()
+    assert mock_mlflow.log_artifact.call_args.args[0].endswith("Test_float16.tflite")
+    assert (
+        mock_mlflow.log_artifact.call_args.kwargs["artifact_path"]
+        == "quantized/float16"
+    )
+    assert [call.args for call in client.set_model_version_tag.call_args_list] == [
+        ("Test", "3", "quantized_float16", "servable"),
+        ("Test", "3", "quantized_int8", "rejected"),
+    ]
+    mock_mlflow.log_metric.assert_any_call("int8_recall_COVID", 0.80)
@@ -0,0 +1,179 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from jwt.algorithms import RSAAlgorithm
+from ml_train_hub.app import security
+
+
+def _create_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    jwk.update({"kid": kid, "use": "sig", "alg": "RS256"})
+    return private_key, jwk
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {kid: _create_key(kid) for kid in ("key-1", "key-2")}
+
+
+@pytest.fixture(autouse=True)
+def clear_security_caches():
+    security.verification_keys.clear()
+    security.revocation_list.clear()
+    yield
+    security.verification_keys.clear()
+    security.revocation_list.clear()
+
+
+def _sign(keys, kid, jti="jti-1", expires_in=600, token_type="access"):
+    payload = {
+        "user_id": "user123",
+        "expires": time.time() + expires_in,
+        "jti": jti,
+        "type": token_type,
+    }
+    return jwt.encode(payload, keys[kid][0], algorithm="RS256", headers={"kid": kid})
+
+
+def _response(json_data):
+    resp = MagicMock()
+    resp.json.return_value = json_data
+    return resp
+
+
+def _fake_user_mgmt(keys, published=("key-1",), revoked=()):
+    """
+    Replace the requests to ml_user_mgmt, returns the list of requested URLs.
+    """
+    calls = []
+
+    def get(url, params=None, timeout=None):
+        assert timeout is not None
+        calls.append(url)
+        if url == security.USER_MGMT_JWKS_ENDPOINT:
+            return _response({"keys": [keys[kid][1] for kid in published]})
+        return _response(
+            {
+                "as_of": time.time(),
+                "revoked": [
+                    {"jti": jti, "expires": time.time() + 600} for jti in revoked
+                ],
+            }
+        )
+
+    return calls, get
+
+
+def test_verify_jwt_locally_without_a_request_per_call(keys):
+    calls, get = _fake_user_mgmt(keys)
+    with patch.object(security.session, "get", side_effect=get):
+        for _ in range(5):
+            result = security.verify_jwt(_sign(keys, "key-1"))
+            assert result["payload"]["user_id"] == "user123"
+    # the keys and the revocation list are only fetched once
+    assert calls == [
+        security.USER_MGMT_JWKS_ENDPOINT,
+        security.USER_MGMT_REVOKED_ENDPOINT,
+    ]
+
+
+def test_unknown_key_id_fetches_the_keys_again(keys):
+    calls, get = _fake_user_mgmt(keys, published=("key-1",))
+    with patch.object(security.session, "get", side_effect=get):
+        security.verify_jwt(_sign(keys, "key-1"))
+        security.verification_keys.min_refresh_seconds = 0
+        try:
+            calls_after_rotation, get = _fake_user_mgmt(
+                keys, published=("key-1", "key-2")
+            )
+            with patch.object(security.session, "get", side_effect=get):
+                security.verify_jwt(_sign(keys, "key-2"))
+        finally:
+            security.verification_keys.min_refresh_seconds = (
+                security.JWKS_MIN_REFRESH_SECONDS
+            )
+    assert calls_after_rotation == [security.USER_MGMT_JWKS_ENDPOINT]
+
+
+def test_cached_keys_are_used_while_user_mgmt_is_down(keys):
+    calls, get = _fake_user_mgmt(keys)
+    with patch.object(security.session, "get", side_effect=get):
+        security.verify_jwt(_sign(keys, "key-1"))
+
+    security.verification_keys.ttl_seconds = 0
+    security.verification_keys.min_refresh_seconds = 0
+    try:
+        with patch.object(
+            security.session, "get", side_effect=ConnectionError("down")
+        ) as mock_get:
+            result = security.verify_jwt(_sign(keys, "key-1", jti="jti-2"))
+            # stale keys are only fetched again by the background refresher
+            assert mock_get.call_count == 0
+            security.verification_refresher.refresh()
+            assert mock_get.call_args_list[0].args == (
+                security.USER_MGMT_JWKS_ENDPOINT,
+            )
+            result = security.verify_jwt(_sign(keys, "key-1", jti="jti-3"))
+    finally:
+        security.verification_keys.ttl_seconds = security.JWKS_CACHE_SECONDS
+        security.verification_keys.min_refresh_seconds = (
+            security.JWKS_MIN_REFRESH_SECONDS
+        )
+    assert result["valid"] is True
+
+
+def test_unreachable_user_mgmt_without_keys_is_unavailable(keys):
+    with patch.object(security.session, "get", side_effect=ConnectionError("down")):
+        with pytest.raises(HTTPException) as exc_info:
+            security.verify_jwt(_sign(keys, "key-1"))
+    assert exc_info.value.status_code == 503
+
+
+def test_revoked_token_is_rejected(keys):
+    calls, get = _fake_user_mgmt(keys, revoked=("jti-revoked",))
+    with patch.object(security.session, "get", side_effect=get):
+        security.verify_jwt(_sign(keys, "key-1"))
+        with pytest.raises(HTTPException) as exc_info:
+            security.verify_jwt(_sign(keys, "key-1", jti="jti-revoked"))
+    assert exc_info.value.status_code == 401
+
+
+def test_revocations_are_synced_incrementally(keys):
+    calls, get = _fake_user_mgmt(keys, revoked=("jti-revoked",))
+    revocation_list = security.RevocationList(
+        url=lambda: security.USER_MGMT_REVOKED_ENDPOINT,
+        session=security.session,
+        timeout=security.USER_MGMT_VERIFY_TIMEOUT,
+        sync_seconds=0,
+        min_refresh_seconds=0,
+    )
+    with patch.object(security.session, "get", side_effect=get) as mock_get:
+        assert revocation_list.is_revoked("jti-revoked")
+        calls, get = _fake_user_mgmt(keys)
+        mock_get.side_effect = get
+        # known revocations are kept, only newer ones are requested
+        assert revocation_list.is_revoked("jti-revoked")
+        assert mock_get.call_args.kwargs["params"]["since"] > 0
+
+
+@pytest.mark.parametrize(
+    "token_factory",
+    [
+        lambda keys: _sign(keys, "key-1", expires_in=-1),
+        lambda keys: _sign(keys, "key-2"),
+        lambda keys: "invalidtoken",
+        lambda keys: _sign(keys, "key-1", token_type="refresh"),
+    ],
+    ids=["expired", "unknown_key", "malformed", "refresh_token"],
+)
+def test_invalid_tokens_are_rejected(keys, token_factory):
+    calls, get = _fake_user_mgmt(keys, published=("key-1",))
+    with patch.object(security.session, "get", side_effect=get):
+        with pytest.raises(HTTPException) as exc_info:
+            security.verify_jwt(token_factory(keys))
+    assert exc_info.value.status_code == 401
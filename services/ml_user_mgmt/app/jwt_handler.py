@@ -1,32 +1,120 @@
+import os
 import time
+import uuid
+from typing import List
 
 import jwt
 from fastapi import HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from ml_user_mgmt.app.key_ring import (
+    JWT_EXPIRES_SECONDS,
+    JWT_REFRESH_EXPIRES_SECONDS,
+    key_ring,
+    revocation_list,
+)
+from pydantic import BaseModel
 
-JWT_SECRET = "secret"  # this should be specified in a vault in a real application
-JWT_ALGORITHM = "HS256"
+# the tokens are signed with the rotating private keys of the key ring, consumers verify
+# them locally with the public keys published at /.well-known/jwks.json
+JWT_ALGORITHM = "RS256"
+# Maximum number of tokens of a batch verification request
+VERIFY_BATCH_MAX_TOKENS = int(os.getenv("VERIFY_BATCH_MAX_TOKENS", "1000"))
+# Comma separated usernames, whose access tokens carry the admin role
+JWT_ADMIN_USERS = {
+    username.strip()
+    for username in os.getenv("JWT_ADMIN_USERS", "").split(",")
+    if username.strip()
+}
+ADMIN_ROLE = "admin"
+
+
+# The type claim tells access tokens apart from refresh tokens, which are only
+# accepted by /token/refresh
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+
+
+class TokenBatchSchema(BaseModel):
+    tokens: List[str]
+
+
+class RefreshTokenSchema(BaseModel):
+    refresh_token: str
 
 
 # Helper functions
-def token_response(token: str):
-    return {"access_token": token}
+def token_response(access_token: str, refresh_token: str):
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": int(JWT_EXPIRES_SECONDS),
+    }
+
+
+def get_roles(user_id: str):
+    return [ADMIN_ROLE] if user_id in JWT_ADMIN_USERS else []
+
+
+def encode_jwt(user_id: str, token_type: str, expires_seconds: float, **claims):
+    signing_key = key_ring.signing_key()
+    payload = {
+        "user_id": user_id,
+        "expires": time.time() + expires_seconds,
+        "jti": uuid.uuid4().hex,
+        "type": token_type,
+        **claims,
+    }
+    return jwt.encode(
+        payload,
+        signing_key.private_key,
+        algorithm=JWT_ALGORITHM,
+        headers={"kid": signing_key.kid},
+    )
 
 
 def sign_jwt(user_id: str):
-    payload = {"user_id": user_id, "expires": time.time() + 600}
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
-    return token_response(token)
+    return token_response(
+        # the roles are looked up again on every refresh
+        encode_jwt(
+            user_id, ACCESS_TOKEN_TYPE, JWT_EXPIRES_SECONDS, roles=get_roles(user_id)
+        ),
+        encode_jwt(user_id, REFRESH_TOKEN_TYPE, JWT_REFRESH_EXPIRES_SECONDS),
+    )
 
 
-def decode_jwt(token: str):
+def decode_jwt(token: str, token_type: str = ACCESS_TOKEN_TYPE):
     try:
-        decoded_token = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        public_key = key_ring.verification_key(jwt.get_unverified_header(token)["kid"])
+        decoded_token = jwt.decode(token, public_key, algorithms=[JWT_ALGORITHM])
+        if decoded_token.get("type", ACCESS_TOKEN_TYPE) != token_type:
+            return {}
+        if revocation_list.is_revoked(decoded_token["jti"]):
+            return None
         return decoded_token if decoded_token["expires"] >= time.time() else None
     except Exception:
         return {}
 
 
+def verify_jwt_batch(tokens):
+    """
+    Verify a batch of tokens, repeated tokens are only verified once.
+    Returns one result per token, in the order of the tokens.
+    """
+    results = {}
+    for token in tokens:
+        if token in results:
+            continue
+        payload = decode_jwt(token)
+        if payload:
+            results[token] = {"valid": True, "payload": payload}
+        elif payload is None:
+            results[token] = {"valid": False, "error": "Expired or revoked JWT token."}
+        else:
+            results[token] = {"valid": False, "error": "Invalid JWT token."}
+    return [results[token] for token in tokens], len(results)
+
+
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super(JWTBearer, self).__init__(auto_error=auto_error)
@@ -0,0 +1,323 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+from ml_user_mgmt.app.user_db import USER_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Seconds a signing key is used, before a new key is generated
+JWT_KEY_ROTATION_SECONDS = float(os.getenv("JWT_KEY_ROTATION_SECONDS", "86400"))
+# Seconds an access token is valid
+JWT_EXPIRES_SECONDS = float(os.getenv("JWT_EXPIRES_SECONDS", "600"))
+# Seconds a refresh token is valid, retired keys are published until their last token expired
+JWT_REFRESH_EXPIRES_SECONDS = float(os.getenv("JWT_REFRESH_EXPIRES_SECONDS", "86400"))
+# Seconds the consumers may cache the published verification keys
+JWKS_MAX_AGE_SECONDS = int(os.getenv("JWKS_MAX_AGE_SECONDS", "300"))
+# SQLite file, which keeps the signing keys and revoked tokens across restarts and worker processes
+JWT_KEY_DB_PATH = os.getenv("JWT_KEY_DB_PATH", USER_DB_PATH)
+# Minimum seconds between two reloads of the stored keys for unknown key IDs
+JWT_KEY_RELOAD_SECONDS = float(os.getenv("JWT_KEY_RELOAD_SECONDS", "10"))
+# Expired revocations are pruned once every this many revocations
+PRUNE_INTERVAL = 100
+
+
+class SigningKey:
+    def __init__(self, kid, private_key, created_at):
+        self.kid = kid
+        self.private_key = private_key
+        self.created_at = created_at
+        self.retired_at = None
+
+    def to_pem(self):
+        return self.private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+
+    def to_jwk(self):
+        jwk = RSAAlgorithm.to_jwk(self.private_key.public_key(), as_dict=True)
+        jwk.update({"kid": self.kid, "use": "sig", "alg": "RS256"})
+        return jwk
+
+
+class KeyRing:
+    """
+    RSA keys used to sign the JWTs. The current key is replaced after rotation_seconds,
+    retired keys stay published until all tokens they signed have expired, so
+    consumers, which verify tokens locally, can keep verifying them.
+
+    With a db_path the keys are kept in SQLite, so they survive restarts and all worker
+    processes sign with the same key. Keys rotated by another process are picked up,
+    when an unknown key ID is verified (at most once per reload_seconds), the keys are
+    published or the current key is due.
+    """
+
+    def __init__(
+        self,
+        rotation_seconds=JWT_KEY_ROTATION_SECONDS,
+        expires_seconds=max(JWT_EXPIRES_SECONDS, JWT_REFRESH_EXPIRES_SECONDS),
+        db_path=None,
+        reload_seconds=JWT_KEY_RELOAD_SECONDS,
+    ):
+        self.rotation_seconds = rotation_seconds
+        self.expires_seconds = expires_seconds
+        self.db_path = db_path
+        self.reload_seconds = reload_seconds
+        self._loaded_at = None
+        self._keys = {}  # kid -> SigningKey, the current key is the last one
+        self._current = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connection(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS signing_keys ("
+                "kid TEXT PRIMARY KEY, private_key BLOB NOT NULL, "
+                "created_at REAL NOT NULL, retired_at REAL"
+                ")"
+            )
+            yield connection
+            connection.commit()
+        finally:
+            connection.close()
+
+    def load(self):
+        """
+        Load the stored keys, a new key is generated, if there is none.
+        """
+        with self._lock:
+            self._load()
+            current = self._current
+        if current is None:
+            self.rotate()
+
+    def _load(self):
+        # must be called holding the lock
+        self._loaded = True
+        self._loaded_at = time.monotonic()
+        if self.db_path is None:
+            return
+        with self._connection() as connection:
+            rows = connection.execute(
+                "SELECT kid, private_key, created_at, retired_at FROM signing_keys "
+                "ORDER BY created_at"
+            ).fetchall()
+        keys = {}
+        for kid, private_key, created_at, retired_at in rows:
+            key = self._keys.get(kid)
+            if key is None:
+                key = SigningKey(
+                    kid=kid,
+                    private_key=serialization.load_pem_private_key(
+                        private_key, password=None
+                    ),
+                    created_at=created_at,
+                )
+            key.retired_at = retired_at
+            keys[kid] = key
+        self._keys = keys
+        self._current = next(reversed(keys.values()), None)
+        self._prune()
+
+    def _ensure_loaded(self):
+        # must be called holding the lock
+        if not self._loaded:
+            self._load()
+
+    def rotate(self):
+        """
+        Generate a new signing key and retire the current one.
+        """
+        key = SigningKey(
+            kid=uuid.uuid4().hex,
+            private_key=rsa.generate_private_key(public_exponent=65537, key_size=2048),
+            created_at=time.time(),
+        )
+        with self._lock:
+            self._ensure_loaded()
+            if self.db_path is not None:
+                with self._connection() as connection:
+                    connection.execute(
+                        "UPDATE signing_keys SET retired_at = ? WHERE retired_at IS NULL",
+                        (key.created_at,),
+                    )
+                    connection.execute(
+                        "INSERT INTO signing_keys VALUES (?, ?, ?, NULL)",
+                        (key.kid, key.to_pem(), key.created_at),
+                    )
+                    connection.execute(
+                        "DELETE FROM signing_keys WHERE retired_at < ?",
+                        (key.created_at - self.expires_seconds,),
+                    )
+            for other in self._keys.values():
+                if other.retired_at is None:
+                    other.retired_at = key.created_at
+            self._keys[key.kid] = key
+            self._current = key
+            self._prune()
+        logger.info(f"Rotated the JWT signing key, the new key ID is {key.kid}.")
+        return key
+
+    def _prune(self):
+        now = time.time()
+        for kid, key in list(self._keys.items()):
+            if (
+                key.retired_at is not None
+                and key.retired_at + self.expires_seconds < now
+            ):
+                del self._keys[kid]
+
+    def _is_due(self, key):
+        return key is None or time.time() - key.created_at >= self.rotation_seconds
+
+    def signing_key(self):
+        with self._lock:
+            self._ensure_loaded()
+            current = self._current
+            if self._is_due(current):
+                # another process may have rotated the key meanwhile
+                self._load()
+                current = self._current
+        if self._is_due(current):
+            current = self.rotate()
+        return current
+
+    def verification_key(self, kid):
+        """
+        Return the public key with the given key ID, or None if it is unknown or retired too long ago.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            # unknown key IDs reload at most once per interval, so tokens with made up key IDs
+            # don't cause a database read each
+            if (
+                kid not in self._keys
+                and time.monotonic() - self._loaded_at >= self.reload_seconds
+            ):
+                self._load()
+            self._prune()
+            key = self._keys.get(kid)
+        return None if key is None else key.private_key.public_key()
+
+    def jwks(self):
+        with self._lock:
+            self._load()
+            self._prune()
+            return {"keys": [key.to_jwk() for key in self._keys.values()]}
+
+
+class RevocationList:
+    """
+    IDs of revoked tokens, kept until the tokens would have expired anyway.
+
+    The revocations are stored in the given SQLite table, so they survive restarts and
+    are shared by all worker processes. Without a db_path they are kept in memory.
+    """
+
+    def __init__(self, table, db_path=None):
+        self.table = table
+        self.db_path = db_path
+        self._connection = None
+        self._revocations = 0
+        self._lock = threading.Lock()
+
+    def _get_connection(self):
+        # must be called holding the lock
+        if self._connection is None:
+            if self.db_path is None:
+                connection = sqlite3.connect(":memory:", check_same_thread=False)
+            else:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                connection = sqlite3.connect(
+                    self.db_path, timeout=10, check_same_thread=False
+                )
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "jti TEXT PRIMARY KEY, expires REAL NOT NULL, revoked_at REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def revoke(self, jti, expires):
+        self.revoke_once(jti, expires)
+
+    def revoke_once(self, jti, expires):
+        """
+        Revoke a token, returns False if it was already revoked.
+        """
+        with self._lock:
+            connection = self._get_connection()
+            # atomic across processes, only one of them inserts the row
+            inserted = connection.execute(
+                f"INSERT OR IGNORE INTO {self.table} VALUES (?, ?, ?)",
+                (jti, expires, time.time()),
+            ).rowcount
+            self._revocations += 1
+            if self._revocations % PRUNE_INTERVAL == 0:
+                self._prune(connection)
+            connection.commit()
+            return inserted == 1
+
+    def is_revoked(self, jti):
+        with self._lock:
+            row = (
+                self._get_connection()
+                .execute(f"SELECT 1 FROM {self.table} WHERE jti = ?", (jti,))
+                .fetchone()
+            )
+        return row is not None
+
+    def _prune(self, connection):
+        # must be called holding the lock
+        connection.execute(
+            f"DELETE FROM {self.table} WHERE expires < ?", (time.time(),)
+        )
+
+    def entries(self, since=0.0):
+        """
+        Return the unexpired revocations, which were made after since.
+        """
+        with self._lock:
+            connection = self._get_connection()
+            self._prune(connection)
+            connection.commit()
+            rows = connection.execute(
+                f"SELECT jti, expires FROM {self.table} WHERE revoked_at >= ?",
+                (since,),
+            ).fetchall()
+        return [{"jti": jti, "expires": expires} for jti, expires in rows]
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# our singleton key ring, its keys are loaded on first use
+key_ring = KeyRing(db_path=JWT_KEY_DB_PATH)
+
+# our singleton revocation list, which is synced by the consumers
+revocation_list = RevocationList("revoked_tokens", db_path=JWT_KEY_DB_PATH)
+
+# our singleton list of used refresh tokens, every refresh token can only be used once
+used_refresh_tokens = RevocationList("used_refresh_tokens", db_path=JWT_KEY_DB_PATH)
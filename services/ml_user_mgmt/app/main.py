@@ -1,13 +1,29 @@
 import logging
 import logging.config
 import os
+import time
+from contextlib import asynccontextmanager
 
 print("Runtime root folder:", os.getcwd())
 import ml_user_mgmt.app.exceptions.auth_exceptions as ae
-from fastapi import Body, FastAPI, Request, Security, status
+from fastapi import Body, FastAPI, Request, Response, Security, status
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from ml_user_mgmt.app.jwt_handler import decode_jwt, sign_jwt
+from ml_user_mgmt.app.jwt_handler import (
+    REFRESH_TOKEN_TYPE,
+    VERIFY_BATCH_MAX_TOKENS,
+    RefreshTokenSchema,
+    TokenBatchSchema,
+    decode_jwt,
+    sign_jwt,
+    verify_jwt_batch,
+)
+from ml_user_mgmt.app.key_ring import (
+    JWKS_MAX_AGE_SECONDS,
+    key_ring,
+    revocation_list,
+    used_refresh_tokens,
+)
 from ml_user_mgmt.app.logging_config import LOGGING_CONFIG
 from ml_user_mgmt.app.user_db import UserDb, UserSchema
 from prometheus_fastapi_instrumentator import Instrumentator
@@ -18,8 +34,18 @@ logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # open the user store and load the stored signing keys at startup, instead of on
+    # the first token request, so a misconfigured data folder stops the service
+    user_db.open()
+    key_ring.load()
+    yield
+    user_db.close()
+
+
 # our singleton MLFlow API
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # setup Prometheus instrumentator
 Instrumentator().instrument(app).expose(app)
@@ -60,7 +86,7 @@ def health():
 
 @app.post("/token")
 async def create_token(user: UserSchema = Body(...)):
-    if user_db.check_user(user):
+    if await user_db.check_user_async(user):
         logger.info(f"Created JWT for user {user.username}.")
         return sign_jwt(user.username)
     else:
@@ -70,6 +96,24 @@ async def create_token(user: UserSchema = Body(...)):
         raise ae.FailedAuthentification(message="Wrong login credentials!")
 
 
+@app.post("/token/refresh")
+def refresh_token(body: RefreshTokenSchema = Body(...)):
+    """
+    Issue new tokens for a refresh token, without checking the password again.
+    Every refresh token can only be used once, the response holds its successor.
+    """
+    payload = decode_jwt(body.refresh_token, token_type=REFRESH_TOKEN_TYPE)
+    if not payload:
+        raise ae.FailedAuthentification(message="Invalid or expired refresh token.")
+    if not used_refresh_tokens.revoke_once(payload["jti"], payload["expires"]):
+        logger.warning(f"Refresh token {payload['jti']} was used again.")
+        raise ae.FailedAuthentification(message="Refresh token was already used.")
+    if not user_db.has_user(payload["user_id"]):
+        raise ae.FailedAuthentification(message="Unknown user.")
+    logger.info(f"Refreshed JWT for user {payload['user_id']}.")
+    return sign_jwt(payload["user_id"])
+
+
 def verify_jwt_token(token: str):
     try:
         payload = decode_jwt(token)
@@ -92,6 +136,53 @@ async def verify_jwt(
         raise ae.FailedAuthentification(message="Invalid or expired JWT token.")
 
 
+@app.post("/verify-tokens")
+def verify_jwts(batch: TokenBatchSchema = Body(...)):
+    """
+    Verify a batch of tokens in one request, the results are in the order of the tokens.
+    Runs in the thread pool, as verifying a large batch would block the event loop.
+    """
+    if len(batch.tokens) > VERIFY_BATCH_MAX_TOKENS:
+        raise ae.InvalidArgumentException(
+            message=f"At most {VERIFY_BATCH_MAX_TOKENS} tokens can be verified at once."
+        )
+    results, unique = verify_jwt_batch(batch.tokens)
+    logger.info(f"Verified a batch of {len(batch.tokens)} JWTs, {unique} unique.")
+    return {"results": results, "unique": unique}
+
+
+@app.get("/.well-known/jwks.json")
+def jwks(response: Response):
+    """
+    Public keys to verify the JWTs locally, consumers cache them for max-age seconds
+    and fetch them again, when a token is signed with an unknown key ID.
+    """
+    response.headers["Cache-Control"] = f"public, max-age={JWKS_MAX_AGE_SECONDS}"
+    return key_ring.jwks()
+
+
+@app.post("/revoke")
+async def revoke_jwt(
+    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+):
+    payload = verify_jwt_token(credentials.credentials)
+    if not payload:
+        raise ae.FailedAuthentification(message="Invalid or expired JWT token.")
+    revocation_list.revoke(payload["jti"], payload["expires"])
+    logger.info(f"Revoked JWT {payload['jti']} of user {payload['user_id']}.")
+    return {"revoked": True}
+
+
+@app.get("/revoked")
+def revoked_jwts(since: float = 0.0):
+    """
+    IDs of revoked, but not yet expired tokens. Consumers sync incrementally,
+    by passing the as_of value of their previous sync as since.
+    """
+    as_of = time.time()
+    return {"as_of": as_of, "revoked": revocation_list.entries(since)}
+
+
 # For debugging
 if __name__ == "__main__":
     user = UserSchema(username="user123", password="pass123")
@@ -1,23 +1,189 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
+# SQLite file of the user store
+USER_DB_PATH = os.getenv("USER_DB_PATH", os.path.join(".", "data/users.db"))
+# Number of pooled SQLite connections
+USER_DB_POOL_SIZE = int(os.getenv("USER_DB_POOL_SIZE", "4"))
+# PBKDF2-HMAC-SHA256 iterations of new password hashes, stored hashes keep their own count
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "600000"))
+# Number of threads verifying passwords, by default one per CPU core
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1))
+)
+SALT_BYTES = 16
+
+# The demo user, which is created in an empty user store
+DEFAULT_USERNAME = "user123"
+DEFAULT_PASSWORD = "pass123"
+
 
 class UserSchema(BaseModel):
     username: str
     password: str
 
 
+def hash_password(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+
+class ConnectionPool:
+    """
+    Fixed number of SQLite connections, which are shared by the threads of the service.
+    """
+
+    def __init__(self, db_path, size):
+        self._connections = queue.Queue()
+        for _ in range(size):
+            connection = sqlite3.connect(db_path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._connections.put(connection)
+
+    @contextmanager
+    def connection(self):
+        connection = self._connections.get()
+        try:
+            yield connection
+        finally:
+            self._connections.put(connection)
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get().close()
+
+
 class UserDb:
-    def __init__(self):
-        # This holds our user database
-        self.users = [
-            UserSchema(
-                username="user123",
-                password="pass123",
-            ),
-        ]
+    """
+    Persistent user store in SQLite, the users table is keyed by the username.
+    Only salted PBKDF2 hashes of the passwords are stored. The database is opened
+    on first use, and the demo user is created, if the store is empty.
+    """
+
+    def __init__(
+        self,
+        db_path=USER_DB_PATH,
+        pool_size=USER_DB_POOL_SIZE,
+        hash_iterations=PASSWORD_HASH_ITERATIONS,
+    ):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.hash_iterations = hash_iterations
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                pool = ConnectionPool(self.db_path, self.pool_size)
+                with pool.connection() as connection:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS users ("
+                        "username TEXT PRIMARY KEY, salt BLOB NOT NULL, "
+                        "password_hash BLOB NOT NULL, iterations INTEGER NOT NULL"
+                        ") WITHOUT ROWID"
+                    )
+                    if (
+                        connection.execute("SELECT 1 FROM users LIMIT 1").fetchone()
+                        is None
+                    ):
+                        connection.execute(
+                            "INSERT INTO users VALUES (?, ?, ?, ?)",
+                            self._make_row(DEFAULT_USERNAME, DEFAULT_PASSWORD),
+                        )
+                        logger.info(f"Created the demo user {DEFAULT_USERNAME}.")
+                    connection.commit()
+                self._pool = pool
+                logger.info(f"Opened the user store at {self.db_path}.")
+            return self._pool
+
+    def open(self):
+        """
+        Open the store, so an unwritable db_path fails at startup instead of on the first request.
+        """
+        self._get_pool()
+
+    def _make_row(self, username, password):
+        salt = os.urandom(SALT_BYTES)
+        return (
+            username,
+            salt,
+            hash_password(password, salt, self.hash_iterations),
+            self.hash_iterations,
+        )
+
+    def add_users(self, users):
+        """
+        Add or replace users, given as (username, password) pairs, in one transaction.
+        """
+        rows = [self._make_row(username, password) for username, password in users]
+        with self._get_pool().connection() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO users "
+                "(username, salt, password_hash, iterations) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            connection.commit()
+
+    def add_user(self, data: UserSchema):
+        self.add_users([(data.username, data.password)])
+
+    def count_users(self):
+        with self._get_pool().connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def has_user(self, username):
+        with self._get_pool().connection() as connection:
+            row = connection.execute(
+                "SELECT 1 FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return row is not None
 
     def check_user(self, data: UserSchema):
-        for user in self.users:
-            if user.username == data.username and user.password == data.password:
-                return True
-        return False
+        with self._get_pool().connection() as connection:
+            row = connection.execute(
+                "SELECT salt, password_hash, iterations FROM users WHERE username = ?",
+                (data.username,),
+            ).fetchone()
+        if row is None:
+            # hash anyway, so unknown users can't be told apart by the response time
+            hash_password(data.password, os.urandom(SALT_BYTES), self.hash_iterations)
+            return False
+        salt, password_hash, iterations = row
+        return hmac.compare_digest(
+            hash_password(data.password, salt, iterations), password_hash
+        )
+
+    async def check_user_async(self, data: UserSchema):
+        """
+        Check the credentials on the password worker pool, hashing releases the GIL,
+        so the event loop keeps serving requests and the checks run in parallel.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, self.check_user, data)
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
+
+# our singleton worker pool, which verifies passwords off the event loop
+password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
@@ -0,0 +1,157 @@
+"""
+Load benchmark of the /token, /verify-token and /verify-tokens endpoints with a large user store.
+
+Seeds the user store with --users users (user<i> / password<i>), then sends --requests
+requests per endpoint with --concurrency requests in flight and prints the throughput
+and latencies. /verify-tokens verifies the same tokens in batches of --batch-size,
+its throughput is given in tokens per second. By default the app runs in-process, with --url a running service is
+benchmarked, whose USER_DB_PATH must be given as --db-path to seed it.
+
+The /token latency is dominated by the password hashing, --hash-iterations sets the
+PBKDF2 iterations of the seeded users (the service default is PASSWORD_HASH_ITERATIONS).
+
+Usage (from the services directory):
+    python -m ml_user_mgmt.benchmarks.benchmark_auth --users 20000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import httpx
+from ml_user_mgmt.app import main as user_mgmt
+from ml_user_mgmt.app.user_db import UserDb
+
+SEED_CHUNK_SIZE = 1000
+
+
+def seed_users(db, number_of_users):
+    start = time.perf_counter()
+    existing = db.count_users()
+    for first in range(0, number_of_users, SEED_CHUNK_SIZE):
+        last = min(first + SEED_CHUNK_SIZE, number_of_users)
+        db.add_users((f"user{i}", f"password{i}") for i in range(first, last))
+    print(
+        f"Seeded {number_of_users} users ({existing} existed) in {time.perf_counter() - start:.1f}s, "
+        f"the store holds {db.count_users()} users."
+    )
+
+
+async def run_load(send, number_of_requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def send_one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+            return response
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[send_one(i) for i in range(number_of_requests)])
+    duration = time.perf_counter() - start
+    percentiles = statistics.quantiles(latencies, n=100)
+    return responses, {
+        "throughput": number_of_requests / duration,
+        "p50": statistics.median(latencies),
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+        "errors": errors,
+    }
+
+
+def print_result(endpoint, result):
+    print(
+        f"{endpoint:<15} {result['throughput']:>10.1f}/s {result['p50']:>9.2f}ms "
+        f"{result['p95']:>8.2f}ms {result['p99']:>8.2f}ms {result['errors']:>7}"
+    )
+
+
+async def benchmark(client, args):
+    users = [random.randrange(args.users) for _ in range(args.requests)]
+
+    def login(i):
+        return client.post(
+            "/token",
+            json={"username": f"user{users[i]}", "password": f"password{users[i]}"},
+        )
+
+    responses, token_result = await run_load(login, args.requests, args.concurrency)
+    tokens = [
+        response.json()["access_token"]
+        for response in responses
+        if response.status_code == 200
+    ]
+
+    def verify(i):
+        return client.get(
+            "/verify-token",
+            headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"},
+        )
+
+    _, verify_result = await run_load(verify, args.requests, args.concurrency)
+
+    def verify_batch(i):
+        first = i * args.batch_size
+        batch = [tokens[j % len(tokens)] for j in range(first, first + args.batch_size)]
+        return client.post("/verify-tokens", json={"tokens": batch})
+
+    number_of_batches = max(1, args.requests // args.batch_size)
+    _, batch_result = await run_load(verify_batch, number_of_batches, args.concurrency)
+    batch_result["throughput"] *= args.batch_size
+
+    print(
+        f"{'endpoint':<15} {'throughput':>12} {'p50':>11} {'p95':>10} {'p99':>10} {'errors':>7}"
+    )
+    print_result("/token", token_result)
+    print_result("/verify-token", verify_result)
+    print_result("/verify-tokens", batch_result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--hash-iterations", type=int, default=10000)
+    parser.add_argument("--url", help="base URL of a running ml_user_mgmt service")
+    parser.add_argument("--db-path", help="user store to seed, a temporary by default")
+    args = parser.parse_args()
+
+    db_path = args.db_path or os.path.join(tempfile.mkdtemp(), "users.db")
+    db = UserDb(db_path=db_path, hash_iterations=args.hash_iterations)
+    seed_users(db, args.users)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        user_mgmt.user_db = db
+        user_mgmt.key_ring.db_path = db_path
+        user_mgmt.revocation_list.db_path = db_path
+        user_mgmt.used_refresh_tokens.db_path = db_path
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=user_mgmt.app),
+            base_url="http://benchmark",
+            timeout=60,
+        )
+
+    async def run():
+        async with client:
+            await benchmark(client, args)
+
+    asyncio.run(run())
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
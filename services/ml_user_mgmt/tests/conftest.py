@@ -1,6 +1,12 @@
 import pytest
 from fastapi.testclient import TestClient
-from ml_user_mgmt.app.main import app
+from ml_user_mgmt.app.main import (
+    app,
+    key_ring,
+    revocation_list,
+    used_refresh_tokens,
+    user_db,
+)
 
 
 # fixture for TestClient instance
@@ -8,3 +14,19 @@ from ml_user_mgmt.app.main import app
 def test_user_mgmt_client():
     client = TestClient(app)
     yield client
+
+
+# the tests use their own user and key store, with cheap password hashes
+@pytest.fixture(scope="session", autouse=True)
+def test_user_db(tmp_path_factory):
+    user_db.close()
+    user_db.db_path = str(tmp_path_factory.mktemp("user_db") / "users.db")
+    user_db.hash_iterations = 1000
+    key_ring.db_path = user_db.db_path
+    for revocations in (revocation_list, used_refresh_tokens):
+        revocations.close()
+        revocations.db_path = user_db.db_path
+    yield user_db
+    user_db.close()
+    for revocations in (revocation_list, used_refresh_tokens):
+        revocations.close()
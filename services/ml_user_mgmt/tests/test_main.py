@@ -1,3 +1,13 @@
+import time
+from unittest.mock import patch
+
+import jwt
+from fastapi.testclient import TestClient
+from ml_user_mgmt.app.jwt_handler import decode_jwt
+from ml_user_mgmt.app.key_ring import KeyRing, RevocationList, key_ring
+from ml_user_mgmt.app.main import app, user_db
+
+
 def test_ping(test_user_mgmt_client):
     """Test ping endpoint (e.g., GET /ping)."""
     response = test_user_mgmt_client.get("/ping")
@@ -71,3 +81,221 @@ def test_secured_endpoint_with_valid_token(test_auth_client):
     response = test_auth_client.get("/secured", headers=headers)
     assert response.status_code == 200
 """
+
+
+def _get_token(client):
+    data = {"username": "user123", "password": "pass123"}
+    return client.post("/token", json=data).json()["access_token"]
+
+
+def test_jwks_publishes_the_signing_key(test_user_mgmt_client):
+    """Test /.well-known/jwks.json publishes the key, which signed the token."""
+    token = _get_token(test_user_mgmt_client)
+    response = test_user_mgmt_client.get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    assert "max-age=" in response.headers["cache-control"]
+    kid = jwt.get_unverified_header(token)["kid"]
+    jwk = next(key for key in response.json()["keys"] if key["kid"] == kid)
+
+    public_key = jwt.PyJWK(jwk).key
+    payload = jwt.decode(token, public_key, algorithms=["RS256"])
+    assert payload["user_id"] == "user123"
+    assert payload["jti"]
+
+
+def test_tokens_of_rotated_keys_stay_valid(test_user_mgmt_client):
+    """Test tokens signed with a retired key are still verified and published."""
+    token = _get_token(test_user_mgmt_client)
+    new_key = key_ring.rotate()
+
+    headers = {"Authorization": f"Bearer {token}"}
+    assert (
+        test_user_mgmt_client.get("/verify-token", headers=headers).status_code == 200
+    )
+    kids = [
+        key["kid"]
+        for key in test_user_mgmt_client.get("/.well-known/jwks.json").json()["keys"]
+    ]
+    assert jwt.get_unverified_header(token)["kid"] in kids
+    assert new_key.kid in kids
+    new_token = _get_token(test_user_mgmt_client)
+    assert jwt.get_unverified_header(new_token)["kid"] == new_key.kid
+
+
+def test_retired_keys_are_dropped_after_the_token_lifetime():
+    """Test retired keys are no longer published, once their tokens have expired."""
+    ring = KeyRing(rotation_seconds=3600, expires_seconds=0)
+    old_key = ring.signing_key()
+    ring.rotate()
+    assert ring.verification_key(old_key.kid) is None
+    assert [key["kid"] for key in ring.jwks()["keys"]] == [ring.signing_key().kid]
+
+
+def test_stored_keys_survive_restarts_and_are_shared(tmp_path):
+    """Test a stored key ring signs with the same key after a restart and in every process."""
+    db_path = str(tmp_path / "keys.db")
+    ring = KeyRing(db_path=db_path, reload_seconds=0)
+    key = ring.signing_key()
+
+    restarted = KeyRing(db_path=db_path, reload_seconds=0)
+    assert restarted.signing_key().kid == key.kid
+    assert restarted.verification_key(key.kid) is not None
+
+    # a key rotated by another process is verified and published
+    new_key = restarted.rotate()
+    assert ring.verification_key(new_key.kid) is not None
+    assert {jwk["kid"] for jwk in ring.jwks()["keys"]} == {key.kid, new_key.kid}
+
+
+def test_unknown_key_ids_reload_the_keys_at_most_once_per_interval(tmp_path):
+    """Test a batch of tokens with made up key IDs doesn't read the stored keys each."""
+    ring = KeyRing(db_path=str(tmp_path / "keys.db"), reload_seconds=60)
+    ring.signing_key()
+    with patch.object(ring, "_load", wraps=ring._load) as mock_load:
+        for i in range(100):
+            assert ring.verification_key(f"unknown-{i}") is None
+    assert mock_load.call_count == 0
+
+    ring.reload_seconds = 0
+    with patch.object(ring, "_load", wraps=ring._load) as mock_load:
+        assert ring.verification_key("unknown") is None
+    assert mock_load.call_count == 1
+
+
+def test_stored_revocations_survive_restarts_and_are_shared(tmp_path):
+    """Test revoked and used tokens stay revoked after a restart and in every process."""
+    db_path = str(tmp_path / "keys.db")
+    revocations = RevocationList("revoked_tokens", db_path=db_path)
+    assert revocations.revoke_once("used", time.time() + 60)
+    revocations.revoke("expired", time.time() - 1)
+
+    restarted = RevocationList("revoked_tokens", db_path=db_path)
+    assert restarted.is_revoked("used")
+    assert not restarted.revoke_once("used", time.time() + 60)
+    # expired revocations are deleted
+    assert [entry["jti"] for entry in restarted.entries()] == ["used"]
+    assert not restarted.is_revoked("expired")
+    revocations.close()
+    restarted.close()
+
+
+def test_revoke_token(test_user_mgmt_client):
+    """Test /revoke invalidates the token and lists it at /revoked."""
+    before = test_user_mgmt_client.get("/revoked").json()["as_of"]
+    token = _get_token(test_user_mgmt_client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = test_user_mgmt_client.post("/revoke", headers=headers)
+    assert response.status_code == 200
+    assert (
+        test_user_mgmt_client.get("/verify-token", headers=headers).status_code == 401
+    )
+
+    jti = jwt.decode(token, options={"verify_signature": False})["jti"]
+    revoked = test_user_mgmt_client.get("/revoked", params={"since": before}).json()
+    assert jti in [entry["jti"] for entry in revoked["revoked"]]
+    later = test_user_mgmt_client.get("/revoked", params={"since": revoked["as_of"]})
+    assert jti not in [entry["jti"] for entry in later.json()["revoked"]]
+
+
+def test_verify_tokens_batch(test_user_mgmt_client):
+    """Test /verify-tokens returns one result per token, in order."""
+    token = _get_token(test_user_mgmt_client)
+    revoked_token = _get_token(test_user_mgmt_client)
+    test_user_mgmt_client.post(
+        "/revoke", headers={"Authorization": f"Bearer {revoked_token}"}
+    )
+    tokens = [token, "invalidtoken", token, revoked_token]
+
+    with patch(
+        "ml_user_mgmt.app.jwt_handler.decode_jwt", wraps=decode_jwt
+    ) as mock_decode:
+        response = test_user_mgmt_client.post("/verify-tokens", json={"tokens": tokens})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["valid"] for result in results] == [True, False, True, False]
+    assert results[0]["payload"]["user_id"] == "user123"
+    assert results[1]["error"] == "Invalid JWT token."
+    assert results[3]["error"] == "Expired or revoked JWT token."
+    # repeated tokens are verified once
+    assert response.json()["unique"] == 3
+    assert mock_decode.call_count == 3
+
+
+def test_verify_tokens_batch_limits(test_user_mgmt_client):
+    """Test /verify-tokens rejects too large batches and accepts empty ones."""
+    response = test_user_mgmt_client.post("/verify-tokens", json={"tokens": []})
+    assert response.status_code == 200
+    assert response.json() == {"results": [], "unique": 0}
+
+    with patch("ml_user_mgmt.app.main.VERIFY_BATCH_MAX_TOKENS", 2):
+        response = test_user_mgmt_client.post(
+            "/verify-tokens", json={"tokens": ["a", "b", "c"]}
+        )
+    assert response.status_code == 400
+
+
+def test_refresh_token(test_user_mgmt_client):
+    """Test /token/refresh issues new tokens once per refresh token."""
+    data = {"username": "user123", "password": "pass123"}
+    tokens = test_user_mgmt_client.post("/token", json=data).json()
+    assert tokens["token_type"] == "bearer"
+    assert tokens["expires_in"] > 0
+
+    with patch("ml_user_mgmt.app.main.user_db.check_user") as mock_check_user:
+        response = test_user_mgmt_client.post(
+            "/token/refresh", json={"refresh_token": tokens["refresh_token"]}
+        )
+    assert response.status_code == 200
+    # the password isn't checked again
+    mock_check_user.assert_not_called()
+    refreshed = response.json()
+    headers = {"Authorization": f"Bearer {refreshed['access_token']}"}
+    assert (
+        test_user_mgmt_client.get("/verify-token", headers=headers).status_code == 200
+    )
+    assert refreshed["refresh_token"] != tokens["refresh_token"]
+
+    # a refresh token can only be used once
+    response = test_user_mgmt_client.post(
+        "/token/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+    assert response.json()["message"] == "Refresh token was already used."
+
+
+def test_access_and_refresh_tokens_are_not_interchangeable(test_user_mgmt_client):
+    """Test refresh tokens aren't accepted as access tokens and vice versa."""
+    data = {"username": "user123", "password": "pass123"}
+    tokens = test_user_mgmt_client.post("/token", json=data).json()
+
+    headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+    assert (
+        test_user_mgmt_client.get("/verify-token", headers=headers).status_code == 401
+    )
+    response = test_user_mgmt_client.post(
+        "/token/refresh", json={"refresh_token": tokens["access_token"]}
+    )
+    assert response.status_code == 401
+    assert response.json()["message"] == "Invalid or expired refresh token."
+
+
+def test_admin_users_get_the_admin_role(test_user_mgmt_client):
+    """Test only the configured admin users get access tokens with the admin role."""
+    token = _get_token(test_user_mgmt_client)
+    assert jwt.decode(token, options={"verify_signature": False})["roles"] == []
+
+    with patch("ml_user_mgmt.app.jwt_handler.JWT_ADMIN_USERS", {"user123"}):
+        tokens = test_user_mgmt_client.post(
+            "/token", json={"username": "user123", "password": "pass123"}
+        ).json()
+    access = jwt.decode(tokens["access_token"], options={"verify_signature": False})
+    refresh = jwt.decode(tokens["refresh_token"], options={"verify_signature": False})
+    assert access["roles"] == ["admin"]
+    assert "roles" not in refresh
+
+
+def test_user_store_is_opened_at_startup():
+    user_db.close()
+    with TestClient(app):
+        assert user_db._pool is not None
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+from ml_user_mgmt.app.user_db import DEFAULT_USERNAME, UserDb, UserSchema
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = UserDb(db_path=str(tmp_path / "users.db"), pool_size=2, hash_iterations=1000)
+    yield db
+    db.close()
+
+
+def test_demo_user_is_created_in_an_empty_store(db):
+    assert db.count_users() == 1
+    assert db.check_user(UserSchema(username=DEFAULT_USERNAME, password="pass123"))
+    assert not db.check_user(UserSchema(username=DEFAULT_USERNAME, password="wrong"))
+    assert not db.check_user(UserSchema(username="unknown", password="pass123"))
+
+
+def test_passwords_are_stored_as_salted_hashes(db):
+    db.add_users([("alice", "secret"), ("bob", "secret")])
+    with db._get_pool().connection() as connection:
+        rows = connection.execute(
+            "SELECT salt, password_hash FROM users WHERE username IN ('alice', 'bob')"
+        ).fetchall()
+    (salt_a, hash_a), (salt_b, hash_b) = rows
+    assert salt_a != salt_b
+    assert hash_a != hash_b
+    assert b"secret" not in hash_a
+
+
+def test_users_persist_across_restarts(tmp_path):
+    db_path = str(tmp_path / "users.db")
+    db = UserDb(db_path=db_path, hash_iterations=1000)
+    db.add_user(UserSchema(username="alice", password="secret"))
+    db.close()
+
+    # stored hashes keep their iteration count, when the default changes
+    db = UserDb(db_path=db_path, hash_iterations=2000)
+    assert db.count_users() == 2
+    assert db.check_user(UserSchema(username="alice", password="secret"))
+    db.close()
+
+
+def test_username_lookup_uses_the_index(db):
+    with db._get_pool().connection() as connection:
+        plan = connection.execute(
+            "EXPLAIN QUERY PLAN SELECT salt FROM users WHERE username = ?", ("x",)
+        ).fetchall()
+    assert "SEARCH" in plan[0][-1]
+
+
+def test_check_user_async_runs_off_the_event_loop(db):
+    check_threads = []
+
+    def check_user(data):
+        check_threads.append(threading.current_thread().name)
+        return True
+
+    async def check_concurrently():
+        with patch.object(db, "check_user", side_effect=check_user):
+            return await asyncio.gather(
+                *[
+                    db.check_user_async(UserSchema(username="a", password="b"))
+                    for _ in range(4)
+                ]
+            )
+
+    assert asyncio.run(check_concurrently()) == [True] * 4
+    assert all(name.startswith("password-hash") for name in check_threads)
+
+
+def test_open_fails_for_an_unwritable_path(tmp_path):
+    # a file, where the data folder should be
+    (tmp_path / "data").write_text("")
+    db = UserDb(db_path=str(tmp_path / "data" / "users.db"))
+    with pytest.raises(OSError):
+        db.open()
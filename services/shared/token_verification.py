@@ -0,0 +1,213 @@
+"""
+Local verification of the JWTs of ML User Mgmt, shared by the services, which accept them.
+"""
+
+import logging
+import threading
+import time
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+
+class VerificationKeys:
+    """
+    Cache of the public keys of ML User Mgmt, keyed by key ID. Stale keys are fetched
+    again by the background refresher, an unknown key ID, i.e. after a key rotation,
+    causes a fetch on the request path. Fetches, also failed ones, are rate limited
+    by min_refresh_seconds, and if ML User Mgmt is not reachable, the last fetched
+    keys are used further.
+    """
+
+    def __init__(self, url, session, timeout, ttl_seconds, min_refresh_seconds):
+        self.url = url  # function returning the JWKS endpoint URL
+        self.session = session
+        self.timeout = timeout
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._keys = {}
+        self._fetched_at = None
+        self._attempted_at = None
+        self._lock = threading.Lock()
+
+    def get(self, kid):
+        """
+        Return the key with the given key ID, or None if it is unknown.
+        """
+        keys = self._keys
+        if kid in keys:
+            return keys[kid]
+        with self._lock:
+            if kid not in self._keys and self._may_refresh():
+                self._refresh()
+            return self._keys.get(kid)
+
+    def is_loaded(self):
+        return self._fetched_at is not None
+
+    def refresh_if_stale(self):
+        with self._lock:
+            stale = (
+                self._fetched_at is None
+                or time.monotonic() - self._fetched_at >= self.ttl_seconds
+            )
+            if stale and self._may_refresh():
+                self._refresh()
+
+    def _may_refresh(self):
+        # must be called holding the lock
+        return (
+            self._attempted_at is None
+            or time.monotonic() - self._attempted_at >= self.min_refresh_seconds
+        )
+
+    def _refresh(self):
+        # must be called holding the lock
+        self._attempted_at = time.monotonic()
+        try:
+            response = self.session.get(self.url(), timeout=self.timeout)
+            response.raise_for_status()
+            jwk_set = jwt.PyJWKSet.from_dict(response.json())
+        except Exception as e:
+            logger.warning(
+                f"Failed to fetch the JWT verification keys, using {len(self._keys)} cached keys: {e}"
+            )
+            return
+        self._keys = {jwk.key_id: jwk.key for jwk in jwk_set.keys}
+        self._fetched_at = time.monotonic()
+        logger.info(f"Fetched the JWT verification keys: {list(self._keys)}")
+
+    def set(self, keys):
+        """
+        Replace the cached keys with the given {kid: key}.
+        """
+        with self._lock:
+            self._keys = dict(keys)
+            self._fetched_at = time.monotonic()
+            self._attempted_at = self._fetched_at
+
+    def clear(self):
+        with self._lock:
+            self._keys = {}
+            self._fetched_at = None
+            self._attempted_at = None
+
+
+class RevocationList:
+    """
+    IDs of revoked tokens, synced incrementally from ML User Mgmt every sync_seconds.
+    If ML User Mgmt is not reachable, the last synced list is used further.
+    """
+
+    def __init__(self, url, session, timeout, sync_seconds, min_refresh_seconds):
+        self.url = url  # function returning the revoked tokens endpoint URL
+        self.session = session
+        self.timeout = timeout
+        self.sync_seconds = sync_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._revoked = {}  # jti -> expires
+        self._as_of = 0.0  # timestamp of ML User Mgmt, the next sync starts from
+        self._synced_at = None
+        self._attempted_at = None
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        # only one request syncs, the others use the current list meanwhile
+        self.sync_if_due(blocking=False)
+        return jti in self._revoked
+
+    def sync_if_due(self, blocking=True):
+        if self._sync_due() and self._lock.acquire(blocking=blocking):
+            try:
+                if self._sync_due():
+                    self._sync()
+            finally:
+                self._lock.release()
+
+    def _sync_due(self):
+        now = time.monotonic()
+        if self._attempted_at is not None and (
+            now - self._attempted_at < self.min_refresh_seconds
+        ):
+            return False
+        return self._synced_at is None or now - self._synced_at >= self.sync_seconds
+
+    def _sync(self):
+        self._attempted_at = time.monotonic()
+        try:
+            response = self.session.get(
+                self.url(), params={"since": self._as_of}, timeout=self.timeout
+            )
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            logger.warning(
+                f"Failed to sync the revoked JWTs, using {len(self._revoked)} known revocations: {e}"
+            )
+            return
+        now = time.time()
+        revoked = {
+            jti: expires for jti, expires in self._revoked.items() if expires >= now
+        }
+        for entry in data["revoked"]:
+            revoked[entry["jti"]] = entry["expires"]
+        self._revoked = revoked
+        self._as_of = data["as_of"]
+        self._synced_at = time.monotonic()
+
+    def set(self, revoked, as_of=0.0):
+        """
+        Replace the list with the given {"jti": ..., "expires": ...} entries.
+        """
+        with self._lock:
+            self._revoked = {entry["jti"]: entry["expires"] for entry in revoked}
+            self._as_of = as_of
+            self._synced_at = time.monotonic()
+            self._attempted_at = self._synced_at
+
+    def clear(self):
+        with self._lock:
+            self._revoked = {}
+            self._as_of = 0.0
+            self._synced_at = None
+            self._attempted_at = None
+
+
+class VerificationRefresher:
+    """
+    Background thread, which keeps the verification keys and the revocation list
+    up to date, so requests don't wait for ML User Mgmt.
+    """
+
+    def __init__(self, keys, revocations, interval_seconds):
+        self.keys = keys
+        self.revocations = revocations
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        self.keys.refresh_if_stale()
+        self.revocations.sync_if_due()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="jwt-verification-refresher", daemon=True
+        )
+        self._thread.start()
+        logger.info("Started background refresh of the JWT verification keys.")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds + 1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval_seconds)
@@ -1,8 +1,10 @@
 import logging
 import os
+import time
 
 import requests
 from fastapi import HTTPException, status
+from requests.adapters import HTTPAdapter
 
 # Configure logging
 logging.basicConfig(
@@ -43,19 +45,80 @@ HOST_BACKEND_ENDPOINT_LISTMODELS = HOST_BACKEND_URL + "/api/models"
 HOST_BACKEND_ENDPOINT_GETMODEL = HOST_BACKEND_URL + "/api/models/{model_name}"
 HOST_BACKEND_ENDPOINT_PREDICT = HOST_BACKEND_URL + "/api/models/{model_name}/predict"
 HOST_BACKEND_ENDPOINT_LOGIN = HOST_BACKEND_URL + "/api/models/login"
+HOST_BACKEND_ENDPOINT_REFRESH = HOST_BACKEND_URL + "/api/models/login/refresh"
+
+# Timeouts in seconds, predictions and model registration take considerably longer
+DEFAULT_TIMEOUT = float(get_env_variable("API_CLIENT_TIMEOUT", "10"))
+PREDICT_TIMEOUT = float(get_env_variable("API_CLIENT_PREDICT_TIMEOUT", "60"))
+REGISTER_TIMEOUT = float(get_env_variable("API_CLIENT_REGISTER_TIMEOUT", "120"))
+# Seconds before the access token expires, when it is refreshed
+TOKEN_REFRESH_MARGIN_SECONDS = float(
+    get_env_variable("TOKEN_REFRESH_MARGIN_SECONDS", "60")
+)
+
+# our singleton pooled HTTP session, which keeps connections to the services alive
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=10))
 
 
 def login(username, password):
     # Call the ml_auth endpoint for token generation
+    return login_with_refresh(username, password).get("access_token")
+
+
+def with_expiry(tokens: dict):
+    # the local clock is used, so a clock skew to the services doesn't matter
+    tokens["expires_at"] = time.time() + tokens.get("expires_in", 0)
+    return tokens
+
+
+def login_with_refresh(username, password):
+    """
+    Login and return the access and refresh tokens, which are kept by get_access_token.
+    """
     params = {"username": username, "password": password}
-    resp = requests.post(HOST_BACKEND_ENDPOINT_LOGIN, params=params)
+    resp = session.post(
+        HOST_BACKEND_ENDPOINT_LOGIN, params=params, timeout=DEFAULT_TIMEOUT
+    )
     if resp.status_code != status.HTTP_200_OK:
         logger.error("Failed to obtain JWT")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
         )
-    logger.info(f"Obtained a JWT for user {username}")
-    return resp.json().get("access_token")
+    logger.info(f"Obtained JWTs for user {username}")
+    return with_expiry(resp.json())
+
+
+def refresh(refresh_token: str):
+    # Exchange the refresh token for new tokens, without sending the password again
+    resp = session.post(
+        HOST_BACKEND_ENDPOINT_REFRESH,
+        json={"refresh_token": refresh_token},
+        timeout=DEFAULT_TIMEOUT,
+    )
+    if resp.status_code != status.HTTP_200_OK:
+        logger.error(f"Failed to refresh JWT: {resp.status_code} - {resp.text}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session expired, please login again",
+        )
+    logger.info("Refreshed JWT")
+    return with_expiry(resp.json())
+
+
+def get_access_token(tokens: dict):
+    """
+    Return the access token of a login, it is refreshed shortly before it expires.
+    The tokens are updated in place, so they can be kept in the session state.
+    """
+    if not tokens:
+        return None
+    if (
+        tokens.get("refresh_token")
+        and tokens["expires_at"] - TOKEN_REFRESH_MARGIN_SECONDS <= time.time()
+    ):
+        tokens.update(refresh(tokens["refresh_token"]))
+    return tokens["access_token"]
 
 
 def register_model(
@@ -73,11 +136,12 @@ def register_model(
         "max_num": max_num,
     }
     data = class_names  # Send class_names as a list in the body
-    resp = requests.post(
+    resp = session.post(
         TRAIN_HUB_ENDPOINT_REGISTERMODEL.format(model_name=model_name),
         headers=Headers,
         params=params,
         json=data,
+        timeout=REGISTER_TIMEOUT,
     )
     if resp.status_code != status.HTTP_200_OK:
         logger.error(f"Failed to register model: {resp.status_code} - {resp.text}")
@@ -91,7 +155,9 @@ def register_model(
 
 def list_models(token: str):
     Headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(HOST_BACKEND_ENDPOINT_LISTMODELS, headers=Headers)
+    resp = session.get(
+        HOST_BACKEND_ENDPOINT_LISTMODELS, headers=Headers, timeout=DEFAULT_TIMEOUT
+    )
     if resp.status_code != status.HTTP_200_OK:
         logger.error(f"Failed to list models: {resp.status_code} - {resp.text}")
         raise HTTPException(
@@ -104,8 +170,10 @@ def list_models(token: str):
 
 def get_model(token: str, model_name: str):
     Headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(
-        HOST_BACKEND_ENDPOINT_GETMODEL.format(model_name=model_name), headers=Headers
+    resp = session.get(
+        HOST_BACKEND_ENDPOINT_GETMODEL.format(model_name=model_name),
+        headers=Headers,
+        timeout=DEFAULT_TIMEOUT,
     )
     if resp.status_code != status.HTTP_200_OK:
         logger.error(
@@ -122,10 +190,11 @@ def get_model(token: str, model_name: str):
 def predict(token: str, model_name: str, data: dict):
     Headers = {"Authorization": f"Bearer {token}"}
     files = {"file": ("image.jpg", data, "image/jpeg")}
-    resp = requests.post(
+    resp = session.post(
         HOST_BACKEND_ENDPOINT_PREDICT.format(model_name=model_name),
         headers=Headers,
         files=files,
+        timeout=PREDICT_TIMEOUT,
     )
     if resp.status_code != status.HTTP_200_OK:
         logger.error(
@@ -1,6 +1,13 @@
 import content as content  # Custom module for UI content
 import requests
-from api_client import get_model, list_models, login, predict, register_model
+from api_client import (
+    get_access_token,
+    get_model,
+    list_models,
+    login_with_refresh,
+    predict,
+    register_model,
+)
 
 import streamlit as st  # Web app UI with Streamlit
 
@@ -38,7 +45,7 @@ if page == "Data Scientest":  # If user selected the "Data Scientest" page
     if st.button("Login Data Scientist"):  # Button to trigger login
         try:
             # Attempt to login with provided credentials
-            st.session_state["jwt_token_ds"] = login(username, password)
+            st.session_state["jwt_tokens_ds"] = login_with_refresh(username, password)
             st.success(
                 "Login successful!"
             )  # Show success message if login is successful
@@ -72,9 +79,9 @@ if page == "Data Scientest":  # If user selected the "Data Scientest" page
     if st.button("Register Model"):  # Button to trigger model registration
         try:
             register_model(
-                st.session_state.get(
-                    "jwt_token_ds"
-                ),  # Use the JWT token from session state
+                get_access_token(
+                    st.session_state.get("jwt_tokens_ds")
+                ),  # Use the JWT token from session state, refreshed before it expires
                 model_filepath,  # Model file path input by the user
                 model_name,  # Name of the model to register in MLFlow
                 list(classes),  # Class names for the model
@@ -104,7 +111,7 @@ elif page == "End User":  # If the user navigates to the "End User" page
     if st.button("Login End User"):  # Button to trigger login
         try:
             # Attempt to login with provided credentials
-            st.session_state["jwt_token_user"] = login(username, password)
+            st.session_state["jwt_tokens_user"] = login_with_refresh(username, password)
             st.success(
                 "Login successful!"
             )  # Show success message if login is successful
@@ -119,7 +126,7 @@ elif page == "End User":  # If the user navigates to the "End User" page
     if st.button("List Models"):  # Button to trigger model listing
         try:
             models = list_models(
-                st.session_state.get("jwt_token_user")
+                get_access_token(st.session_state.get("jwt_tokens_user"))
             )  # Load models from the API
             st.session_state["models"] = [
                 model["name"] for model in models
@@ -156,9 +163,9 @@ elif page == "End User":  # If the user navigates to the "End User" page
         try:
             # Attempt to load the selected model details using the API client
             st.session_state["model"] = get_model(
-                st.session_state.get(
-                    "jwt_token_user"
-                ),  # Use the JWT token from session state
+                get_access_token(
+                    st.session_state.get("jwt_tokens_user")
+                ),  # Use the JWT token from session state, refreshed before it expires
                 st.session_state[
                     "selected_model"
                 ],  # Get the selected model name from session state
@@ -228,9 +235,9 @@ elif page == "End User":  # If the user navigates to the "End User" page
         try:
             # Attempt to make a prediction using the API client
             result = predict(
-                st.session_state.get(
-                    "jwt_token_user"
-                ),  # Use the JWT token from session state
+                get_access_token(
+                    st.session_state.get("jwt_tokens_user")
+                ),  # Use the JWT token from session state, refreshed before it expires
                 predicting_model,  # The name of the model to use for prediction
                 image,  # The image data to predict on
             )  # Make a prediction using the API client